@@ -0,0 +1,37 @@
+"""Микробенчмарки горячих путей бота
+
+Запуск из каталога telegram_bot: python -m benchmarks.<модуль>
+"""
+
+import time
+import timeit
+from typing import Awaitable, Callable, Iterable
+
+
+def per_call_ns(func: Callable[[str], object], samples: Iterable[str], repeat: int = 5, number: int = 200) -> float:
+    """Лучшее из repeat время одного вызова func на samples, в наносекундах"""
+    samples = list(samples)
+    
+    def run():
+        for sample in samples:
+            func(sample)
+    
+    best = min(timeit.repeat(run, repeat=repeat, number=number))
+    return best / (number * len(samples)) * 1e9
+
+
+async def async_per_call_ns(func: Callable[[str], Awaitable[object]], samples: Iterable[str],
+                            repeat: int = 5, number: int = 200) -> float:
+    """per_call_ns для корутин: замер внутри одного event loop"""
+    samples = list(samples)
+    best = None
+    
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            for sample in samples:
+                await func(sample)
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    
+    return best / (number * len(samples))
@@ -0,0 +1,89 @@
+"""AccessPolicy (словарь + префиксное дерево) против прежней линейной проверки
+
+До реестра доступа SubscriptionMiddleware на каждый callback перебирал
+список бесплатных действий через startswith, а затем список ключевых
+слов через подстроку. Здесь обе проверки сравниваются на callback бота
+и на синтетическом наборе из N правил.
+
+python -m benchmarks.access_policy
+"""
+
+import random
+
+from benchmarks import per_call_ns
+from bot.handlers import labs, materials  # noqa: F401 - регистрируют платные callback
+from bot.keyboards.callbacks import (
+    LabCallback, LabCategoryCallback, MaterialCallback, MaterialFormatCallback,
+    MaterialThemeCallback, PracticeCallback
+)
+from bot.utils.access import AccessPolicy, access_policy
+
+# Прежняя проверка (SubscriptionMiddleware до реестра доступа)
+LEGACY_FREE_ACTIONS = [
+    'menu', 'start', 'help', 'problems', 'contacts', 'booking',
+    'reviews', 'subscribe', 'subscribe_info', 'pay', 'payment_confirm'
+]
+LEGACY_PAID_KEYWORDS = [
+    'material', 'format_', 'materials_theme', 'materials_popular',
+    'get_material', 'practice_'
+]
+
+
+def legacy_requires_subscription(callback_data: str, free_actions=LEGACY_FREE_ACTIONS,
+                                 keywords=LEGACY_PAID_KEYWORDS) -> bool:
+    """Линейная проверка: O(число правил x длина callback)"""
+    for free_action in free_actions:
+        if callback_data.startswith(free_action):
+            return False
+    
+    return any(keyword in callback_data for keyword in keywords)
+
+
+BOT_CALLBACKS = [
+    'menu', 'materials', 'subscribe', 'problems', 'booking', 'contacts',
+    'materials_popular', 'labs', 'admin_stats',
+    LabCallback(lab='recovery').pack(),
+    LabCategoryCallback(lab='body', category='neck', cursor=24).pack(),
+    PracticeCallback(id=17).pack(),
+    MaterialFormatCallback(format='video', cursor=8).pack(),
+    MaterialThemeCallback(theme='sleep', cursor=0).pack(),
+    MaterialCallback(id=412).pack(),
+]
+
+
+def synthetic(rules: int, seed: int = 1):
+    """N правил-префиксов и callback: половина совпадает, половина нет"""
+    rng = random.Random(seed)
+    prefixes = [f"action{i}_" for i in range(rules)]
+    
+    samples = [rng.choice(prefixes) + str(rng.randrange(1000)) for _ in range(50)]
+    samples += [f"other{rng.randrange(1000)}:{rng.randrange(1000)}" for _ in range(50)]
+    
+    policy = AccessPolicy()
+    for prefix in prefixes:
+        policy.free(prefix, prefix=True)
+    
+    return prefixes, samples, policy
+
+
+def main():
+    legacy = per_call_ns(legacy_requires_subscription, BOT_CALLBACKS)
+    trie = per_call_ns(access_policy.requires_subscription, BOT_CALLBACKS)
+    print(f"Callback бота ({len(BOT_CALLBACKS)} шт.)")
+    print(f"  линейная проверка: {legacy:7.0f} нс/вызов")
+    print(f"  AccessPolicy:      {trie:7.0f} нс/вызов")
+    print()
+    
+    print(f"{'правил':>8} {'линейная, нс':>14} {'AccessPolicy, нс':>18}")
+    for rules in (10, 100, 1000):
+        prefixes, samples, policy = synthetic(rules)
+        legacy = per_call_ns(
+            lambda data: legacy_requires_subscription(data, prefixes, LEGACY_PAID_KEYWORDS),
+            samples, number=20
+        )
+        trie = per_call_ns(policy.requires_subscription, samples, number=20)
+        print(f"{rules:>8} {legacy:>14.0f} {trie:>18.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Поиск callback handler: CallbackIndex против перебора routers aiogram
+
+aiogram на каждый callback обходит все routers и у каждого handler
+проверяет фильтры, пока какой-то не подойдет - O(число handlers).
+CallbackIndex проверяет только кандидатов по callback_data. Замеряется
+только выбор handler (фильтры), сами handlers не вызываются.
+
+python -m benchmarks.dispatch
+"""
+
+import asyncio
+import os
+from datetime import datetime
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from benchmarks import async_per_call_ns
+from bot.keyboards.callbacks import (
+    BroadcastStopCallback, LabCallback, LabCategoryCallback, MaterialCallback,
+    MaterialFormatCallback, MaterialThemeCallback, PracticeCallback, ProblemCallback
+)
+from bot.utils.callback_index import CallbackIndex, IndexedDispatcher
+
+PACKED_CALLBACKS = [
+    LabCallback(lab='recovery').pack(),
+    LabCategoryCallback(lab='body', category='neck', cursor=24).pack(),
+    PracticeCallback(id=17).pack(),
+    MaterialFormatCallback(format='video', cursor=8).pack(),
+    MaterialThemeCallback(theme='sleep', cursor=0).pack(),
+    MaterialCallback(id=412).pack(),
+    ProblemCallback(key='back').pack(),
+    BroadcastStopCallback(id=3).pack(),
+    'unknown_button',
+]
+
+
+def callback(data: str) -> CallbackQuery:
+    """CallbackQuery с заданными данными"""
+    user = User(id=100, is_bot=False, first_name='Тест')
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=100, type='private'), from_user=user)
+    return CallbackQuery(id='1', from_user=user, chat_instance='1', data=data, message=message)
+
+
+async def linear_find(dispatcher: IndexedDispatcher, event: CallbackQuery, kwargs: dict):
+    """Перебор как в Router.propagate_event + TelegramEventObserver.trigger"""
+    for router in dispatcher.chain_tail:
+        observer = router.callback_query
+        result, _ = await observer.check_root_filters(event, **kwargs)
+        if not result:
+            continue
+        for handler in observer.handlers:
+            result, data = await handler.check(event, **{**kwargs, 'event_router': router, 'handler': handler})
+            if result:
+                return router, handler, data
+    return None
+
+
+async def compare(dispatcher: IndexedDispatcher, samples: list, number: int = 200):
+    """(перебор, индекс) в нс на один callback"""
+    index = CallbackIndex(dispatcher)
+    events = {data: callback(data) for data in samples}
+    kwargs = {'bot': None, 'raw_state': None, 'event_from_user': events[samples[0]].from_user}
+    
+    linear = await async_per_call_ns(
+        lambda data: linear_find(dispatcher, events[data], kwargs), samples, number=number
+    )
+    indexed = await async_per_call_ns(lambda data: index.find(events[data], kwargs), samples, number=number)
+    return linear, indexed, len(index)
+
+
+def synthetic(handlers: int) -> IndexedDispatcher:
+    """Диспетчер с N handlers на F.data == ... в 10 routers"""
+    dispatcher = IndexedDispatcher()
+    routers = [Router(name=f"bench{i}") for i in range(10)]
+    for number in range(handlers):
+        routers[number % 10].callback_query.register(lambda _: None, F.data == f"action{number}")
+    dispatcher.include_routers(*routers)
+    return dispatcher
+
+
+async def main():
+    os.makedirs('logs', exist_ok=True)
+    from bot.main import create_dispatcher
+    
+    dispatcher = create_dispatcher()
+    samples = list(CallbackIndex(dispatcher)._exact) + PACKED_CALLBACKS
+    linear, indexed, handlers = await compare(dispatcher, samples)
+    print(f"Callback бота ({len(samples)} шт., {handlers} handlers)")
+    print(f"  перебор routers: {linear:7.0f} нс/callback")
+    print(f"  CallbackIndex:   {indexed:7.0f} нс/callback")
+    print()
+    
+    print(f"{'handlers':>8} {'перебор, нс':>13} {'CallbackIndex, нс':>19}")
+    for count in (10, 100, 1000):
+        samples = [f"action{number}" for number in range(0, count, max(count // 20, 1))] + ['unknown']
+        linear, indexed, _ = await compare(synthetic(count), samples, number=20)
+        print(f"{count:>8} {linear:>13.0f} {indexed:>19.0f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
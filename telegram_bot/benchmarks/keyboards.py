@@ -0,0 +1,64 @@
+"""Стоимость клавиатуры на один callback: сборка + сериализация запроса
+
+Три варианта для статических меню:
+- сборка InlineKeyboardBuilder на каждый callback (как до кеша);
+- клавиатура из cached_keyboard, JSON каждый раз считает aiogram;
+- клавиатура из кеша и готовый JSON (PrebuiltKeyboardSession).
+
+python -m benchmarks.keyboards
+"""
+
+import inspect
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import EditMessageText
+
+from benchmarks import per_call_ns
+from bot.keyboards import inline
+from bot.keyboards.prebuilt import PrebuiltKeyboardSession
+
+MENUS = {
+    'materials': (inline.get_materials_menu, ()),
+    'materials_format': (inline.get_formats_menu, ()),
+    'materials_theme': (inline.get_themes_menu, ()),
+    'info': (inline.get_info_menu, ()),
+    'subscribe': (inline.get_subscription_keyboard, (990,)),
+    'admin': (inline.get_admin_keyboard, ()),
+    'back': (inline.get_back_button, ('materials',)),
+}
+
+
+def main():
+    bot = Bot(token='42:TEST')
+    plain, prebuilt = AiohttpSession(), PrebuiltKeyboardSession()
+    
+    def request(session, markup):
+        method = EditMessageText(chat_id=100, message_id=1, text='Текст меню', reply_markup=markup)
+        return session.build_form_data(bot, method)
+    
+    def rebuilt(name):
+        build, args = MENUS[name]
+        return request(plain, inspect.unwrap(build)(*args))
+    
+    def cached(name):
+        build, args = MENUS[name]
+        return request(plain, build(*args))
+    
+    def cached_prebuilt(name):
+        build, args = MENUS[name]
+        return request(prebuilt, build(*args))
+    
+    results = [
+        ('сборка на каждый callback', per_call_ns(rebuilt, MENUS)),
+        ('кеш клавиатур', per_call_ns(cached, MENUS)),
+        ('кеш + готовый JSON', per_call_ns(cached_prebuilt, MENUS)),
+    ]
+    
+    print(f"Статические меню ({len(MENUS)} шт.), мкс на callback")
+    for title, ns in results:
+        print(f"  {title:<26} {ns / 1000:7.1f}")
+
+
+if __name__ == '__main__':
+    main()
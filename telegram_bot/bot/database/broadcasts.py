@@ -0,0 +1,70 @@
+"""Хранилище рассылок в локальной базе"""
+
+import logging
+from datetime import datetime
+from typing import Optional, List
+
+from sqlalchemy import select, update
+
+from bot.database.models import Broadcast
+from bot.database.repository import user_repository
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastRepository:
+    """Рассылки и их прогресс (в той же базе, что и пользователи)"""
+    
+    def __init__(self):
+        self.session_factory = user_repository.session_factory
+    
+    async def create(self, **fields) -> Broadcast:
+        """Создать рассылку"""
+        async with self.session_factory() as session:
+            broadcast = Broadcast(**fields)
+            session.add(broadcast)
+            await session.commit()
+            return broadcast
+    
+    async def get(self, broadcast_id: int) -> Optional[Broadcast]:
+        """Рассылка по ID"""
+        async with self.session_factory() as session:
+            return await session.get(Broadcast, broadcast_id)
+    
+    async def get_running(self) -> List[Broadcast]:
+        """Незавершенные рассылки (для продолжения после перезапуска)"""
+        async with self.session_factory() as session:
+            result = await session.scalars(
+                select(Broadcast).where(Broadcast.status == 'running').order_by(Broadcast.id)
+            )
+            return list(result)
+    
+    async def save_progress(self, broadcast: Broadcast):
+        """Сохранить курсор и счетчики (статус меняется только set_status)"""
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast.id)
+                .values(
+                    cursor=broadcast.cursor,
+                    sent=broadcast.sent,
+                    blocked=broadcast.blocked,
+                    failed=broadcast.failed
+                )
+            )
+            await session.commit()
+    
+    async def set_status(self, broadcast_id: int, status: str) -> bool:
+        """Завершить идущую рассылку (done, cancelled, failed), False - уже завершена"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status == 'running')
+                .values(status=status, finished_at=datetime.now())
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+
+# Singleton instance
+broadcast_repository = BroadcastRepository()
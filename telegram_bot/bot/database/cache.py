@@ -0,0 +1,84 @@
+"""In-process кеш записей пользователей"""
+
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+
+class UserCache:
+    """LRU-кеш записей пользователей с ограниченным временем жизни
+    
+    Ключ - user_id, значение - словарь с колонками из Google Sheets.
+    Используется только из event loop, поэтому блокировки не нужны.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._records: OrderedDict[int, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        
+        # Счетчики для подбора размера кеша
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получить копию записи или None"""
+        entry = self._records.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, record = entry
+        if expires_at < time.monotonic():
+            del self._records[user_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._records.move_to_end(user_id)
+        self.hits += 1
+        return dict(record)
+    
+    def set(self, user_id: int, record: Dict[str, Any]):
+        """Сохранить запись, вытесняя самую старую при переполнении"""
+        if self.max_size <= 0:
+            return
+        
+        self._records[user_id] = (time.monotonic() + self.ttl, dict(record))
+        self._records.move_to_end(user_id)
+        
+        while len(self._records) > self.max_size:
+            self._records.popitem(last=False)
+            self.evictions += 1
+    
+    def update(self, user_id: int, updates: Dict[str, Any]):
+        """Применить изменения к записи, если она есть в кеше"""
+        entry = self._records.get(user_id)
+        if entry is not None:
+            entry[1].update(updates)
+    
+    def invalidate(self, user_id: int):
+        """Удалить запись из кеша"""
+        self._records.pop(user_id, None)
+    
+    def clear(self):
+        """Очистить кеш"""
+        self._records.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий, промахов и вытеснений"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._records),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._records)
@@ -0,0 +1,171 @@
+"""Репозиторий материалов из закрытого канала"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Any
+
+from bot.utils.pagination import Page, paginate
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# Материалы по умолчанию, если нет MATERIALS_FILE
+SAMPLE_MATERIALS = [
+    {
+        'id': 1,
+        'title': 'Базовая практика для спины',
+        'description': 'Упражнения для расслабления мышц спины и улучшения осанки (15 минут)',
+        'format': 'video',
+        'category': 'back',
+        'message_id': 2  # ID сообщения в канале
+    },
+    {
+        'id': 2,
+        'title': 'Приветствие',
+        'description': '',
+        'format': 'video',
+        'lab': 'body',
+        'lab_category': 'belly',
+        'message_id': 5
+    }
+]
+
+
+@dataclass(frozen=True)
+class Material:
+    """Материал (видео, статья, аудио) - сообщение в закрытом канале
+    
+    Материалы с lab и lab_category - практики соответствующей категории Labs.
+    """
+    id: int
+    title: str
+    format: str
+    message_id: Optional[int] = None
+    description: str = ''
+    category: str = ''
+    lab: str = ''
+    lab_category: str = ''
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Material':
+        """Создать материал из записи файла"""
+        message_id = data.get('message_id')
+        return cls(
+            id=int(data['id']),
+            title=data['title'],
+            format=data.get('format', 'video'),
+            message_id=int(message_id) if message_id is not None else None,
+            description=data.get('description', ''),
+            category=data.get('category', ''),
+            lab=data.get('lab', ''),
+            lab_category=data.get('lab_category', '')
+        )
+
+
+class MaterialsRepository:
+    """Материалы с индексами по id, формату, теме и категории Labs
+    
+    Загружаются один раз из MATERIALS_FILE (JSON-список) или из
+    SAMPLE_MATERIALS. Поиск по id - словарь, списки по формату/теме/Lab
+    заранее отсортированы по id, поэтому страница по курсору (id
+    последнего показанного материала) ищется бинарным поиском
+    (bot.utils.pagination).
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.path = self.config.MATERIALS_FILE
+        self.version = 0
+        self._by_id: Dict[int, Material] = {}
+        self._by_format: Dict[str, List[Material]] = {}
+        self._by_category: Dict[str, List[Material]] = {}
+        self._by_lab: Dict[Tuple[str, str], List[Material]] = {}
+        self._mtime: Optional[float] = None
+        self.load()
+    
+    def load(self) -> bool:
+        """Загрузить материалы (при ошибке остаются предыдущие)"""
+        mtime = self._get_mtime()
+        
+        try:
+            if mtime is not None:
+                with open(self.path, encoding='utf-8') as materials_file:
+                    records = json.load(materials_file)
+            else:
+                records = SAMPLE_MATERIALS
+            
+            materials = [Material.from_dict(record) for record in records]
+            self._build_indexes(materials)
+        except Exception as e:
+            logger.error(f"Failed to load materials: {e}")
+            # Не перечитываем сломанный файл, пока его не исправят
+            self._mtime = mtime
+            return False
+        
+        self._mtime = mtime
+        self.version += 1
+        
+        logger.info(f"Materials loaded: {len(self._by_id)}")
+        return True
+    
+    def reload_if_changed(self) -> bool:
+        """Перечитать файл материалов, если он изменился"""
+        if self._get_mtime() == self._mtime:
+            return False
+        return self.load()
+    
+    def _get_mtime(self) -> Optional[float]:
+        """Время изменения файла материалов или None, если файла нет"""
+        if self.path and os.path.exists(self.path):
+            return os.path.getmtime(self.path)
+        return None
+    
+    def _build_indexes(self, materials: List[Material]):
+        """Построить индексы и подменить их целиком"""
+        by_id = {}
+        by_format: Dict[str, List[Material]] = {}
+        by_category: Dict[str, List[Material]] = {}
+        by_lab: Dict[Tuple[str, str], List[Material]] = {}
+        
+        for material in sorted(materials, key=lambda m: m.id):
+            if material.id in by_id:
+                raise ValueError(f"Duplicate material id {material.id}")
+            by_id[material.id] = material
+            
+            by_format.setdefault(material.format, []).append(material)
+            if material.category:
+                by_category.setdefault(material.category, []).append(material)
+            if material.lab:
+                by_lab.setdefault((material.lab, material.lab_category), []).append(material)
+        
+        self._by_id = by_id
+        self._by_format = by_format
+        self._by_category = by_category
+        self._by_lab = by_lab
+    
+    def get(self, material_id: int) -> Optional[Material]:
+        """Материал по ID"""
+        return self._by_id.get(material_id)
+    
+    def all(self) -> List[Material]:
+        """Все материалы (по возрастанию id)"""
+        return list(self._by_id.values())
+    
+    def by_format(self, format_type: str, cursor: int = 0, limit: Optional[int] = None) -> Page:
+        """Страница материалов формата"""
+        return paginate(self._by_format.get(format_type, []), cursor, limit)
+    
+    def by_category(self, category: str, cursor: int = 0, limit: Optional[int] = None) -> Page:
+        """Страница материалов темы"""
+        return paginate(self._by_category.get(category, []), cursor, limit)
+    
+    def by_lab(self, lab: str, lab_category: str, cursor: int = 0, limit: Optional[int] = None) -> Page:
+        """Страница практик категории Labs"""
+        return paginate(self._by_lab.get((lab, lab_category), []), cursor, limit)
+
+
+# Singleton instance
+materials_repository = MaterialsRepository()
@@ -0,0 +1,183 @@
+"""Модели локальной базы данных"""
+
+from datetime import datetime
+from typing import Optional, Dict, Any, Set
+
+from sqlalchemy import BigInteger, Boolean, DateTime, Integer, String, Text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+# Формат дат в Google Sheets
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Все колонки, как в Google Sheets
+ALL_FIELDS = '*'
+
+
+class Base(DeclarativeBase):
+    """Базовый класс моделей"""
+    pass
+
+
+class User(Base):
+    """Пользователь бота (зеркалируется в Google Sheets)"""
+    
+    __tablename__ = 'users'
+    
+    # Колонки в порядке GoogleSheetsManager.HEADERS
+    FIELDS = (
+        'user_id', 'username', 'first_name', 'last_name', 'phone',
+        'date_registered', 'status', 'subscription_start', 'subscription_end',
+        'payment_status', 'last_activity', 'materials_viewed',
+        'problems_selected', 'consultation_requests', 'notes'
+    )
+    DATE_FIELDS = ('date_registered', 'subscription_start', 'subscription_end', 'last_activity')
+    INT_FIELDS = ('materials_viewed', 'consultation_requests')
+    
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    username: Mapped[str] = mapped_column(String(64), default='')
+    first_name: Mapped[str] = mapped_column(String(128), default='')
+    last_name: Mapped[str] = mapped_column(String(128), default='')
+    phone: Mapped[str] = mapped_column(String(32), default='')
+    date_registered: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    status: Mapped[str] = mapped_column(String(64), default='новый')
+    subscription_start: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    subscription_end: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    payment_status: Mapped[bool] = mapped_column(Boolean, default=False)
+    last_activity: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    materials_viewed: Mapped[int] = mapped_column(Integer, default=0)
+    problems_selected: Mapped[str] = mapped_column(Text, default='')
+    consultation_requests: Mapped[int] = mapped_column(Integer, default=0)
+    notes: Mapped[str] = mapped_column(Text, default='')
+    
+    # Синхронизация с Google Sheets: колонки, которые еще не выгружены
+    # ('*' - вся строка), и версия записи для защиты от гонок
+    dirty_fields: Mapped[str] = mapped_column(Text, default='', index=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Запись в формате строки Google Sheets (все значения - строки)"""
+        record = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                record[name] = ''
+            elif name in self.DATE_FIELDS:
+                record[name] = value.strftime(DATE_FORMAT)
+            elif name == 'payment_status':
+                record[name] = 'TRUE' if value else 'FALSE'
+            else:
+                record[name] = str(value)
+        return record
+    
+    def apply(self, updates: Dict[str, Any]) -> Set[str]:
+        """Применить изменения (строки из Sheets или готовые значения)
+        
+        Возвращает имена реально измененных колонок. Значения, которые
+        не удалось разобрать, пропускаются.
+        """
+        changed = set()
+        
+        for name, value in updates.items():
+            if name not in self.FIELDS or name == 'user_id':
+                continue
+            
+            try:
+                value = parse_value(name, value)
+            except ValueError:
+                continue
+            
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed.add(name)
+        
+        return changed
+    
+    def mark_dirty(self, fields: Set[str]):
+        """Отметить колонки для выгрузки в Google Sheets"""
+        if not fields:
+            return
+        
+        if self.dirty_fields != ALL_FIELDS:
+            current = set(self.dirty_fields.split(',')) if self.dirty_fields else set()
+            self.dirty_fields = ','.join(sorted(current | fields))
+        
+        self.version = (self.version or 0) + 1
+
+
+class Broadcast(Base):
+    """Рассылка админа: копия сообщения from_chat_id/message_id по сегменту
+    
+    cursor - user_id последнего обработанного получателя, по нему рассылка
+    продолжается после перезапуска бота.
+    """
+    
+    __tablename__ = 'broadcasts'
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    admin_id: Mapped[int] = mapped_column(BigInteger)
+    from_chat_id: Mapped[int] = mapped_column(BigInteger)
+    message_id: Mapped[int] = mapped_column(Integer)
+    segment: Mapped[str] = mapped_column(String(16), default='all')
+    segment_value: Mapped[str] = mapped_column(String(128), default='')
+    status: Mapped[str] = mapped_column(String(16), default='running', index=True)
+    cursor: Mapped[int] = mapped_column(BigInteger, default=0)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    sent: Mapped[int] = mapped_column(Integer, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    progress_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class Payment(Base):
+    """Платеж через Telegram Payments
+    
+    Ключ - telegram_payment_charge_id: повторная обработка того же
+    платежа не создает вторую запись и не продлевает подписку еще раз.
+    """
+    
+    __tablename__ = 'payments'
+    
+    telegram_payment_charge_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    provider_payment_charge_id: Mapped[str] = mapped_column(String(128), default='')
+    user_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    amount: Mapped[int] = mapped_column(Integer)  # В минимальных единицах (копейках)
+    currency: Mapped[str] = mapped_column(String(8))
+    payload: Mapped[str] = mapped_column(String(128), default='')
+    days: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+
+class Job(Base):
+    """Отложенная задача (напоминание и т.п.), выполняется в run_at
+    
+    key уникален: повторное планирование с тем же ключом заменяет задачу.
+    """
+    
+    __tablename__ = 'jobs'
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    key: Mapped[str] = mapped_column(String(128), unique=True)
+    run_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    payload: Mapped[str] = mapped_column(Text, default='{}')  # JSON
+
+
+def parse_value(name: str, value: Any) -> Any:
+    """Привести значение колонки к типу модели"""
+    if name in User.DATE_FIELDS:
+        if isinstance(value, datetime) or value is None:
+            return value
+        value = str(value).strip()
+        return datetime.strptime(value, DATE_FORMAT) if value else None
+    
+    if name in User.INT_FIELDS:
+        return int(value or 0)
+    
+    if name == 'payment_status':
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().upper() == 'TRUE'
+    
+    return '' if value is None else str(value)
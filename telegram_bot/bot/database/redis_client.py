@@ -0,0 +1,136 @@
+"""Общее состояние в Redis для запуска нескольких реплик бота"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Optional, Iterable
+
+try:
+    from redis.asyncio import Redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    logging.warning("redis not installed, Redis features disabled")
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+# Идентификатор процесса, чтобы не обрабатывать собственные сообщения
+INSTANCE_ID = uuid.uuid4().hex
+
+_redis: Optional['Redis'] = None
+
+
+def get_redis() -> Optional['Redis']:
+    """Клиент Redis или None, если Redis выключен (USE_REDIS=False)"""
+    global _redis
+    
+    if not config.USE_REDIS or not REDIS_AVAILABLE:
+        return None
+    
+    if _redis is None:
+        _redis = Redis(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            password=config.REDIS_PASSWORD or None
+        )
+    
+    return _redis
+
+
+async def close_redis():
+    """Закрыть соединение с Redis"""
+    global _redis
+    
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+async def acquire_lock(name: str, ttl: int) -> bool:
+    """Захватить лок на ttl секунд (без Redis всегда True - одна реплика)"""
+    redis = get_redis()
+    if redis is None:
+        return True
+    
+    key = f"lock:{name}"
+    
+    try:
+        if await redis.set(key, INSTANCE_ID, nx=True, ex=ttl):
+            return True
+        
+        # Лок уже наш - продлеваем
+        owner = await redis.get(key)
+        if owner and owner.decode() == INSTANCE_ID:
+            await redis.expire(key, ttl)
+            return True
+    except Exception as e:
+        logger.error(f"Failed to acquire Redis lock {name}: {e}")
+    
+    return False
+
+
+class CacheInvalidationBus:
+    """Рассылка инвалидаций кеша пользователей между репликами
+    
+    Каждая реплика держит локальный UserCache (чтение - поиск в словаре),
+    а после записи публикует user_id в канал Redis. Остальные реплики
+    удаляют эти записи из своих кешей.
+    """
+    
+    CHANNEL = 'users:invalidate'
+    
+    async def publish(self, user_ids: Iterable[int]):
+        """Сообщить другим репликам об изменении пользователей"""
+        redis = get_redis()
+        if redis is None:
+            return
+        
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        
+        try:
+            message = json.dumps({'instance': INSTANCE_ID, 'user_ids': user_ids})
+            await redis.publish(self.CHANNEL, message)
+        except Exception as e:
+            logger.error(f"Failed to publish cache invalidation: {e}")
+    
+    async def listen(self, cache):
+        """Фоновая задача: применять инвалидации от других реплик"""
+        redis = get_redis()
+        if redis is None:
+            return
+        
+        while True:
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    
+                    async for message in pubsub.listen():
+                        if message.get('type') != 'message':
+                            continue
+                        
+                        payload = json.loads(message['data'])
+                        if payload.get('instance') == INSTANCE_ID:
+                            continue
+                        
+                        for user_id in payload.get('user_ids', []):
+                            cache.invalidate(user_id)
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+                # Пропущенные сообщения - сбрасываем кеш целиком
+                cache.clear()
+                await asyncio.sleep(5)
+
+
+# Singleton instance
+cache_bus = CacheInvalidationBus()
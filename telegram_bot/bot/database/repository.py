@@ -0,0 +1,624 @@
+"""Репозиторий пользователей в локальной базе данных (SQLAlchemy async)"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Iterable, AsyncIterator
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from bot.database.cache import UserCache
+from bot.database.models import Base, User, Payment, ALL_FIELDS, DATE_FORMAT
+from bot.database.redis_client import cache_bus
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Subscription:
+    """Статус подписки пользователя"""
+    active: bool
+    status: str = ''
+    end_date: Optional[datetime] = None
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Поля пользователя, по которым считается статистика"""
+    status: str
+    paid: bool
+    registered: Optional[date]
+    
+    @classmethod
+    def of(cls, user: User) -> 'UserSnapshot':
+        """Снимок текущего состояния пользователя"""
+        return cls(
+            status=user.status or '',
+            paid=bool(user.payment_status),
+            registered=user.date_registered.date() if user.date_registered else None
+        )
+
+
+class UserRepository:
+    """Основное хранилище пользователей
+    
+    Все чтения и записи идут в локальную базу (DATABASE_URL), поэтому
+    бот продолжает работать, когда Google Sheets недоступен. Изменения
+    помечаются в dirty_fields и выгружаются в таблицу фоновой
+    синхронизацией (bot.database.sync).
+    """
+    
+    # Колонки, которые админ может менять вручную в Google Sheets
+    ADMIN_FIELDS = (
+        'phone', 'status', 'subscription_start', 'subscription_end',
+        'payment_status', 'notes'
+    )
+    
+    # Колонки, от которых зависит срок подписки
+    SUBSCRIPTION_FIELDS = {'payment_status', 'subscription_end'}
+    
+    # Значения ADMIN_FIELDS у только что созданного пользователя (см. add_user)
+    NEW_USER_DEFAULTS = {
+        'phone': '', 'status': 'новый', 'subscription_start': None,
+        'subscription_end': None, 'payment_status': False, 'notes': ''
+    }
+    
+    def __init__(self):
+        self.config = Config()
+        self.engine = create_async_engine(self.config.DATABASE_URL)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.cache = UserCache(
+            max_size=self.config.USER_CACHE_SIZE,
+            ttl=self.config.USER_CACHE_TTL
+        )
+        self._subscription_listeners: List[Callable[[int, Optional[datetime]], None]] = []
+        self._user_listeners: List[Callable[[Optional[UserSnapshot], UserSnapshot], None]] = []
+    
+    async def init(self):
+        """Создать таблицы, если их нет"""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        logger.info("Database initialized")
+    
+    async def close(self):
+        """Закрыть соединения с базой"""
+        await self.engine.dispose()
+    
+    async def add_user(self, user_data: Dict[str, Any]) -> bool:
+        """Добавить нового пользователя"""
+        user_id = int(user_data['user_id'])
+        
+        # Проверяем, есть ли уже такой пользователь
+        if await self.get_user(user_id):
+            logger.info(f"User {user_id} already exists")
+            return True
+        
+        try:
+            async with self.session_factory() as session:
+                user = User(
+                    user_id=user_id,
+                    username=user_data.get('username', ''),
+                    first_name=user_data.get('first_name', ''),
+                    last_name=user_data.get('last_name', ''),
+                    date_registered=datetime.now(),
+                    last_activity=datetime.now(),
+                    materials_viewed=0,
+                    problems_selected='',
+                    consultation_requests=0,
+                    **{**self.NEW_USER_DEFAULTS, 'phone': user_data.get('phone', '')},
+                    dirty_fields=ALL_FIELDS,
+                    version=1
+                )
+                session.add(user)
+                await session.commit()
+            
+            self.cache.set(user_id, user.to_record())
+            self._notify_users([(None, user)])
+            logger.info(f"User {user_id} added to database")
+            return True
+        
+        except IntegrityError:
+            # Пользователь добавлен параллельным запросом
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add user to database: {e}")
+            return False
+    
+    def on_subscription_change(self, listener: Callable[[int, Optional[datetime]], None]):
+        """Подписаться на изменения подписок: listener(user_id, дата окончания)
+        
+        Дата окончания - None, если подписка не активна или бессрочная.
+        """
+        self._subscription_listeners.append(listener)
+    
+    def on_user_change(self, listener: Callable[[Optional[UserSnapshot], UserSnapshot], None]):
+        """Подписаться на изменения пользователей: listener(до, после)
+        
+        До - None для нового пользователя. Вызывается после коммита.
+        """
+        self._user_listeners.append(listener)
+    
+    def _notify_users(self, changes: Iterable[Tuple[Optional[UserSnapshot], User]]):
+        """Сообщить слушателям об изменившихся пользователях"""
+        for before, user in changes:
+            after = UserSnapshot.of(user)
+            if before == after:
+                continue
+            for listener in self._user_listeners:
+                listener(before, after)
+    
+    def _notify_subscriptions(self, users: Iterable[User]):
+        """Сообщить слушателям о новых сроках подписок"""
+        for user in users:
+            end_date = user.subscription_end if user.payment_status else None
+            for listener in self._subscription_listeners:
+                listener(user.user_id, end_date)
+    
+    async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получить данные пользователя (сначала из кеша)"""
+        user_data = self.cache.get(user_id)
+        if user_data is not None:
+            return user_data
+        
+        try:
+            async with self.session_factory() as session:
+                user = await session.get(User, user_id)
+        except Exception as e:
+            logger.error(f"Failed to get user from database: {e}")
+            return None
+        
+        if user is None:
+            return None
+        
+        user_data = user.to_record()
+        self.cache.set(user_id, user_data)
+        return user_data
+    
+    async def update_user(self, user_id: int, updates: Dict[str, Any]) -> bool:
+        """Обновить данные пользователя"""
+        return user_id in await self.update_users({user_id: updates})
+    
+    async def update_users(
+        self,
+        updates_by_user: Dict[int, Dict[str, Any]],
+        increments: Optional[Dict[int, Dict[str, int]]] = None
+    ) -> Set[int]:
+        """Обновить нескольких пользователей в одной транзакции
+        
+        increments - прибавки к счетчикам (INT_FIELDS). Они применяются в
+        SQL (materials_viewed = materials_viewed + n), поэтому реплики не
+        затирают приращения друг друга.
+        
+        Возвращает user_id, которые реально обновлены: пусто при ошибке,
+        без пользователей, которых нет в базе.
+        """
+        increments = increments or {}
+        user_ids = set(updates_by_user) | set(increments)
+        if not user_ids:
+            return set()
+        
+        now = datetime.now()
+        
+        try:
+            async with self.session_factory() as session:
+                async with session.begin():
+                    for user_id, counters in increments.items():
+                        values = {
+                            getattr(User, name): getattr(User, name) + amount
+                            for name, amount in counters.items() if name in User.INT_FIELDS
+                        }
+                        if values:
+                            await session.execute(
+                                update(User).where(User.user_id == user_id).values(values)
+                            )
+                    
+                    # Читаем уже с прибавленными счетчиками
+                    result = await session.scalars(
+                        select(User).where(User.user_id.in_(list(user_ids)))
+                    )
+                    users = result.all()
+                    subscription_changed = []
+                    snapshots = {user.user_id: UserSnapshot.of(user) for user in users}
+                    
+                    for user in users:
+                        changed = user.apply(updates_by_user.get(user.user_id, {}))
+                        changed |= set(increments.get(user.user_id, {})) & set(User.INT_FIELDS)
+                        user.last_activity = now
+                        user.mark_dirty(changed | {'last_activity'})
+                        if changed & self.SUBSCRIPTION_FIELDS:
+                            subscription_changed.append(user)
+        
+        except Exception as e:
+            logger.error(f"Failed to update users in database: {e}")
+            for user_id in user_ids:
+                self.cache.invalidate(user_id)
+            return set()
+        
+        for user in users:
+            self.cache.set(user.user_id, user.to_record())
+        await cache_bus.publish(user.user_id for user in users)
+        self._notify_subscriptions(subscription_changed)
+        self._notify_users((snapshots[user.user_id], user) for user in users)
+        
+        applied = {user.user_id for user in users}
+        if len(applied) < len(user_ids):
+            missing = user_ids - applied
+            logger.warning(f"Users {sorted(missing)} not found in database")
+        
+        return applied
+    
+    async def get_subscription(self, user_id: int) -> Subscription:
+        """Получить статус подписки пользователя (только чтение)
+        
+        Истекшую подписку снимает в базе фоновый SubscriptionScheduler,
+        здесь она просто считается неактивной.
+        """
+        try:
+            user_data = await self.get_user(user_id)
+            if not user_data:
+                return Subscription(active=False)
+            
+            status = user_data.get('status', '')
+            
+            # Проверяем payment_status (TRUE/FALSE)
+            payment_status = user_data.get('payment_status', 'FALSE').upper()
+            
+            # Также проверяем дату окончания подписки
+            end_date = None
+            subscription_end = user_data.get('subscription_end', '')
+            if subscription_end:
+                try:
+                    end_date = datetime.strptime(subscription_end, DATE_FORMAT)
+                    if datetime.now() > end_date:
+                        return Subscription(active=False, status=status, end_date=end_date)
+                except ValueError:
+                    pass
+            
+            return Subscription(
+                active=payment_status == 'TRUE',
+                status=status,
+                end_date=end_date
+            )
+        
+        except Exception as e:
+            logger.error(f"Failed to check payment status: {e}")
+            return Subscription(active=False)
+    
+    async def check_payment_status(self, user_id: int) -> bool:
+        """Проверить статус оплаты пользователя"""
+        subscription = await self.get_subscription(user_id)
+        return subscription.active
+    
+    async def set_subscription(self, user_id: int, days: int = 30) -> bool:
+        """Установить подписку пользователю"""
+        start_date = datetime.now()
+        end_date = start_date + timedelta(days=days)
+        
+        updates = {
+            'payment_status': True,
+            'status': 'активная подписка',
+            'subscription_start': start_date,
+            'subscription_end': end_date
+        }
+        
+        return await self.update_user(user_id, updates)
+    
+    async def apply_payment(self, payment: Payment) -> Optional[datetime]:
+        """Записать платеж и продлить подписку на payment.days в одной транзакции
+        
+        Активная подписка продлевается от текущей даты окончания.
+        Возвращает новую дату окончания или None, если платеж с таким
+        telegram_payment_charge_id уже обработан.
+        """
+        try:
+            async with self.session_factory() as session:
+                async with session.begin():
+                    if await session.get(Payment, payment.telegram_payment_charge_id):
+                        return None
+                    
+                    user = await session.get(User, payment.user_id)
+                    if user is None:
+                        raise ValueError(f"User {payment.user_id} not found")
+                    before = UserSnapshot.of(user)
+                    
+                    now = datetime.now()
+                    updates = {'payment_status': True, 'status': 'активная подписка'}
+                    if user.payment_status and user.subscription_end and user.subscription_end > now:
+                        updates['subscription_end'] = user.subscription_end + timedelta(days=payment.days)
+                    else:
+                        updates['subscription_start'] = now
+                        updates['subscription_end'] = now + timedelta(days=payment.days)
+                    
+                    session.add(payment)
+                    user.mark_dirty(user.apply(updates))
+        
+        except IntegrityError:
+            # Тот же платеж обработан параллельно
+            return None
+        
+        self.cache.set(user.user_id, user.to_record())
+        await cache_bus.publish([user.user_id])
+        self._notify_subscriptions([user])
+        self._notify_users([(before, user)])
+        
+        return user.subscription_end
+    
+    async def get_active_subscriptions(self) -> List[Tuple[int, datetime]]:
+        """Активные подписки со сроком окончания: [(user_id, subscription_end)]"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(User.user_id, User.subscription_end)
+                .where(User.payment_status.is_(True), User.subscription_end.is_not(None))
+            )
+            return [(user_id, end_date) for user_id, end_date in result]
+    
+    async def get_subscription_ends(self, user_ids: List[int]) -> Dict[int, datetime]:
+        """Сроки активных подписок указанных пользователей: {user_id: subscription_end}"""
+        if not user_ids:
+            return {}
+        
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(User.user_id, User.subscription_end).where(
+                    User.user_id.in_(user_ids),
+                    User.payment_status.is_(True),
+                    User.subscription_end.is_not(None)
+                )
+            )
+            return {user_id: end_date for user_id, end_date in result}
+    
+    async def expire_subscriptions(self, user_ids: List[int]) -> List[int]:
+        """Снять истекшие подписки одной транзакцией, возвращает id снятых
+        
+        Пользователи, которые успели продлить подписку (или уже сняты
+        другой репликой), пропускаются.
+        """
+        if not user_ids:
+            return []
+        
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.scalars(
+                    select(User).where(
+                        User.user_id.in_(user_ids),
+                        User.payment_status.is_(True),
+                        User.subscription_end <= datetime.now()
+                    )
+                )
+                users = result.all()
+                snapshots = {user.user_id: UserSnapshot.of(user) for user in users}
+                
+                for user in users:
+                    user.mark_dirty(user.apply({'payment_status': False, 'status': 'истек'}))
+        
+        for user in users:
+            self.cache.set(user.user_id, user.to_record())
+        await cache_bus.publish(user.user_id for user in users)
+        self._notify_users((snapshots[user.user_id], user) for user in users)
+        
+        return [user.user_id for user in users]
+    
+    async def increment_counter(self, user_id: int, field: str) -> bool:
+        """Увеличить счетчик (materials_viewed, consultation_requests)"""
+        return user_id in await self.update_users({}, {user_id: {field: 1}})
+    
+    async def add_problem(self, user_id: int, problem: str) -> bool:
+        """Добавить проблему в список"""
+        user_data = await self.get_user(user_id)
+        if not user_data:
+            return False
+        
+        problems = user_data.get('problems_selected', '')
+        problems_list = problems.split(', ') if problems else []
+        
+        if problem not in problems_list:
+            problems_list.append(problem)
+        
+        return await self.update_user(user_id, {
+            'problems_selected': ', '.join(problems_list)
+        })
+    
+    async def get_recent_users(self, limit: int) -> List[Dict[str, Any]]:
+        """Последние зарегистрированные пользователи (новые в конце)"""
+        try:
+            async with self.session_factory() as session:
+                result = await session.scalars(
+                    select(User).order_by(User.date_registered.desc()).limit(limit)
+                )
+                return [user.to_record() for user in reversed(result.all())]
+        except Exception as e:
+            logger.error(f"Failed to get recent users: {e}")
+            return []
+    
+    async def get_user_aggregates(self) -> List[Tuple[str, bool, Any, int]]:
+        """Число пользователей по (status, payment_status, день регистрации)"""
+        day = func.date(User.date_registered)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(User.status, User.payment_status, day, func.count())
+                .group_by(User.status, User.payment_status, day)
+            )
+            return [tuple(row) for row in result]
+    
+    async def get_all_users(self) -> list:
+        """Получить всех пользователей"""
+        try:
+            async with self.session_factory() as session:
+                result = await session.scalars(select(User).order_by(User.date_registered))
+                return [user.to_record() for user in result]
+        except Exception as e:
+            logger.error(f"Failed to get all users: {e}")
+            return []
+    
+    # ============= СЕГМЕНТЫ ДЛЯ РАССЫЛОК =============
+    
+    @staticmethod
+    def _segment_filter(segment: str, value: str = '') -> list:
+        """Условия выборки пользователей сегмента (all, paid, expired, problem)"""
+        if segment == 'paid':
+            return [
+                User.payment_status.is_(True),
+                or_(User.subscription_end.is_(None), User.subscription_end > datetime.now())
+            ]
+        if segment == 'expired':
+            return [User.status == 'истек']
+        if segment == 'problem':
+            return [User.problems_selected.contains(value)]
+        return []
+    
+    async def count_segment(self, segment: str, value: str = '') -> int:
+        """Число пользователей в сегменте"""
+        async with self.session_factory() as session:
+            return await session.scalar(
+                select(func.count()).select_from(User).where(*self._segment_filter(segment, value))
+            )
+    
+    async def get_segment_ids(self, segment: str, value: str = '', after: int = 0, limit: int = 100) -> List[int]:
+        """Следующая пачка user_id сегмента (по возрастанию, больше after)"""
+        async with self.session_factory() as session:
+            result = await session.scalars(
+                select(User.user_id)
+                .where(User.user_id > after, *self._segment_filter(segment, value))
+                .order_by(User.user_id)
+                .limit(limit)
+            )
+            return list(result)
+    
+    # ============= ВЫГРУЗКА =============
+    
+    async def iter_users(self, conditions: list, chunk_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Пользователи под условия пачками по chunk_size (по возрастанию user_id)
+        
+        Каждая пачка читается отдельным запросом после последнего user_id
+        предыдущей, поэтому в памяти не больше одной пачки.
+        """
+        after = None
+        
+        while True:
+            query = select(User).where(*conditions).order_by(User.user_id).limit(chunk_size)
+            if after is not None:
+                query = query.where(User.user_id > after)
+            
+            async with self.session_factory() as session:
+                users = (await session.scalars(query)).all()
+            
+            if not users:
+                return
+            
+            yield [user.to_record() for user in users]
+            after = users[-1].user_id
+    
+    # ============= СИНХРОНИЗАЦИЯ С GOOGLE SHEETS =============
+    
+    async def get_dirty_users(self, limit: int) -> List[Tuple[Dict[str, Any], str, int]]:
+        """Пользователи с невыгруженными изменениями: (запись, колонки, версия)"""
+        async with self.session_factory() as session:
+            result = await session.scalars(
+                select(User).where(User.dirty_fields != '').limit(limit)
+            )
+            return [(user.to_record(), user.dirty_fields, user.version) for user in result]
+    
+    async def mark_synced(self, versions: Dict[int, int]):
+        """Снять отметку выгрузки, если запись не менялась с момента чтения"""
+        if not versions:
+            return
+        
+        async with self.session_factory() as session:
+            async with session.begin():
+                for user_id, version in versions.items():
+                    await session.execute(
+                        update(User)
+                        .where(User.user_id == user_id, User.version == version)
+                        .values(dirty_fields='')
+                    )
+    
+    async def merge_remote_users(self, records: List[Dict[str, Any]]) -> int:
+        """Применить правки админа из Google Sheets, возвращает число изменений
+        
+        Неизвестные пользователи импортируются целиком. У существующих
+        берутся только ADMIN_FIELDS, которые еще не изменены локально.
+        
+        Новая локальная запись (dirty_fields='*') со строкой в таблице - это
+        клиент, которого админ завел раньше, чем он написал боту. Она берет
+        из таблицы ADMIN_FIELDS, которые еще равны значениям по умолчанию,
+        а к выгрузке остаются только остальные колонки.
+        """
+        merged = 0
+        changed_ids = []
+        subscription_changed = []
+        user_changes = []
+        chunk_size = 500
+        
+        for start in range(0, len(records), chunk_size):
+            chunk = {}
+            for record in records[start:start + chunk_size]:
+                try:
+                    chunk[int(record.get('user_id'))] = {
+                        key: str(value) for key, value in record.items()
+                    }
+                except (TypeError, ValueError):
+                    continue
+            
+            async with self.session_factory() as session:
+                async with session.begin():
+                    result = await session.scalars(
+                        select(User).where(User.user_id.in_(list(chunk)))
+                    )
+                    local_users = {user.user_id: user for user in result}
+                    
+                    for user_id, record in chunk.items():
+                        user = local_users.get(user_id)
+                        
+                        if user is None:
+                            user = User(
+                                user_id=user_id, username='', first_name='', last_name='',
+                                phone='', date_registered=datetime.now(), status='новый',
+                                payment_status=False, last_activity=datetime.now(),
+                                materials_viewed=0, problems_selected='',
+                                consultation_requests=0, notes='', dirty_fields='', version=0
+                            )
+                            user.apply(record)
+                            session.add(user)
+                            subscription_changed.append(user)
+                            user_changes.append((None, user))
+                            merged += 1
+                            continue
+                        
+                        before = UserSnapshot.of(user)
+                        
+                        if user.dirty_fields == ALL_FIELDS:
+                            remote = {
+                                name: record[name] for name in self.ADMIN_FIELDS
+                                if name in record and getattr(user, name) == self.NEW_USER_DEFAULTS[name]
+                            }
+                            changed = user.apply(remote)
+                            user.dirty_fields = ','.join(name for name in User.FIELDS if name not in remote)
+                            user.version += 1
+                        else:
+                            dirty = set(user.dirty_fields.split(',')) if user.dirty_fields else set()
+                            remote = {
+                                name: record[name] for name in self.ADMIN_FIELDS
+                                if name in record and name not in dirty
+                            }
+                            changed = user.apply(remote)
+                        
+                        if changed:
+                            user_changes.append((before, user))
+                        if changed & self.SUBSCRIPTION_FIELDS:
+                            subscription_changed.append(user)
+                        if changed:
+                            self.cache.invalidate(user_id)
+                            changed_ids.append(user_id)
+                            merged += 1
+        
+        await cache_bus.publish(changed_ids)
+        self._notify_subscriptions(subscription_changed)
+        self._notify_users(user_changes)
+        return merged
+
+
+# Singleton instance
+user_repository = UserRepository()
@@ -1,12 +1,16 @@
-"""Интеграция с Google Sheets для CRM"""
+"""Интеграция с Google Sheets для CRM (зеркало локальной базы)"""
 
+import asyncio
 import json
 import logging
-from datetime import datetime
-from typing import Optional, Dict, Any
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, List, Set
 
 try:
     import gspread
+    from gspread.utils import rowcol_to_a1
     from oauth2client.service_account import ServiceAccountCredentials
     GSPREAD_AVAILABLE = True
 except ImportError:
@@ -19,7 +23,16 @@ logger = logging.getLogger(__name__)
 
 
 class GoogleSheetsManager:
-    """Менеджер для работы с Google Sheets"""
+    """Менеджер для работы с Google Sheets
+
+    gspread делает синхронные HTTP-запросы, поэтому все публичные методы
+    асинхронные и выполняют их в отдельном пуле потоков. Число одновременных
+    запросов к Google ограничено SHEETS_MAX_CONCURRENCY.
+    
+    Таблица - зеркало локальной базы (см. bot.database.sync). Номер строки
+    пользователя берется из индекса колонки user_id, который строится при
+    старте и обновляется через reindex().
+    """
     
     HEADERS = [
         'user_id', 'username', 'first_name', 'last_name', 'phone',
@@ -28,10 +41,20 @@ class GoogleSheetsManager:
         'problems_selected', 'consultation_requests', 'notes'
     ]
     
+    # Колонка -> номер столбца (с 1)
+    COLUMNS = {header: i + 1 for i, header in enumerate(HEADERS)}
+    
     def __init__(self):
         self.config = Config()
         self.client = None
         self.sheet = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.config.SHEETS_MAX_CONCURRENCY,
+            thread_name_prefix='sheets'
+        )
+        self._semaphore = asyncio.Semaphore(self.config.SHEETS_MAX_CONCURRENCY)
+        # user_id (строка) -> номер строки в таблице
+        self._rows: Dict[str, int] = {}
         self._init_sheet()
     
     def _init_sheet(self):
@@ -62,6 +85,7 @@ class GoogleSheetsManager:
             
             # Проверяем/создаем заголовки
             self._ensure_headers()
+            self._build_index()
             
             logger.info("Google Sheets connected successfully")
             
@@ -83,202 +107,206 @@ class GoogleSheetsManager:
         except Exception as e:
             logger.error(f"Failed to ensure headers: {e}")
     
-    def add_user(self, user_data: Dict[str, Any]) -> bool:
-        """Добавить нового пользователя"""
+    def _build_index(self):
+        """Построить индекс user_id -> номер строки по колонке A"""
+        user_ids = self.sheet.col_values(1)
+        
+        rows = {}
+        for row_num, value in enumerate(user_ids[1:], start=2):
+            if value and value not in rows:
+                rows[value] = row_num
+        
+        self._rows = rows
+        logger.info(f"Google Sheets index built: {len(rows)} users")
+    
+    def _find_row(self, user_id: int) -> Optional[int]:
+        """Номер строки пользователя по индексу"""
+        return self._rows.get(str(user_id))
+    
+    async def reindex(self) -> bool:
+        """Перестроить индекс строк (после ручного редактирования таблицы)"""
         if not self.sheet:
             return False
         
         try:
-            # Проверяем, есть ли уже такой пользователь
-            existing = self.get_user(user_data['user_id'])
-            if existing:
-                logger.info(f"User {user_data['user_id']} already exists")
-                return True
-            
-            # Подготавливаем данные
-            row = [
-                str(user_data.get('user_id', '')),
-                user_data.get('username', ''),
-                user_data.get('first_name', ''),
-                user_data.get('last_name', ''),
-                user_data.get('phone', ''),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),  # date_registered
-                'новый',  # status
-                '',  # subscription_start
-                '',  # subscription_end
-                'FALSE',  # payment_status
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),  # last_activity
-                '0',  # materials_viewed
-                '',  # problems_selected
-                '0',  # consultation_requests
-                ''  # notes
-            ]
-            
-            self.sheet.append_row(row)
-            logger.info(f"User {user_data['user_id']} added to Google Sheets")
+            await self._run(self._build_index)
             return True
-            
         except Exception as e:
-            logger.error(f"Failed to add user to Google Sheets: {e}")
+            logger.error(f"Failed to reindex Google Sheets: {e}")
+            return False
+    
+    async def reindex_periodically(self):
+        """Фоновая задача: периодически перестраивать индекс строк"""
+        interval = self.config.SHEETS_REINDEX_INTERVAL
+        if interval <= 0:
+            return
+        
+        while True:
+            await asyncio.sleep(interval)
+            await self.reindex()
+    
+    async def _run(self, func, *args):
+        """Выполнить блокирующий вызов gspread в пуле потоков"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args))
+    
+    def close(self):
+        """Остановить пул потоков"""
+        self._executor.shutdown(wait=False)
+    
+    def has_user(self, user_id: int) -> bool:
+        """Есть ли пользователь в индексе строк таблицы"""
+        return self._find_row(user_id) is not None
+    
+    async def append_users(self, records: List[Dict[str, Any]]) -> bool:
+        """Добавить строки пользователей одним запросом"""
+        if not self.sheet or not records:
             return False
+        
+        return await self._run(self._append_users, records)
     
-    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+    async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получить данные пользователя"""
         if not self.sheet:
             return None
         
-        try:
-            # Ищем пользователя по user_id (первая колонка)
-            cell = self.sheet.find(str(user_id))
-            if not cell:
-                return None
-            
-            row_values = self.sheet.row_values(cell.row)
-            
-            # Собираем данные в словарь
-            user_data = {}
-            for i, header in enumerate(self.HEADERS):
-                user_data[header] = row_values[i] if i < len(row_values) else ''
-            
-            return user_data
-            
-        except Exception as e:
-            logger.error(f"Failed to get user from Google Sheets: {e}")
-            return None
+        return await self._run(self._get_user, user_id)
     
-    def update_user(self, user_id: int, updates: Dict[str, Any]) -> bool:
+    async def update_user(self, user_id: int, updates: Dict[str, Any]) -> bool:
         """Обновить данные пользователя"""
-        if not self.sheet:
+        return await self.update_users({user_id: updates})
+    
+    async def update_users(self, updates_by_user: Dict[int, Dict[str, Any]]) -> bool:
+        """Обновить нескольких пользователей одним запросом"""
+        if not self.sheet or not updates_by_user:
             return False
         
+        updated = await self._run(self._update_users, updates_by_user)
+        return len(updated) == len(updates_by_user)
+    
+    async def get_all_users(self) -> list:
+        """Получить всех пользователей"""
+        return await self._run(self._get_all_users)
+    
+    def _append_users(self, records: List[Dict[str, Any]]) -> bool:
+        """Дописать строки пользователей в конец таблицы"""
         try:
-            cell = self.sheet.find(str(user_id))
-            if not cell:
-                logger.warning(f"User {user_id} not found in Google Sheets")
-                return False
+            # Строки могли добавить вручную после построения индекса
+            if any(not self.has_user(record['user_id']) for record in records):
+                self._build_index()
             
-            row_num = cell.row
+            records = [record for record in records if not self.has_user(record['user_id'])]
+            if not records:
+                return True
             
-            # Обновляем только нужные колонки
-            for key, value in updates.items():
-                if key in self.HEADERS:
-                    col_num = self.HEADERS.index(key) + 1
-                    self.sheet.update_cell(row_num, col_num, str(value))
+            rows = [[str(record.get(header, '')) for header in self.HEADERS] for record in records]
+            response = self.sheet.append_rows(rows)
             
-            # Обновляем last_activity
-            activity_col = self.HEADERS.index('last_activity') + 1
-            self.sheet.update_cell(
-                row_num, 
-                activity_col, 
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            )
+            # Номер первой новой строки берем из ответа API ("Sheet1!A5:O7")
+            updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+            match = re.search(r'![A-Z]+(\d+)', updated_range)
+            if match:
+                first_row = int(match.group(1))
+                for offset, record in enumerate(records):
+                    self._rows[str(record['user_id'])] = first_row + offset
+            else:
+                self._build_index()
             
-            logger.info(f"User {user_id} updated in Google Sheets")
+            logger.info(f"{len(records)} users added to Google Sheets")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to update user in Google Sheets: {e}")
+            logger.error(f"Failed to add users to Google Sheets: {e}")
             return False
     
-    def check_payment_status(self, user_id: int) -> bool:
-        """Проверить статус оплаты пользователя"""
-        if not self.sheet:
-            return False
-        
+    def _get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Прочитать строку пользователя из таблицы"""
         try:
-            user_data = self.get_user(user_id)
-            if not user_data:
-                return False
+            row_num = self._find_row(user_id)
+            if not row_num:
+                return None
             
-            # Проверяем payment_status (TRUE/FALSE)
-            payment_status = user_data.get('payment_status', 'FALSE').upper()
+            user_data = self._read_row(row_num)
             
-            # Также проверяем дату окончания подписки
-            subscription_end = user_data.get('subscription_end', '')
-            if subscription_end:
-                try:
-                    end_date = datetime.strptime(subscription_end, '%Y-%m-%d %H:%M:%S')
-                    if datetime.now() > end_date:
-                        # Подписка истекла
-                        self.update_user(user_id, {
-                            'payment_status': 'FALSE',
-                            'status': 'истек'
-                        })
-                        return False
-                except ValueError:
-                    pass
+            # Строки сдвинулись (таблицу редактировали вручную) - перестраиваем индекс
+            if user_data['user_id'] != str(user_id):
+                self._build_index()
+                row_num = self._find_row(user_id)
+                if not row_num:
+                    return None
+                user_data = self._read_row(row_num)
             
-            return payment_status == 'TRUE'
+            return user_data
             
         except Exception as e:
-            logger.error(f"Failed to check payment status: {e}")
-            return False
+            logger.error(f"Failed to get user from Google Sheets: {e}")
+            return None
     
-    def set_subscription(self, user_id: int, days: int = 30) -> bool:
-        """Установить подписку пользователю"""
-        if not self.sheet:
-            return False
+    def _read_row(self, row_num: int) -> Dict[str, Any]:
+        """Прочитать строку таблицы в словарь"""
+        row_values = self.sheet.row_values(row_num)
         
-        try:
-            start_date = datetime.now()
-            end_date = start_date.replace(day=start_date.day + days)
-            
-            updates = {
-                'payment_status': 'TRUE',
-                'status': 'активная подписка',
-                'subscription_start': start_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'subscription_end': end_date.strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            return self.update_user(user_id, updates)
-            
-        except Exception as e:
-            logger.error(f"Failed to set subscription: {e}")
-            return False
-    
-    def increment_counter(self, user_id: int, field: str) -> bool:
-        """Увеличить счетчик (materials_viewed, consultation_requests)"""
-        if not self.sheet:
-            return False
+        # Собираем данные в словарь
+        user_data = {}
+        for i, header in enumerate(self.HEADERS):
+            user_data[header] = row_values[i] if i < len(row_values) else ''
         
-        try:
-            user_data = self.get_user(user_id)
-            if not user_data:
-                return False
-            
-            current_value = int(user_data.get(field, '0'))
-            return self.update_user(user_id, {field: current_value + 1})
-            
-        except Exception as e:
-            logger.error(f"Failed to increment counter: {e}")
-            return False
+        return user_data
     
-    def add_problem(self, user_id: int, problem: str) -> bool:
-        """Добавить проблему в список"""
-        if not self.sheet:
-            return False
+    def _locate_rows(self, user_ids: List[int]) -> Dict[int, int]:
+        """Номера строк пользователей с проверкой, что строки не сдвинулись"""
+        rows = {user_id: self._find_row(user_id) for user_id in user_ids}
+        rows = {user_id: row_num for user_id, row_num in rows.items() if row_num}
+        if not rows:
+            return {}
+        
+        # Одним запросом читаем колонку user_id во всех найденных строках
+        values = self.sheet.batch_get([rowcol_to_a1(row_num, 1) for row_num in rows.values()])
+        stale = any(
+            (value[0][0] if value and value[0] else '') != str(user_id)
+            for user_id, value in zip(rows, values)
+        )
+        
+        if stale:
+            self._build_index()
+            rows = {user_id: self._find_row(user_id) for user_id in user_ids}
+            rows = {user_id: row_num for user_id, row_num in rows.items() if row_num}
         
+        return rows
+    
+    def _update_users(self, updates_by_user: Dict[int, Dict[str, Any]]) -> Set[int]:
+        """Записать изменения в таблицу одним batch_update, возвращает обновленных"""
         try:
-            user_data = self.get_user(user_id)
-            if not user_data:
-                return False
+            rows = self._locate_rows(list(updates_by_user))
             
-            problems = user_data.get('problems_selected', '')
-            problems_list = problems.split(', ') if problems else []
+            data = []
+            for user_id, updates in updates_by_user.items():
+                row_num = rows.get(user_id)
+                if not row_num:
+                    logger.warning(f"User {user_id} not found in Google Sheets")
+                    continue
+                
+                # Обновляем только нужные колонки
+                for key, value in updates.items():
+                    if key in self.COLUMNS:
+                        data.append({
+                            'range': rowcol_to_a1(row_num, self.COLUMNS[key]),
+                            'values': [[str(value)]]
+                        })
             
-            if problem not in problems_list:
-                problems_list.append(problem)
+            if data:
+                self.sheet.batch_update(data, raw=False)
             
-            return self.update_user(user_id, {
-                'problems_selected': ', '.join(problems_list)
-            })
+            logger.info(f"Users {list(rows)} updated in Google Sheets")
+            return set(rows)
             
         except Exception as e:
-            logger.error(f"Failed to add problem: {e}")
-            return False
+            logger.error(f"Failed to update users in Google Sheets: {e}")
+            return set()
     
-    def get_all_users(self) -> list:
-        """Получить всех пользователей"""
+    def _get_all_users(self) -> list:
+        """Прочитать все строки таблицы"""
         if not self.sheet:
             return []
         
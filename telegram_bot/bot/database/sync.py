@@ -0,0 +1,160 @@
+"""Синхронизация локальной базы с Google Sheets"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from bot.database.models import ALL_FIELDS
+from bot.database.redis_client import acquire_lock
+from bot.database.repository import user_repository
+from bot.database.sheets import sheets_manager
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsSync:
+    """Фоновая синхронизация: база -> Google Sheets и правки админа обратно
+    
+    Выгрузка (push) раз в SHEETS_SYNC_INTERVAL секунд отправляет измененные
+    колонки пачками по SHEETS_SYNC_BATCH пользователей: новые строки одним
+    append_rows, изменения одним batch_update. Загрузка (pull) раз в
+    SHEETS_PULL_INTERVAL секунд читает таблицу целиком и переносит в базу
+    ручные правки админа (payment_status, status, даты подписки, заметки).
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self._last_pull = 0.0
+        # Выгрузка и загрузка не идут параллельно: загрузка, начатая до
+        # окончания выгрузки, вернула бы в базу старые значения из таблицы
+        self._lock = asyncio.Lock()
+    
+    async def push(self) -> int:
+        """Выгрузить изменения в таблицу, возвращает число пользователей"""
+        pushed = 0
+        
+        while True:
+            dirty = await user_repository.get_dirty_users(self.config.SHEETS_SYNC_BATCH)
+            if not dirty:
+                break
+            
+            new_records = []
+            updates = {}
+            versions = {}
+            adopt_failed = False
+            
+            for record, dirty_fields, version in dirty:
+                user_id = int(record['user_id'])
+                
+                if not sheets_manager.has_user(user_id):
+                    new_records.append(record)
+                    versions[user_id] = version
+                    continue
+                
+                if dirty_fields == ALL_FIELDS:
+                    # Новая локальная запись, а строка уже есть (клиент из CRM):
+                    # сначала забираем колонки админа, иначе выгрузка затрет их
+                    # значениями по умолчанию
+                    if not await self._adopt(user_id):
+                        adopt_failed = True
+                    continue
+                
+                versions[user_id] = version
+                updates[user_id] = {name: record[name] for name in dirty_fields.split(',')}
+            
+            synced = {}
+            
+            if new_records and await sheets_manager.append_users(new_records):
+                for record in new_records:
+                    user_id = int(record['user_id'])
+                    synced[user_id] = versions[user_id]
+            
+            if updates and await sheets_manager.update_users(updates):
+                for user_id in updates:
+                    synced[user_id] = versions[user_id]
+            
+            await user_repository.mark_synced(synced)
+            pushed += len(synced)
+            
+            # Таблица недоступна - повторим в следующем цикле
+            if len(synced) < len(versions) or adopt_failed:
+                break
+            
+            # Принятые строки выгрузятся следующей пачкой
+            if len(dirty) < self.config.SHEETS_SYNC_BATCH and len(versions) == len(dirty):
+                break
+        
+        if pushed:
+            logger.info(f"Pushed {pushed} users to Google Sheets")
+        
+        return pushed
+    
+    async def _adopt(self, user_id: int) -> bool:
+        """Забрать строку существующего в таблице пользователя в новую запись"""
+        record = await sheets_manager.get_user(user_id)
+        if not record:
+            return False
+        
+        await user_repository.merge_remote_users([record])
+        return True
+    
+    async def pull(self) -> int:
+        """Перенести в базу ручные правки из таблицы"""
+        records = await sheets_manager.get_all_users()
+        if not records:
+            return 0
+        
+        merged = await user_repository.merge_remote_users(records)
+        if merged:
+            logger.info(f"Pulled {merged} changes from Google Sheets")
+        
+        return merged
+    
+    async def _acquire(self) -> bool:
+        """При нескольких репликах синхронизирует только одна"""
+        return await acquire_lock('sheets_sync', self.config.SHEETS_SYNC_INTERVAL * 3)
+    
+    async def sync(self):
+        """Один цикл синхронизации"""
+        if not sheets_manager.sheet:
+            return
+        
+        if not await self._acquire():
+            return
+        
+        async with self._lock:
+            try:
+                await self.push()
+                
+                if time.monotonic() - self._last_pull >= self.config.SHEETS_PULL_INTERVAL:
+                    await self.pull()
+                    self._last_pull = time.monotonic()
+            except Exception as e:
+                logger.error(f"Google Sheets sync failed: {e}")
+    
+    async def pull_now(self) -> Optional[int]:
+        """Загрузить правки из таблицы вне расписания (кнопка админа)
+        
+        Идет под локом фоновой синхронизации, перед загрузкой выгружает
+        локальные изменения. None - синхронизацию ведет другая реплика.
+        """
+        if not await self._acquire():
+            return None
+        
+        async with self._lock:
+            await self.push()
+            merged = await self.pull()
+            self._last_pull = time.monotonic()
+            return merged
+    
+    async def run(self):
+        """Фоновая задача синхронизации"""
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.config.SHEETS_SYNC_INTERVAL)
+
+
+# Singleton instance
+sheets_sync = SheetsSync()
@@ -0,0 +1,209 @@
+"""Отложенная (write-behind) запись действий пользователей"""
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Any
+
+from bot.database.repository import user_repository
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingUpdate:
+    """Накопленные изменения одного пользователя"""
+    counters: Dict[str, int] = field(default_factory=dict)
+    problems: List[str] = field(default_factory=list)
+
+
+class WriteBehindQueue:
+    """Очередь событий пользователей с периодической пакетной записью
+    
+    Handlers только ставят событие в очередь (счетчик, проблема, активность)
+    и не ждут записи в базу. Раз в WRITE_BEHIND_INTERVAL секунд события
+    объединяются по пользователям и записываются одним update_users.
+    Каждое событие сначала дописывается в локальный журнал, поэтому после
+    падения процесса незаписанные события воспроизводятся при старте.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.journal_path = self.config.WRITE_BEHIND_JOURNAL
+        self._pending: Dict[int, PendingUpdate] = {}
+        self._journal = None
+        self._flush_lock = asyncio.Lock()
+    
+    def increment(self, user_id: int, field_name: str, amount: int = 1):
+        """Увеличить счетчик (materials_viewed, consultation_requests)"""
+        self._enqueue({'user_id': user_id, 'type': 'increment', 'field': field_name, 'amount': amount})
+    
+    def add_problem(self, user_id: int, problem: str):
+        """Добавить проблему в список"""
+        self._enqueue({'user_id': user_id, 'type': 'problem', 'problem': problem})
+    
+    def touch(self, user_id: int):
+        """Обновить last_activity"""
+        self._enqueue({'user_id': user_id, 'type': 'touch'})
+    
+    def _enqueue(self, event: Dict[str, Any]):
+        """Записать событие в журнал и в очередь"""
+        try:
+            journal = self._open_journal()
+            journal.write(json.dumps(event, ensure_ascii=False) + '\n')
+            journal.flush()
+        except OSError as e:
+            logger.error(f"Failed to write event to journal: {e}")
+        
+        self._apply(event)
+    
+    def _apply(self, event: Dict[str, Any]):
+        """Добавить событие к накопленным изменениям пользователя"""
+        pending = self._pending.setdefault(event['user_id'], PendingUpdate())
+        
+        if event['type'] == 'increment':
+            pending.counters[event['field']] = pending.counters.get(event['field'], 0) + event['amount']
+        elif event['type'] == 'problem':
+            if event['problem'] not in pending.problems:
+                pending.problems.append(event['problem'])
+    
+    def _open_journal(self):
+        """Открыть журнал на дозапись"""
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        return self._journal
+    
+    def _rotate_journal(self) -> str:
+        """Закрыть текущий журнал и переименовать его на время записи"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        
+        flushing_path = self.journal_path + '.flushing'
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, flushing_path)
+        return flushing_path
+    
+    def replay(self):
+        """Загрузить незаписанные события из журнала (вызывается при старте)"""
+        replayed = 0
+        
+        for path in (self.journal_path + '.flushing', self.journal_path):
+            if not os.path.exists(path):
+                continue
+            
+            with open(path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        self._apply(json.loads(line))
+                        replayed += 1
+                    except (ValueError, KeyError):
+                        logger.warning(f"Skipping corrupted journal line: {line!r}")
+        
+        if replayed:
+            logger.info(f"Replayed {replayed} events from write-behind journal")
+            # Переписываем журнал, чтобы он соответствовал очереди в памяти
+            self._rotate_journal()
+            self._write_pending_to_journal(self._pending)
+            os.remove(self.journal_path + '.flushing')
+    
+    @staticmethod
+    def _to_events(user_id: int, pending: PendingUpdate) -> List[Dict[str, Any]]:
+        """Развернуть накопленные изменения обратно в события"""
+        events = [{'user_id': user_id, 'type': 'touch'}]
+        events += [
+            {'user_id': user_id, 'type': 'increment', 'field': name, 'amount': amount}
+            for name, amount in pending.counters.items()
+        ]
+        events += [
+            {'user_id': user_id, 'type': 'problem', 'problem': problem}
+            for problem in pending.problems
+        ]
+        return events
+    
+    def _write_pending_to_journal(self, pending_by_user: Dict[int, PendingUpdate]):
+        """Записать накопленные изменения в журнал"""
+        journal = self._open_journal()
+        
+        for user_id, pending in pending_by_user.items():
+            for event in self._to_events(user_id, pending):
+                journal.write(json.dumps(event, ensure_ascii=False) + '\n')
+        
+        journal.flush()
+    
+    async def flush(self):
+        """Записать накопленные события в базу"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            
+            batch, self._pending = self._pending, {}
+            flushing_path = self._rotate_journal()
+            
+            try:
+                updates = await self._build_updates(batch)
+                # Счетчики уходят прибавками, их складывает база
+                increments = {
+                    user_id: batch[user_id].counters
+                    for user_id in updates if batch[user_id].counters
+                }
+                applied = await user_repository.update_users(updates, increments)
+                # Неизвестных пользователей _build_updates уже отбросил
+                failed = {user_id: batch[user_id] for user_id in updates if user_id not in applied}
+            except Exception as e:
+                logger.error(f"Failed to flush write-behind queue: {e}")
+                failed = batch
+            
+            if failed:
+                # Возвращаем в очередь и в новый журнал только незаписанные
+                # события, иначе записанные счетчики посчитаются дважды
+                for user_id, pending in failed.items():
+                    for event in self._to_events(user_id, pending):
+                        self._apply(event)
+                self._write_pending_to_journal(failed)
+                logger.warning(f"Write-behind failed for {len(failed)} users, requeued")
+            
+            if len(failed) < len(batch):
+                logger.info(f"Write-behind flushed {len(batch) - len(failed)} users")
+            
+            if os.path.exists(flushing_path):
+                os.remove(flushing_path)
+    
+    async def _build_updates(self, batch: Dict[int, PendingUpdate]) -> Dict[int, Dict[str, Any]]:
+        """Посчитать новые значения колонок (кроме счетчиков) по данным пользователей"""
+        updates = {}
+        
+        for user_id, pending in batch.items():
+            user_data = await user_repository.get_user(user_id)
+            if not user_data:
+                logger.warning(f"Dropping write-behind events for unknown user {user_id}")
+                continue
+            
+            user_updates = {}
+            
+            if pending.problems:
+                problems = user_data.get('problems_selected', '')
+                problems_list = problems.split(', ') if problems else []
+                for problem in pending.problems:
+                    if problem not in problems_list:
+                        problems_list.append(problem)
+                user_updates['problems_selected'] = ', '.join(problems_list)
+            
+            # Пустой словарь - обновятся только счетчики и last_activity
+            updates[user_id] = user_updates
+        
+        return updates
+    
+    async def run(self):
+        """Фоновая задача: периодически сбрасывать очередь"""
+        while True:
+            await asyncio.sleep(self.config.WRITE_BEHIND_INTERVAL)
+            await self.flush()
+
+
+# Singleton instance
+write_behind = WriteBehindQueue()
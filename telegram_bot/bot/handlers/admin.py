@@ -1,16 +1,38 @@
 """Handler для админской панели"""
 
 import logging
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+import os
+from datetime import datetime
+from aiogram import Router, F, html
+from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.exceptions import TelegramAPIError
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 
-from bot.keyboards.inline import get_admin_keyboard, get_back_button
+from bot.keyboards.inline import (
+    get_admin_keyboard, get_back_button, get_broadcast_segments_keyboard,
+    get_broadcast_confirm_keyboard, get_broadcast_progress_keyboard
+)
+from bot.keyboards.callbacks import BroadcastSegmentCallback, BroadcastStopCallback
+from bot.utils.texts import (
+    BROADCAST_INTRO, BROADCAST_ASK_PROBLEM, BROADCAST_ASK_MESSAGE, BROADCAST_CONFIRM,
+    EXPORT_USAGE, EXPORT_STARTED, EXPORT_EMPTY, EXPORT_TOO_LARGE, EXPORT_FAILED, EXPORT_DONE
+)
+from bot.database.broadcasts import broadcast_repository
+from bot.database.repository import user_repository
 from bot.database.sheets import sheets_manager
+from bot.database.sync import sheets_sync
 from bot.filters.admin import IsAdmin
+from bot.services.broadcast import broadcaster, format_progress, segment_title
+from bot.services.export import ExportFilter, export_users
+from bot.services.stats import stats
 
 logger = logging.getLogger(__name__)
 
+# Лимит размера файла, который бот может отправить
+MAX_DOCUMENT_SIZE = 50 * 2**20
+
 router = Router()
 
 
@@ -34,37 +56,45 @@ async def show_admin_panel(message: Message):
 async def show_stats(callback: CallbackQuery):
     """Показать статистику"""
     
+    # До первого пересчета счетчики пустые - не показываем нули
+    if not stats.ready:
+        await callback.answer("⏳ Статистика пересчитывается, попробуйте через минуту", show_alert=True)
+        return
+    
     try:
-        # Получаем данные из Google Sheets
-        all_users = sheets_manager.get_all_users()
-        
-        total_users = len(all_users)
-        paid_users = sum(1 for u in all_users if u.get('payment_status', '').upper() == 'TRUE')
-        
-        # Считаем статусы
-        statuses = {}
-        for user in all_users:
-            status = user.get('status', 'неизвестен')
-            statuses[status] = statuses.get(status, 0) + 1
+        # Счетчики в памяти, база не читается
+        data = stats.snapshot()
         
         text = f"""
 📊 <b>Статистика бота</b>
 
-<b>Всего пользователей:</b> {total_users}
-<b>С активной подпиской:</b> {paid_users}
-<b>Конверсия:</b> {(paid_users/total_users*100 if total_users > 0 else 0):.1f}%
+<b>Всего пользователей:</b> {data['total']}
+<b>С активной подпиской:</b> {data['paid']}
+<b>Конверсия:</b> {data['conversion']:.1f}%
 
 <b>По статусам:</b>
 """
         
-        for status, count in statuses.items():
-            text += f"• {status}: {count}\n"
+        for status, count in data['statuses']:
+            text += f"• {html.quote(status)}: {count}\n"
+        
+        text += "\n<b>Регистрации по дням:</b>\n"
+        for day, count in data['signups']:
+            text += f"• {day.strftime('%d.%m')}: {count}\n"
         
-        text += "\n<i>Данные из Google Sheets</i>"
+        cache_stats = user_repository.cache.stats()
+        text += (
+            f"\n<b>Кеш пользователей:</b> {cache_stats['size']}/{cache_stats['max_size']}, "
+            f"попаданий {cache_stats['hit_rate']*100:.0f}% "
+            f"({cache_stats['hits']}/{cache_stats['misses']}), "
+            f"вытеснений {cache_stats['evictions']}\n"
+        )
+        
+        text += "\n<i>Данные из локальной базы (зеркало в Google Sheets)</i>"
         
     except Exception as e:
         logger.error(f"Failed to get stats: {e}")
-        text = "❌ Ошибка при получении статистики. Проверьте подключение к Google Sheets."
+        text = "❌ Ошибка при получении статистики. Проверьте подключение к базе данных."
     
     await callback.message.edit_text(
         text,
@@ -79,30 +109,31 @@ async def show_users(callback: CallbackQuery):
     """Показать список пользователей"""
     
     try:
-        all_users = sheets_manager.get_all_users()
+        recent_users = await user_repository.get_recent_users(10)
+        total_users = stats.total
         
-        if not all_users:
+        if not recent_users:
             text = "👥 <b>Пользователи</b>\n\nПока нет зарегистрированных пользователей."
         else:
-            text = f"👥 <b>Пользователи ({len(all_users)})</b>\n\n"
+            text = f"👥 <b>Пользователи ({total_users})</b>\n\n"
             
             # Показываем последних 10 пользователей
-            for user in all_users[-10:]:
+            for user in recent_users:
                 username = user.get('username', 'нет username')
                 first_name = user.get('first_name', 'Без имени')
                 status = user.get('status', 'неизвестен')
                 payment = '✅' if user.get('payment_status', '').upper() == 'TRUE' else '❌'
                 
-                text += f"{payment} {first_name} (@{username}) - {status}\n"
+                text += f"{payment} {html.quote(first_name)} (@{html.quote(username)}) - {html.quote(status)}\n"
             
-            if len(all_users) > 10:
-                text += f"\n<i>Показаны последние 10 из {len(all_users)}</i>"
+            if total_users > len(recent_users):
+                text += f"\n<i>Показаны последние {len(recent_users)} из {total_users}</i>"
             
-            text += "\n\n<i>Полный список в Google Sheets</i>"
+            text += "\n\n<i>Полный список в Google Sheets или командой /export</i>"
     
     except Exception as e:
         logger.error(f"Failed to get users: {e}")
-        text = "❌ Ошибка при получении пользователей. Проверьте подключение к Google Sheets."
+        text = "❌ Ошибка при получении пользователей. Проверьте подключение к базе данных."
     
     await callback.message.edit_text(
         text,
@@ -112,22 +143,222 @@ async def show_users(callback: CallbackQuery):
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin_reindex", IsAdmin())
+async def reindex_sheet(callback: CallbackQuery):
+    """Перестроить индекс строк и забрать ручные правки из Google Sheets"""
+    
+    if not await sheets_manager.reindex():
+        await callback.answer("❌ Не удалось синхронизировать таблицу", show_alert=True)
+        return
+    
+    try:
+        merged = await sheets_sync.pull_now()
+    except Exception as e:
+        logger.error(f"Failed to pull Google Sheets: {e}")
+        await callback.answer("❌ Не удалось синхронизировать таблицу", show_alert=True)
+        return
+    
+    if merged is None:
+        await callback.answer("⏳ Синхронизацию ведет другой экземпляр бота, правки придут с ближайшим циклом", show_alert=True)
+    else:
+        await callback.answer(f"✅ Таблица синхронизирована, изменений: {merged}", show_alert=True)
+
+
+class BroadcastStates(StatesGroup):
+    """Состояния создания рассылки"""
+    waiting_for_problem = State()
+    waiting_for_message = State()
+    confirm = State()
+
+
 @router.callback_query(F.data == "admin_broadcast", IsAdmin())
-async def show_broadcast(callback: CallbackQuery):
-    """Рассылка"""
+async def show_broadcast(callback: CallbackQuery, state: FSMContext):
+    """Рассылка: прогресс текущей или выбор получателей новой"""
     
-    text = """
-📤 <b>Рассылка сообщений</b>
+    await state.clear()
+    
+    # Одновременно идет одна рассылка
+    running = await broadcast_repository.get_running()
+    if running:
+        await callback.message.edit_text(
+            format_progress(running[0]),
+            reply_markup=get_broadcast_progress_keyboard(running[0].id)
+        )
+    else:
+        await callback.message.edit_text(
+            BROADCAST_INTRO,
+            reply_markup=get_broadcast_segments_keyboard()
+        )
+    
+    await callback.answer()
 
-<i>Функция рассылки будет добавлена в следующей версии.</i>
 
-Сейчас вы можете отправлять сообщения пользователям вручную, 
-используя их ID из Google Sheets.
-"""
+async def ask_broadcast_message(state: FSMContext, segment: str, value: str = '') -> str:
+    """Запомнить сегмент и вернуть просьбу прислать сообщение"""
+    total = await user_repository.count_segment(segment, value)
+    
+    await state.set_state(BroadcastStates.waiting_for_message)
+    await state.update_data(segment=segment, segment_value=value, total=total)
+    
+    return BROADCAST_ASK_MESSAGE.format(segment=segment_title(segment, value), total=total)
+
+
+@router.callback_query(BroadcastSegmentCallback.filter(), IsAdmin())
+async def choose_broadcast_segment(
+    callback: CallbackQuery,
+    callback_data: BroadcastSegmentCallback,
+    state: FSMContext
+):
+    """Выбор получателей рассылки"""
+    
+    if callback_data.segment == 'problem':
+        await state.set_state(BroadcastStates.waiting_for_problem)
+        text = BROADCAST_ASK_PROBLEM
+    else:
+        text = await ask_broadcast_message(state, callback_data.segment)
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_back_button("menu")
+        reply_markup=get_back_button("broadcast_cancel", "❌ Отмена")
+    )
+    
+    await callback.answer()
+
+
+@router.message(BroadcastStates.waiting_for_problem, F.text, IsAdmin())
+async def process_broadcast_problem(message: Message, state: FSMContext):
+    """Проблема для сегмента рассылки"""
+    
+    text = await ask_broadcast_message(state, 'problem', message.text.strip()[:100])
+    
+    await message.answer(
+        text,
+        reply_markup=get_back_button("broadcast_cancel", "❌ Отмена")
+    )
+
+
+@router.message(BroadcastStates.waiting_for_message, IsAdmin())
+async def process_broadcast_message(message: Message, state: FSMContext):
+    """Сообщение для рассылки: показываем превью и просим подтвердить"""
+    
+    data = await state.get_data()
+    
+    try:
+        await message.send_copy(chat_id=message.chat.id)
+    except TelegramAPIError as e:
+        logger.error(f"Failed to copy broadcast preview: {e}")
+        await message.answer("❌ Это сообщение нельзя скопировать. Отправьте другое.")
+        return
+    
+    await state.update_data(from_chat_id=message.chat.id, message_id=message.message_id)
+    await state.set_state(BroadcastStates.confirm)
+    
+    await message.answer(
+        BROADCAST_CONFIRM.format(
+            segment=segment_title(data['segment'], data['segment_value']),
+            total=data['total']
+        ),
+        reply_markup=get_broadcast_confirm_keyboard()
+    )
+
+
+@router.callback_query(F.data == "broadcast_confirm", BroadcastStates.confirm, IsAdmin())
+async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
+    """Запустить рассылку"""
+    
+    data = await state.get_data()
+    await state.clear()
+    
+    broadcast = await broadcast_repository.create(
+        admin_id=callback.from_user.id,
+        from_chat_id=data['from_chat_id'],
+        message_id=data['message_id'],
+        segment=data['segment'],
+        segment_value=data['segment_value'],
+        total=data['total'],
+        progress_message_id=callback.message.message_id
+    )
+    
+    await callback.message.edit_text(
+        format_progress(broadcast),
+        reply_markup=get_broadcast_progress_keyboard(broadcast.id)
+    )
+    
+    broadcaster.start(callback.bot, broadcast)
+    await callback.answer("📤 Рассылка запущена")
+
+
+@router.callback_query(F.data == "broadcast_cancel", IsAdmin())
+async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
+    """Отменить создание рассылки"""
+    
+    await state.clear()
+    
+    await callback.message.edit_text(
+        "❌ Рассылка отменена",
+        reply_markup=get_back_button("menu", "🏠 Главное меню")
     )
     
     await callback.answer()
+
+
+@router.callback_query(BroadcastStopCallback.filter(), IsAdmin())
+async def stop_broadcast(callback: CallbackQuery, callback_data: BroadcastStopCallback):
+    """Остановить идущую рассылку"""
+    
+    broadcast = await broadcaster.stop(callback_data.id)
+    
+    if broadcast is None:
+        await callback.answer("Рассылка не найдена", show_alert=True)
+        return
+    
+    await callback.message.edit_text(
+        format_progress(broadcast),
+        reply_markup=get_back_button("menu", "🏠 Главное меню")
+    )
+    
+    await callback.answer("⏹ Рассылка остановлена")
+
+
+@router.message(Command("export"), IsAdmin())
+async def export_users_command(message: Message, command: CommandObject):
+    """Выгрузить пользователей в CSV: /export [status=...] [paid=yes|no] [from=...] [to=...] [gzip]"""
+    
+    try:
+        filters = ExportFilter.parse(command.args)
+    except ValueError:
+        await message.answer(EXPORT_USAGE)
+        return
+    
+    progress = await message.answer(EXPORT_STARTED)
+    path = None
+    
+    try:
+        path, rows = await export_users(filters)
+        
+        if rows == 0:
+            await progress.edit_text(EXPORT_EMPTY)
+            return
+        
+        size = os.path.getsize(path)
+        if size > MAX_DOCUMENT_SIZE:
+            await progress.edit_text(EXPORT_TOO_LARGE.format(
+                size=size // 2**20,
+                limit=MAX_DOCUMENT_SIZE // 2**20
+            ))
+            return
+        
+        filename = f"users_{datetime.now():%Y%m%d_%H%M}{'.csv.gz' if filters.compress else '.csv'}"
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=EXPORT_DONE.format(rows=rows)
+        )
+        await progress.delete()
+    
+    except Exception as e:
+        logger.error(f"Failed to export users: {e}")
+        await progress.edit_text(EXPORT_FAILED)
+    
+    finally:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
@@ -1,7 +1,11 @@
-"""Handler для записи на встречу"""
+"""Handler для записи на встречу
+
+Не подключен в create_dispatcher (раздел прежнего меню): get_booking_keyboard
+и тексты BOOKING_* отсутствуют, на раздел не ведет ни одна кнопка.
+"""
 
 import logging
-from aiogram import Router, F
+from aiogram import Router, F, html
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -9,6 +13,7 @@ from datetime import datetime
 
 from bot.keyboards.inline import get_booking_keyboard, get_back_to_menu
 from bot.utils.texts import BOOKING_TEXT, BOOKING_SUCCESS
+from bot.services.notifications import admin_notifier, user_label
 from config.config import Config
 
 logger = logging.getLogger(__name__)
@@ -60,20 +65,17 @@ async def process_booking(message: Message, state: FSMContext):
     admin_text = f"""
 🔔 <b>Новая заявка на встречу</b>
 
-<b>От:</b> {user.first_name} {user.last_name or ''} (@{user.username or 'нет username'})
+<b>От:</b> {user_label(user)}
 <b>ID:</b> <code>{user.id}</code>
 
 <b>Контакты:</b>
-{contact_info}
+{html.quote(contact_info or '')}
 
 <b>Дата заявки:</b> {message.date.strftime('%Y-%m-%d %H:%M:%S')}
 """
     
-    try:
-        await message.bot.send_message(config.ADMIN_ID, admin_text)
-        logger.info(f"Booking request sent to admin from user {user.id}")
-    except Exception as e:
-        logger.error(f"Failed to send booking request to admin: {e}")
+    admin_notifier.publish(admin_text)
+    logger.info(f"Booking request sent to admin from user {user.id}")
     
     # Отправляем подтверждение пользователю
     await message.answer(
@@ -1,17 +1,29 @@
 """Handler для раздела материалов"""
 
 import logging
-from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from typing import Optional
+from aiogram import Router, F, html
+from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 
 from bot.keyboards.inline import (
-    get_materials_menu, get_formats_menu, get_back_to_menu,
-    get_material_keyboard, get_subscription_keyboard
+    get_materials_menu, get_formats_menu, get_themes_menu, get_back_to_menu,
+    get_back_button, get_materials_list, get_subscription_keyboard
 )
 from bot.utils.texts import (
-    MATERIALS_INTRO, MATERIAL_LOCKED, SUBSCRIPTION_OFFER
+    MATERIALS_INTRO, SUBSCRIPTION_OFFER, MATERIAL_FORMATS, MATERIAL_THEMES
 )
-from bot.database.sheets import sheets_manager
+from bot.keyboards.callbacks import (
+    MaterialFormatCallback, MaterialThemeCallback, MaterialCallback, SearchPageCallback
+)
+from bot.database.materials import materials_repository
+from bot.database.repository import user_repository, Subscription
+from bot.database.write_behind import write_behind
+from bot.services.popularity import popularity
+from bot.services.search import search_index
+from bot.utils.access import access_policy
+from bot.utils.pagination import page_callbacks
 from config.config import Config
 
 logger = logging.getLogger(__name__)
@@ -23,63 +35,61 @@ config = Config()
 # ID закрытого канала с материалами
 MATERIALS_CHANNEL_ID = -1003702761962
 
-# Placeholder материалы (потом заменишь на реальные из БД)
-SAMPLE_MATERIALS = {
-    'video': [
-        {
-            'id': 1,
-            'title': 'Базовая практика для спины',
-            'description': 'Упражнения для расслабления мышц спины и улучшения осанки (15 минут)',
-            'message_id': 2,  # ID сообщения в канале
-            'category': 'back'
-        },
-practices = [
-    {
-        'id': 1,
-        'title': 'Приветствие',
-        'message_id': 5,  # ID сообщения в канале
-        'category': 'body_belly'
-    }
-]
+# Материалов на одном экране
+PAGE_SIZE = 5
 
+FORMAT_EMOJI = {'video': '🎥', 'article': '📄', 'audio': '🎧'}
 
 
+class SearchStates(StatesGroup):
+    """Состояния поиска материалов"""
+    waiting_for_query = State()
 
-        
-        # Добавь сюда больше видео по мере загрузки
-        # {
-        #     'id': 2,
-        #     'title': 'Утренняя энергия',
-        #     'description': 'Комплекс упражнений для бодрого начала дня (10 минут)',
-        #     'message_id': 3,
-        #     'category': 'fatigue'
-        # }
-    ],
-    'article': [
-        # {
-        #     'id': 3,
-        #     'title': '10 правил здоровой спины',
-        #     'description': 'Статья о том, как сохранить здоровье позвоночника',
-        #     'message_id': 4,  # ID сообщения с текстом в канале
-        #     'category': 'back'
-        # }
-    ],
-    'audio': [
-        # {
-        #     'id': 4,
-        #     'title': 'Медитация для сна',
-        #     'description': 'Расслабляющая медитация перед сном (20 минут)',
-        #     'message_id': 5,
-        #     'category': 'sleep'
-        # }
-    ]
-}
+
+async def leave_search(state: FSMContext):
+    """Перестать ждать запрос поиска (запрос для страниц результатов остается)"""
+    if await state.get_state() == SearchStates.waiting_for_query.state:
+        await state.set_state(None)
+
+
+async def check_access(callback: CallbackQuery, subscription: Optional[Subscription]) -> bool:
+    """Проверить подписку и показать предложение, если ее нет"""
+    
+    # Статус подписки обычно уже получен в SubscriptionMiddleware
+    if subscription is None:
+        subscription = await user_repository.get_subscription(callback.from_user.id)
+    
+    if subscription.active:
+        return True
+    
+    await callback.message.edit_text(
+        SUBSCRIPTION_OFFER.format(price=config.SUBSCRIPTION_PRICE),
+        reply_markup=get_subscription_keyboard(config.SUBSCRIPTION_PRICE)
+    )
+    await callback.answer("🔒 Требуется подписка")
+    return False
+
+
+def format_materials(title: str, materials: list) -> str:
+    """Текст со списком материалов"""
+    text = f"<b>{title}</b>\n\n"
+    
+    for material in materials:
+        text += f"{FORMAT_EMOJI.get(material.format, '📄')} <b>{material.title}</b>\n"
+        if material.description:
+            text += f"<i>{material.description}</i>\n"
+        text += "\n"
+    
+    return text
 
 
 @router.callback_query(F.data == "materials")
-async def show_materials(callback: CallbackQuery, requires_subscription: bool = False):
+async def show_materials(callback: CallbackQuery, state: FSMContext):
     """Показать раздел материалов"""
     
+    # Назад из поиска
+    await leave_search(state)
+    
     await callback.message.edit_text(
         MATERIALS_INTRO,
         reply_markup=get_materials_menu()
@@ -102,52 +112,40 @@ async def show_formats(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("format_"))
-async def show_materials_by_format(callback: CallbackQuery, requires_subscription: bool = False):
+access_policy.paid(MaterialFormatCallback)
+
+
+@router.callback_query(MaterialFormatCallback.filter())
+async def show_materials_by_format(
+    callback: CallbackQuery,
+    callback_data: MaterialFormatCallback,
+    subscription: Optional[Subscription] = None
+):
     """Показать материалы выбранного формата"""
     
-    format_type = callback.data.split('_')[1]
-    user_id = callback.from_user.id
-    
-    # Проверяем подписку
-    has_access = sheets_manager.check_payment_status(user_id)
-    
-    if not has_access and requires_subscription:
-        # Показываем предложение оформить подписку
-        await callback.message.edit_text(
-            SUBSCRIPTION_OFFER.format(price=config.SUBSCRIPTION_PRICE),
-            reply_markup=get_subscription_keyboard(config.SUBSCRIPTION_PRICE)
-        )
-        await callback.answer("🔒 Требуется подписка")
+    if not await check_access(callback, subscription):
         return
     
-    # Получаем материалы выбранного формата
-    materials = SAMPLE_MATERIALS.get(format_type, [])
+    page = materials_repository.by_format(callback_data.format, callback_data.cursor, PAGE_SIZE)
     
-    if not materials:
+    if not page.items:
         await callback.message.edit_text(
             "Материалы этого формата скоро появятся! 🎬",
-            reply_markup=get_back_to_menu()
+            reply_markup=get_formats_menu()
         )
         await callback.answer()
         return
     
-    # Формируем список материалов
-    text = f"<b>📚 Материалы ({format_type}):</b>\n\n"
-    
-    for mat in materials[:5]:  # Показываем первые 5
-        emoji = "🎥" if format_type == "video" else "📄" if format_type == "article" else "🎧"
-        text += f"{emoji} <b>{mat['title']}</b>\n"
-        text += f"<i>{mat['description']}</i>\n\n"
-    
-    if has_access:
-        text += "✅ У вас есть доступ ко всем материалам!"
-    else:
-        text += "🔒 Для доступа нужна подписка"
+    title = MATERIAL_FORMATS.get(callback_data.format, 'Материалы')
+    prev_data, next_data = page_callbacks(
+        page, lambda cursor: MaterialFormatCallback(format=callback_data.format, cursor=cursor).pack()
+    )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_material_keyboard(1, has_access)
+        format_materials(f"{title} ({page.total})", page.items),
+        reply_markup=get_materials_list(
+            page.items, "materials_format", prev_data=prev_data, next_data=next_data
+        )
     )
     
     await callback.answer()
@@ -157,69 +155,55 @@ async def show_materials_by_format(callback: CallbackQuery, requires_subscriptio
 async def show_themes(callback: CallbackQuery):
     """Показать темы материалов"""
     
-    from bot.keyboards.inline import InlineKeyboardBuilder, InlineKeyboardButton
-    
-    builder = InlineKeyboardBuilder()
-    
-    # Добавляем кнопки для каждой темы
-    builder.row(InlineKeyboardButton(text="🧘 Позвоночник и осанка", callback_data="theme_back"))
-    builder.row(InlineKeyboardButton(text="🌬 Дыхательные практики", callback_data="theme_breathing"))
-    builder.row(InlineKeyboardButton(text="⚡ Работа с энергией", callback_data="theme_energy"))
-    builder.row(InlineKeyboardButton(text="😌 Снятие напряжения", callback_data="theme_relaxation"))
-    builder.row(InlineKeyboardButton(text="💪 Укрепление тела", callback_data="theme_strength"))
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="materials"))
-    
-    text = """
-📂 <b>Материалы по темам:</b>
-
-Выберите тему в разделе "У меня проблема" 👇
-"""
+    text = "📂 <b>Материалы по темам:</b>\n\nВыберите тему 👇"
     
     await callback.message.edit_text(
         text,
-        reply_markup=builder.as_markup()
+        reply_markup=get_themes_menu()
     )
     
     await callback.answer()
 
 
+access_policy.paid("materials_popular")
+
+
 @router.callback_query(F.data == "materials_popular")
-async def show_popular(callback: CallbackQuery, requires_subscription: bool = False):
+async def show_popular(callback: CallbackQuery, subscription: Optional[Subscription] = None):
     """Показать популярные материалы"""
     
-    user_id = callback.from_user.id
-    has_access = sheets_manager.check_payment_status(user_id)
+    if not await check_access(callback, subscription):
+        return
+    
+    # Берем с запасом: материалы могли удалить из каталога
+    top = popularity.top(PAGE_SIZE * 2)
+    materials = [
+        (material, views) for material_id, views in top
+        if (material := materials_repository.get(material_id)) is not None
+    ][:PAGE_SIZE]
     
-    if not has_access and requires_subscription:
+    if not materials:
         await callback.message.edit_text(
-            SUBSCRIPTION_OFFER.format(price=config.SUBSCRIPTION_PRICE),
-            reply_markup=get_subscription_keyboard(config.SUBSCRIPTION_PRICE)
+            "🔥 <b>Популярные материалы</b>\n\n<i>Пока нет просмотров - загляните позже!</i>",
+            reply_markup=get_back_button("materials")
         )
-        await callback.answer("🔒 Требуется подписка")
+        await callback.answer()
         return
     
-    text = """
-🔥 <b>Популярные материалы:</b>
-
-1. 🎥 Базовая практика для спины (500+ просмотров)
-2. 🎥 Утренняя энергия (450+ просмотров)
-3. 🎧 Медитация для сна (400+ просмотров)
-4. 📄 10 правил здоровой спины (380+ просмотров)
-5. 🎥 Дыхание для расслабления (350+ просмотров)
-
-<i>Скоро здесь появятся реальные материалы!</i>
-"""
+    text = "🔥 <b>Популярные материалы:</b>\n\n"
+    for position, (material, views) in enumerate(materials, start=1):
+        text += f"{position}. {FORMAT_EMOJI.get(material.format, '📄')} {material.title} ({views} просмотров)\n"
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_back_to_menu()
+        reply_markup=get_materials_list([material for material, _ in materials], "materials")
     )
     
     await callback.answer()
 
 
 @router.callback_query(F.data == "materials_search")
-async def show_search(callback: CallbackQuery):
+async def show_search(callback: CallbackQuery, state: FSMContext):
     """Поиск материалов"""
     
     text = """
@@ -228,141 +212,158 @@ async def show_search(callback: CallbackQuery):
 Напишите ключевое слово для поиска материалов.
 
 Например: <i>спина, усталость, сон, энергия</i>
-
-<i>Функция поиска будет добавлена в следующей версии!</i>
 """
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_back_to_menu()
+        reply_markup=get_back_button("materials")
     )
     
+    await state.set_state(SearchStates.waiting_for_query)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("theme_"))
-async def show_materials_by_theme(callback: CallbackQuery, requires_subscription: bool = False):
-    """Показать материалы выбранной темы"""
+@router.message(SearchStates.waiting_for_query, F.text, ~F.text.startswith('/'))
+async def process_search_query(message: Message, state: FSMContext):
+    """Поиск по тексту запроса"""
     
-    theme = callback.data.split('_')[1]
-    user_id = callback.from_user.id
+    query = message.text.strip()[:100]
+    await state.update_data(search_query=query)
     
-    # Проверяем подписку
-    has_access = sheets_manager.check_payment_status(user_id)
+    text, keyboard = render_search_page(query, 0)
     
-    if not has_access and requires_subscription:
-        await callback.message.edit_text(
-            SUBSCRIPTION_OFFER.format(price=config.SUBSCRIPTION_PRICE),
-            reply_markup=get_subscription_keyboard(config.SUBSCRIPTION_PRICE)
-        )
-        await callback.answer("🔒 Требуется подписка")
+    await message.answer(text, reply_markup=keyboard)
+    
+    # Следующие сообщения - уже не запрос; новый поиск - кнопкой "Поиск"
+    await leave_search(state)
+
+
+@router.callback_query(SearchPageCallback.filter())
+async def show_search_page(callback: CallbackQuery, callback_data: SearchPageCallback, state: FSMContext):
+    """Страница результатов поиска"""
+    
+    data = await state.get_data()
+    query = data.get('search_query')
+    
+    if not query:
+        await callback.answer("Поиск устарел, начните заново", show_alert=True)
         return
     
-    # Маппинг тем на категории
-    theme_map = {
-        'back': '🧘 Позвоночник и осанка',
-        'breathing': '🌬 Дыхательные практики',
-        'energy': '⚡ Работа с энергией',
-        'relaxation': '😌 Снятие напряжения',
-        'strength': '💪 Укрепление тела'
-    }
-    
-    theme_title = theme_map.get(theme, 'Материалы')
-    
-    # Получаем материалы по теме (пока placeholder)
-    text = f"<b>{theme_title}</b>\n\n"
-    
-    # Фильтруем материалы по категории
-    found_materials = []
-    for format_type, materials_list in SAMPLE_MATERIALS.items():
-        for mat in materials_list:
-            if mat.get('category') == theme or theme == 'back':  # back показываем пока для примера
-                found_materials.append(mat)
-    
-    if found_materials:
-        text += "Доступные материалы:\n\n"
-        for mat in found_materials:
-            emoji = "🎥" if 'message_id' in mat else "📄"
-            text += f"{emoji} <b>{mat['title']}</b>\n"
-            text += f"<i>{mat['description']}</i>\n\n"
-    else:
-        text += "Материалы по этой теме скоро появятся! 🎬\n\n"
+    text, keyboard = render_search_page(query, callback_data.page)
     
-    if has_access:
-        text += "✅ У вас есть доступ ко всем материалам!"
-    else:
-        text += "🔒 Для доступа нужна подписка"
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+
+def render_search_page(query: str, page: int):
+    """Текст и клавиатура страницы результатов поиска"""
+    results = search_index.search(query)
+    
+    if not results:
+        text = (
+            f"🔍 По запросу <b>{html.quote(query)}</b> ничего не найдено.\n\n"
+            "Попробуйте другое слово."
+        )
+        return text, get_back_button("materials")
+    
+    # Результаты упорядочены по релевантности, а не по id, поэтому
+    # страницы поиска - по номеру, а не по курсору
+    page = max(0, min(page, (len(results) - 1) // PAGE_SIZE))
+    materials = results[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    prev_data = SearchPageCallback(page=page - 1).pack() if page > 0 else None
+    next_data = SearchPageCallback(page=page + 1).pack() if (page + 1) * PAGE_SIZE < len(results) else None
+    
+    title = f"🔍 Найдено: {len(results)} (запрос: {html.quote(query)})"
+    keyboard = get_materials_list(materials, "materials", prev_data=prev_data, next_data=next_data)
+    return format_materials(title, materials), keyboard
+
+
+access_policy.paid(MaterialThemeCallback)
+
+
+@router.callback_query(MaterialThemeCallback.filter())
+async def show_materials_by_theme(
+    callback: CallbackQuery,
+    callback_data: MaterialThemeCallback,
+    subscription: Optional[Subscription] = None
+):
+    """Показать материалы выбранной темы"""
     
-    from bot.keyboards.inline import InlineKeyboardBuilder, InlineKeyboardButton
-    builder = InlineKeyboardBuilder()
+    if not await check_access(callback, subscription):
+        return
     
-    # Добавляем кнопки материалов если есть доступ
-    if has_access and found_materials:
-        for mat in found_materials[:3]:  # Показываем первые 3
-            builder.row(InlineKeyboardButton(
-                text=f"📥 {mat['title'][:30]}...", 
-                callback_data=f"get_material_{mat['id']}"
-            ))
+    page = materials_repository.by_category(callback_data.theme, callback_data.cursor, PAGE_SIZE)
+    title = MATERIAL_THEMES.get(callback_data.theme, 'Материалы')
     
-    builder.row(InlineKeyboardButton(text="🔙 Назад к темам", callback_data="materials_theme"))
+    if page.items:
+        text = format_materials(f"{title} ({page.total})", page.items)
+    else:
+        text = f"<b>{title}</b>\n\nМатериалы по этой теме скоро появятся! 🎬"
+    
+    prev_data, next_data = page_callbacks(
+        page, lambda cursor: MaterialThemeCallback(theme=callback_data.theme, cursor=cursor).pack()
+    )
     
     await callback.message.edit_text(
         text,
-        reply_markup=builder.as_markup()
+        reply_markup=get_materials_list(
+            page.items, "materials_theme", "🔙 Назад к темам",
+            prev_data=prev_data, next_data=next_data
+        )
     )
     
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("get_material_"))
-async def get_material(callback: CallbackQuery):
+access_policy.paid(MaterialCallback)
+
+
+@router.callback_query(MaterialCallback.filter())
+async def get_material(
+    callback: CallbackQuery,
+    callback_data: MaterialCallback,
+    subscription: Optional[Subscription] = None
+):
     """Получить конкретный материал"""
     
-    material_id = int(callback.data.split('_')[2])
     user_id = callback.from_user.id
     
-    # Проверяем доступ
-    has_access = sheets_manager.check_payment_status(user_id)
+    # Проверяем доступ (статус обычно уже получен в SubscriptionMiddleware)
+    if subscription is None:
+        subscription = await user_repository.get_subscription(user_id)
     
-    if not has_access:
+    if not subscription.active:
         await callback.answer("🔒 Требуется подписка", show_alert=True)
         return
     
-    # Ищем материал по ID
-    material = None
-    for format_type, materials_list in SAMPLE_MATERIALS.items():
-        for mat in materials_list:
-            if mat['id'] == material_id:
-                material = mat
-                break
-        if material:
-            break
-    
-    if not material:
+    material = materials_repository.get(callback_data.id)
+    
+    if not material or material.message_id is None:
         await callback.answer("Материал не найден", show_alert=True)
         return
     
     # Увеличиваем счетчик просмотров
-    sheets_manager.increment_counter(user_id, 'materials_viewed')
+    write_behind.increment(user_id, 'materials_viewed')
     
     try:
         # Пересылаем сообщение из канала пользователю
         await callback.bot.forward_message(
             chat_id=user_id,
             from_chat_id=MATERIALS_CHANNEL_ID,
-            message_id=material['message_id']
+            message_id=material.message_id
         )
+        popularity.record(material.id)
         
         await callback.answer("✅ Материал отправлен!")
         
         # Отправляем подтверждение с кнопкой возврата в меню
         await callback.message.answer(
-            f"📥 <b>{material['title']}</b>\n\n"
-            f"<i>{material['description']}</i>\n\n"
-            "Материал отправлен выше ⬆️",
+            f"📥 <b>{material.title}</b>\n\n"
+            + (f"<i>{material.description}</i>\n\n" if material.description else "")
+            + "Материал отправлен выше ⬆️",
             reply_markup=get_back_to_menu()
         )
-        
+    
     except Exception as e:
         logger.error(f"Failed to forward material: {e}")
         await callback.answer("❌ Ошибка при отправке материала", show_alert=True)
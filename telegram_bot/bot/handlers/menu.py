@@ -2,8 +2,10 @@
 
 import logging
 from aiogram import Router, F
+from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
+from bot.handlers.materials import leave_search
 from bot.keyboards.inline import get_main_menu
 from bot.utils.texts import MAIN_MENU_TEXT
 
@@ -13,9 +15,11 @@ router = Router()
 
 
 @router.callback_query(F.data == "menu")
-async def show_menu(callback: CallbackQuery):
+async def show_menu(callback: CallbackQuery, state: FSMContext):
     """Показать главное меню"""
     
+    await leave_search(state)
+    
     await callback.message.edit_text(
         MAIN_MENU_TEXT,
         reply_markup=get_main_menu()
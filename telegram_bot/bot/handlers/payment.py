@@ -1,17 +1,24 @@
 """Handler для оплаты и подписки"""
 
 import logging
-from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message
-from datetime import datetime
+from typing import Optional, Tuple, Dict, Any
+from aiogram import Router, F, html
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import CallbackQuery, Message, LabeledPrice, PreCheckoutQuery
+from datetime import datetime, timedelta
 
 from bot.keyboards.inline import (
     get_subscription_keyboard, get_payment_keyboard, get_main_menu
 )
 from bot.utils.texts import (
-    SUBSCRIPTION_OFFER, SUBSCRIPTION_SUCCESS, PAYMENT_REMINDER
+    SUBSCRIPTION_OFFER, SUBSCRIPTION_SUCCESS, PAYMENT_REMINDER,
+    INVOICE_TITLE, INVOICE_DESCRIPTION, INVOICE_TEST_NOTE, PAYMENT_CHECK_FAILED,
+    PAYMENT_ACTIVATION_FAILED, ADMIN_PAYMENT_ACTIVATED, HOW_TO_PAY_INVOICE, HOW_TO_PAY_MANUAL
 )
-from bot.database.sheets import sheets_manager
+from bot.database.models import Payment
+from bot.database.repository import user_repository
+from bot.services.jobs import job_scheduler
+from bot.services.notifications import admin_notifier, user_label
 from config.config import Config
 
 logger = logging.getLogger(__name__)
@@ -19,6 +26,28 @@ logger = logging.getLogger(__name__)
 router = Router()
 config = Config()
 
+# Валюта счета Telegram Payments (сумма - в копейках)
+CURRENCY = 'RUB'
+
+# Вид отложенной задачи напоминания об оплате
+PAYMENT_REMINDER_JOB = 'payment_reminder'
+
+
+def build_payload(user_id: int, days: int) -> str:
+    """Payload счета: кому и на сколько дней подписка"""
+    return f"sub:{user_id}:{days}"
+
+
+def parse_payload(payload: str) -> Optional[Tuple[int, int]]:
+    """(user_id, days) из payload счета или None"""
+    try:
+        kind, user_id, days = payload.split(':')
+        if kind != 'sub':
+            return None
+        return int(user_id), int(days)
+    except ValueError:
+        return None
+
 
 @router.callback_query(F.data == "subscribe")
 async def show_subscription_offer(callback: CallbackQuery):
@@ -40,6 +69,11 @@ async def show_subscription_offer(callback: CallbackQuery):
 async def show_subscription_info(callback: CallbackQuery):
     """Подробная информация о подписке"""
     
+    if config.PAYMENT_PROVIDER_TOKEN:
+        how_to_pay = HOW_TO_PAY_INVOICE
+    else:
+        how_to_pay = HOW_TO_PAY_MANUAL.format(price=config.SUBSCRIPTION_PRICE)
+    
     text = f"""
 📦 <b>Подробнее о подписке</b>
 
@@ -54,14 +88,7 @@ async def show_subscription_info(callback: CallbackQuery):
 <b>Стоимость:</b> {config.SUBSCRIPTION_PRICE}₽ в месяц
 <b>Срок действия:</b> {config.SUBSCRIPTION_DURATION_DAYS} дней
 
-<b>Как оплатить:</b>
-1. Нажмите "Оплатить"
-2. Переведите {config.SUBSCRIPTION_PRICE}₽ любым удобным способом
-3. Нажмите "Я оплатил"
-4. Доступ откроется автоматически после проверки
-
-<i>💡 Сейчас идет тестовый период, поэтому оплата происходит вручную.
-Скоро добавим автоматическую оплату!</i>
+{how_to_pay}
 """
     
     await callback.message.edit_text(
@@ -78,8 +105,15 @@ async def process_payment(callback: CallbackQuery):
     
     user = callback.from_user
     
-    # В будущем здесь будет интеграция с платежной системой
-    # Пока показываем инструкцию для ручной оплаты
+    await schedule_payment_reminder(user.id, user.first_name)
+    
+    # С PAYMENT_PROVIDER_TOKEN - счет Telegram Payments, подписка
+    # активируется автоматически в process_successful_payment
+    if config.PAYMENT_PROVIDER_TOKEN:
+        await send_subscription_invoice(callback)
+        return
+    
+    # Без платежного провайдера - инструкция для ручной оплаты
     
     text = f"""
 💳 <b>Оплата подписки</b>
@@ -101,8 +135,8 @@ async def process_payment(callback: CallbackQuery):
 <i>Администратор проверит оплату и активирует подписку в течение нескольких минут</i>
 """
     
-    # Обновляем статус в Google Sheets
-    sheets_manager.update_user(user.id, {'status': 'ожидает оплату'})
+    # Обновляем статус
+    await user_repository.update_user(user.id, {'status': 'ожидает оплату'})
     
     await callback.message.edit_text(
         text,
@@ -113,7 +147,7 @@ async def process_payment(callback: CallbackQuery):
     admin_text = f"""
 💰 <b>Запрос на оплату</b>
 
-<b>От:</b> {user.first_name} {user.last_name or ''} (@{user.username or 'нет username'})
+<b>От:</b> {user_label(user)}
 <b>ID:</b> <code>{user.id}</code>
 
 <b>Сумма:</b> {config.SUBSCRIPTION_PRICE}₽
@@ -122,13 +156,103 @@ async def process_payment(callback: CallbackQuery):
 <i>Ожидает подтверждения оплаты</i>
 """
     
+    admin_notifier.publish(admin_text)
+    logger.info(f"Payment request sent to admin from user {user.id}")
+    
+    await callback.answer()
+
+
+async def send_subscription_invoice(callback: CallbackQuery):
+    """Отправить счет на подписку"""
+    
+    days = config.SUBSCRIPTION_DURATION_DAYS
+    description = INVOICE_DESCRIPTION.format(days=days)
+    if config.TEST_PAYMENT:
+        description += INVOICE_TEST_NOTE
+    
+    await callback.message.answer_invoice(
+        title=INVOICE_TITLE,
+        description=description,
+        payload=build_payload(callback.from_user.id, days),
+        provider_token=config.PAYMENT_PROVIDER_TOKEN,
+        currency=CURRENCY,
+        prices=[LabeledPrice(label=INVOICE_TITLE, amount=config.SUBSCRIPTION_PRICE * 100)]
+    )
+    
+    await user_repository.update_user(callback.from_user.id, {'status': 'ожидает оплату'})
+    await callback.answer()
+
+
+@router.pre_checkout_query()
+async def process_pre_checkout(query: PreCheckoutQuery):
+    """Проверка счета перед списанием (Telegram ждет ответ 10 секунд)"""
+    
+    parsed = parse_payload(query.invoice_payload)
+    
+    # Счет выставлен этому пользователю и по текущей цене
+    valid = (
+        parsed is not None
+        and parsed[0] == query.from_user.id
+        and query.currency == CURRENCY
+        and query.total_amount == config.SUBSCRIPTION_PRICE * 100
+    )
+    
+    if valid:
+        await query.answer(ok=True)
+    else:
+        logger.warning(f"Rejected pre-checkout {query.id} from user {query.from_user.id}: {query.invoice_payload}")
+        await query.answer(ok=False, error_message=PAYMENT_CHECK_FAILED)
+
+
+@router.message(F.successful_payment)
+async def process_successful_payment(message: Message):
+    """Активировать подписку после оплаты"""
+    
+    payment = message.successful_payment
+    user = message.from_user
+    parsed = parse_payload(payment.invoice_payload)
+    days = parsed[1] if parsed else config.SUBSCRIPTION_DURATION_DAYS
+    
     try:
-        await callback.bot.send_message(config.ADMIN_ID, admin_text)
-        logger.info(f"Payment request sent to admin from user {user.id}")
+        end_date = await user_repository.apply_payment(Payment(
+            telegram_payment_charge_id=payment.telegram_payment_charge_id,
+            provider_payment_charge_id=payment.provider_payment_charge_id or '',
+            user_id=user.id,
+            amount=payment.total_amount,
+            currency=payment.currency,
+            payload=payment.invoice_payload,
+            days=days
+        ))
     except Exception as e:
-        logger.error(f"Failed to send payment request to admin: {e}")
+        logger.error(f"Failed to apply payment {payment.telegram_payment_charge_id}: {e}")
+        await message.answer(PAYMENT_ACTIVATION_FAILED)
+        admin_notifier.publish(
+            f"⚠️ Не удалось активировать оплату <code>{payment.telegram_payment_charge_id}</code> "
+            f"пользователя <code>{user.id}</code>: {html.quote(str(e))}"
+        )
+        return
     
-    await callback.answer()
+    # Повторная доставка того же платежа - подписка уже продлена
+    if end_date is None:
+        logger.info(f"Payment {payment.telegram_payment_charge_id} already applied")
+        return
+    
+    logger.info(f"Subscription activated for user {user.id} until {end_date}")
+    
+    await message.answer(
+        SUBSCRIPTION_SUCCESS.format(days=days),
+        reply_markup=get_main_menu()
+    )
+    
+    admin_text = ADMIN_PAYMENT_ACTIVATED.format(
+        sender=user_label(user),
+        user_id=user.id,
+        amount=payment.total_amount // 100,
+        charge_id=payment.telegram_payment_charge_id,
+        end_date=end_date.strftime('%d.%m.%Y')
+    )
+    
+    admin_notifier.publish(admin_text)
 
 
 @router.callback_query(F.data == "payment_confirm")
@@ -138,7 +262,7 @@ async def confirm_payment(callback: CallbackQuery):
     user = callback.from_user
     
     # Обновляем статус
-    sheets_manager.update_user(user.id, {'status': 'подтвердил оплату'})
+    await user_repository.update_user(user.id, {'status': 'подтвердил оплату'})
     
     text = """
 ✅ <b>Заявка принята!</b>
@@ -161,7 +285,7 @@ async def confirm_payment(callback: CallbackQuery):
     admin_text = f"""
 ✅ <b>Пользователь подтвердил оплату</b>
 
-<b>От:</b> {user.first_name} {user.last_name or ''} (@{user.username or 'нет username'})
+<b>От:</b> {user_label(user)}
 <b>ID:</b> <code>{user.id}</code>
 
 <b>Сумма:</b> {config.SUBSCRIPTION_PRICE}₽
@@ -175,27 +299,62 @@ async def confirm_payment(callback: CallbackQuery):
 <i>После этого пользователь автоматически получит доступ!</i>
 """
     
-    try:
-        await callback.bot.send_message(config.ADMIN_ID, admin_text)
-        logger.info(f"Payment confirmation sent to admin from user {user.id}")
-    except Exception as e:
-        logger.error(f"Failed to send payment confirmation to admin: {e}")
+    admin_notifier.publish(admin_text)
+    logger.info(f"Payment confirmation sent to admin from user {user.id}")
     
     await callback.answer("✅ Заявка отправлена")
 
 
-# Функция для отправки напоминания об оплате (вызывается через 10 минут)
+def payment_reminder_key(user_id: int) -> str:
+    """Ключ задачи напоминания (одно напоминание на пользователя)"""
+    return f"{PAYMENT_REMINDER_JOB}:{user_id}"
+
+
+async def schedule_payment_reminder(user_id: int, first_name: str):
+    """Напомнить об оплате через PAYMENT_REMINDER_DELAY секунд"""
+    if config.PAYMENT_REMINDER_DELAY <= 0:
+        return
+    
+    try:
+        await job_scheduler.schedule(
+            PAYMENT_REMINDER_JOB,
+            payment_reminder_key(user_id),
+            timedelta(seconds=config.PAYMENT_REMINDER_DELAY),
+            {'user_id': user_id, 'first_name': first_name}
+        )
+    except Exception as e:
+        logger.error(f"Failed to schedule payment reminder for user {user_id}: {e}")
+
+
+def cancel_payment_reminder(user_id: int, end_date: Optional[datetime]):
+    """Отменить напоминание, когда подписка активирована (оплатой или в Sheets)"""
+    if end_date is not None:
+        job_scheduler.cancel(payment_reminder_key(user_id))
+
+
+user_repository.on_subscription_change(cancel_payment_reminder)
+
+
+async def run_payment_reminder(bot, payload: Dict[str, Any]):
+    """Обработчик отложенной задачи напоминания"""
+    await send_payment_reminder(bot, payload['user_id'], payload['first_name'])
+
+
+job_scheduler.register(PAYMENT_REMINDER_JOB, run_payment_reminder)
+
+
+# Функция для отправки напоминания об оплате (планируется в process_payment)
 async def send_payment_reminder(bot, user_id: int, first_name: str):
     """Отправить напоминание об оплате"""
     
     # Проверяем, не оплатил ли уже
-    has_paid = sheets_manager.check_payment_status(user_id)
+    has_paid = await user_repository.check_payment_status(user_id)
     
     if has_paid:
         return
     
     text = PAYMENT_REMINDER.format(
-        first_name=first_name,
+        first_name=html.quote(first_name),
         price=config.SUBSCRIPTION_PRICE
     )
     
@@ -206,5 +365,8 @@ async def send_payment_reminder(bot, user_id: int, first_name: str):
             reply_markup=get_subscription_keyboard(config.SUBSCRIPTION_PRICE)
         )
         logger.info(f"Payment reminder sent to user {user_id}")
+    except TelegramRetryAfter:
+        # Повтор после паузы - в JobScheduler._execute
+        raise
     except Exception as e:
         logger.error(f"Failed to send payment reminder to user {user_id}: {e}")
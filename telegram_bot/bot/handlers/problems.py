@@ -1,7 +1,12 @@
-"""Handler для раздела "У меня проблема" """
+"""Handler для раздела "У меня проблема"
+
+Не подключен в create_dispatcher (раздел прежнего меню): клавиатуры
+get_problems_menu, get_consultation_keyboard и тексты PROBLEMS*
+отсутствуют, на раздел не ведет ни одна кнопка.
+"""
 
 import logging
-from aiogram import Router, F
+from aiogram import Router, F, html
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -13,7 +18,9 @@ from bot.utils.texts import (
     PROBLEMS_INTRO, PROBLEMS, PROBLEM_MATERIALS,
     NO_MATERIALS_FOUND, CONSULTATION_REQUEST_SENT
 )
-from bot.database.sheets import sheets_manager
+from bot.keyboards.callbacks import ProblemCallback
+from bot.database.write_behind import write_behind
+from bot.services.notifications import admin_notifier, user_label
 from config.config import Config
 
 logger = logging.getLogger(__name__)
@@ -39,11 +46,11 @@ async def show_problems(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("problem_"))
-async def show_problem_materials(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ProblemCallback.filter())
+async def show_problem_materials(callback: CallbackQuery, callback_data: ProblemCallback, state: FSMContext):
     """Показать материалы для выбранной проблемы"""
     
-    problem_key = callback.data.split('_')[1]
+    problem_key = callback_data.key
     user_id = callback.from_user.id
     
     # Обрабатываем "Другое"
@@ -67,8 +74,8 @@ async def show_problem_materials(callback: CallbackQuery, state: FSMContext):
         await callback.answer("Проблема не найдена", show_alert=True)
         return
     
-    # Сохраняем проблему в Google Sheets
-    sheets_manager.add_problem(user_id, problem_info['title'])
+    # Сохраняем проблему (запишется в фоне)
+    write_behind.add_problem(user_id, problem_info['title'])
     
     # Формируем список материалов (placeholder)
     text = PROBLEM_MATERIALS.format(problem_title=problem_info['title'])
@@ -97,29 +104,24 @@ async def process_consultation_request(message: Message, state: FSMContext):
     user = message.from_user
     description = message.text
     
-    # Сохраняем запрос в Google Sheets
-    sheets_manager.increment_counter(user.id, 'consultation_requests')
+    # Сохраняем запрос (запишется в фоне)
+    write_behind.increment(user.id, 'consultation_requests')
     
     # Отправляем уведомление админу
     admin_text = f"""
 🔔 <b>Новый запрос на консультацию</b>
 
-<b>От:</b> {user.first_name} {user.last_name or ''} (@{user.username or 'нет username'})
+<b>От:</b> {user_label(user)}
 <b>ID:</b> <code>{user.id}</code>
 
 <b>Проблема:</b>
-{description}
+{html.quote(description or '')}
 
 <b>Дата:</b> {message.date.strftime('%Y-%m-%d %H:%M:%S')}
 """
     
-    try:
-        from aiogram import Bot
-        bot = message.bot
-        await bot.send_message(config.ADMIN_ID, admin_text)
-        logger.info(f"Consultation request sent to admin from user {user.id}")
-    except Exception as e:
-        logger.error(f"Failed to send consultation request to admin: {e}")
+    admin_notifier.publish(admin_text)
+    logger.info(f"Consultation request sent to admin from user {user.id}")
     
     # Отправляем подтверждение пользователю
     await message.answer(
@@ -1,13 +1,15 @@
 """Handler для команды /start и приветствия"""
 
 import logging
-from aiogram import Router, F
+from aiogram import Router, F, html
 from aiogram.filters import CommandStart
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 
+from bot.handlers.materials import leave_search
 from bot.keyboards.inline import get_main_menu
 from bot.utils.texts import WELCOME_MESSAGE, WELCOME_NO_VIDEO, MAIN_MENU_TEXT
-from bot.database.sheets import sheets_manager
+from bot.database.repository import user_repository
 from config.config import Config
 
 logger = logging.getLogger(__name__)
@@ -17,12 +19,15 @@ config = Config()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, state: FSMContext):
     """Обработка команды /start"""
     
     user = message.from_user
     
-    # Добавляем пользователя в Google Sheets
+    # /start во время поиска - следующий текст уже не запрос
+    await leave_search(state)
+    
+    # Добавляем пользователя в базу
     user_data = {
         'user_id': user.id,
         'username': user.username or '',
@@ -30,10 +35,10 @@ async def cmd_start(message: Message):
         'last_name': user.last_name or ''
     }
     
-    sheets_manager.add_user(user_data)
+    await user_repository.add_user(user_data)
     
     # Отправляем приветствие
-    welcome_text = WELCOME_MESSAGE.format(first_name=user.first_name or "друг")
+    welcome_text = WELCOME_MESSAGE.format(first_name=html.quote(user.first_name or "друг"))
     
     # Если есть видео-приветствие, отправляем его
     if config.WELCOME_VIDEO_FILE_ID:
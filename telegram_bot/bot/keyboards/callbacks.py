@@ -0,0 +1,71 @@
+"""Callback data кнопок (aiogram CallbackData)
+
+Короткие префиксы, чтобы укладываться в лимит Telegram в 64 байта:
+значение упаковывается как "<prefix>:<поле>:<поле>". cursor у списков -
+id последнего элемента предыдущей страницы (bot.utils.pagination).
+"""
+
+from aiogram.filters.callback_data import CallbackData
+
+
+class LabCallback(CallbackData, prefix="lab"):
+    """Раздел Labs (recovery, breath, body, core, mind)"""
+    lab: str
+
+
+class LabCategoryCallback(CallbackData, prefix="lc"):
+    """Категория практик в Lab (для Recovery Reset - день)
+    
+    cursor - id последней практики предыдущей страницы (0 - первая).
+    """
+    lab: str
+    category: str
+    cursor: int = 0
+
+
+class PracticeCallback(CallbackData, prefix="pr"):
+    """Конкретная практика"""
+    id: int
+
+
+class MaterialFormatCallback(CallbackData, prefix="mf"):
+    """Материалы выбранного формата
+    
+    cursor - id последнего материала предыдущей страницы (0 - первая).
+    """
+    format: str
+    cursor: int = 0
+
+
+class MaterialThemeCallback(CallbackData, prefix="mt"):
+    """Материалы выбранной темы
+    
+    cursor - id последнего материала предыдущей страницы (0 - первая).
+    """
+    theme: str
+    cursor: int = 0
+
+
+class MaterialCallback(CallbackData, prefix="m"):
+    """Конкретный материал"""
+    id: int
+
+
+class SearchPageCallback(CallbackData, prefix="sp"):
+    """Страница результатов поиска (запрос хранится в FSM)"""
+    page: int
+
+
+class ProblemCallback(CallbackData, prefix="pb"):
+    """Выбранная проблема"""
+    key: str
+
+
+class BroadcastSegmentCallback(CallbackData, prefix="bs"):
+    """Сегмент получателей рассылки (all, paid, expired, problem)"""
+    segment: str
+
+
+class BroadcastStopCallback(CallbackData, prefix="bst"):
+    """Остановить рассылку"""
+    id: int
@@ -1,24 +1,31 @@
-"""Inline-клавиатуры для бота Recovery Lab"""
+"""Inline-клавиатуры для бота Recovery Lab
+
+Клавиатуры неизменяемые, поэтому строятся один раз и кешируются
+(cached_keyboard), а их JSON сериализуется один раз (prebuilt).
+Возвращаемые объекты общие - не изменяйте их.
+"""
+
+from typing import Optional
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from bot.keyboards.callbacks import (
+    MaterialFormatCallback, MaterialThemeCallback, MaterialCallback,
+    BroadcastSegmentCallback, BroadcastStopCallback
+)
+from bot.keyboards.prebuilt import cached_keyboard
+from bot.services.catalog import labs_catalog
+from bot.utils.pagination import navigation_row
+from bot.utils.texts import MATERIAL_FORMATS, MATERIAL_THEMES, BROADCAST_SEGMENTS
+
 
 def get_main_menu() -> InlineKeyboardMarkup:
-    """Главное меню - 6 Labs + Информация"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(InlineKeyboardButton(text="🔄 Recovery Reset", callback_data="lab_recovery"))
-    builder.row(InlineKeyboardButton(text="🌬 Breath Lab", callback_data="lab_breath"))
-    builder.row(InlineKeyboardButton(text="💆 Body Lab", callback_data="lab_body"))
-    builder.row(InlineKeyboardButton(text="🧘 Core Lab", callback_data="lab_core"))
-    builder.row(InlineKeyboardButton(text="🧠 Mind Lab", callback_data="lab_mind"))
-    builder.row(InlineKeyboardButton(text="ℹ️ Информация", callback_data="info"))
-    builder.row(InlineKeyboardButton(text="💰 Оформить подписку", callback_data="subscribe"))
-    
-    return builder.as_markup()
+    """Главное меню - Labs, Материалы и Информация (строится каталогом Labs)"""
+    return labs_catalog.main_menu
 
 
+@cached_keyboard(maxsize=128)
 def get_back_button(callback_data: str, text: str = "🔙 Назад") -> InlineKeyboardMarkup:
     """Универсальная кнопка Назад"""
     builder = InlineKeyboardBuilder()
@@ -26,74 +33,82 @@ def get_back_button(callback_data: str, text: str = "🔙 Назад") -> Inline
     return builder.as_markup()
 
 
-def get_recovery_reset_menu() -> InlineKeyboardMarkup:
-    """Меню Recovery Reset - 3 дня"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.row(InlineKeyboardButton(text="📅 День 1", callback_data="recovery_day1"))
-    builder.row(InlineKeyboardButton(text="📅 День 2", callback_data="recovery_day2"))
-    builder.row(InlineKeyboardButton(text="📅 День 3", callback_data="recovery_day3"))
-    builder.row(InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu"))
-    
-    return builder.as_markup()
+@cached_keyboard()
+def get_back_to_menu() -> InlineKeyboardMarkup:
+    """Кнопка возврата в главное меню"""
+    return get_back_button("menu", "🏠 Главное меню")
 
 
-def get_breath_lab_menu() -> InlineKeyboardMarkup:
-    """Меню Breath Lab"""
+@cached_keyboard()
+def get_materials_menu() -> InlineKeyboardMarkup:
+    """Меню Материалы"""
     builder = InlineKeyboardBuilder()
     
-    builder.row(InlineKeyboardButton(text="🌊 Восстановительное дыхание", callback_data="breath_recovery"))
-    builder.row(InlineKeyboardButton(text="⚖️ Балансирующее дыхание", callback_data="breath_balance"))
-    builder.row(InlineKeyboardButton(text="⚡ Активирующее дыхание", callback_data="breath_activating"))
-    builder.row(InlineKeyboardButton(text="💫 Дыхание с телом", callback_data="breath_body"))
+    builder.row(InlineKeyboardButton(text="🎥 По формату", callback_data="materials_format"))
+    builder.row(InlineKeyboardButton(text="📂 По темам", callback_data="materials_theme"))
+    builder.row(InlineKeyboardButton(text="🔥 Популярное", callback_data="materials_popular"))
+    builder.row(InlineKeyboardButton(text="🔍 Поиск", callback_data="materials_search"))
     builder.row(InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu"))
     
     return builder.as_markup()
 
 
-def get_body_lab_menu() -> InlineKeyboardMarkup:
-    """Меню Body Lab"""
+@cached_keyboard()
+def get_formats_menu() -> InlineKeyboardMarkup:
+    """Форматы материалов"""
     builder = InlineKeyboardBuilder()
     
-    builder.row(InlineKeyboardButton(text="🫁 Диафрагма и рёбра", callback_data="body_diaphragm"))
-    builder.row(InlineKeyboardButton(text="🤰 Живот", callback_data="body_belly"))
-    builder.row(InlineKeyboardButton(text="🌸 Тазовое дно", callback_data="body_pelvic"))
-    builder.row(InlineKeyboardButton(text="🌊 Мягкая мобилизация", callback_data="body_mobility"))
-    builder.row(InlineKeyboardButton(text="🦴 Суставная подвижность", callback_data="body_joints"))
-    builder.row(InlineKeyboardButton(text="✨ Всё тело", callback_data="body_whole"))
-    builder.row(InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu"))
+    for format_type, title in MATERIAL_FORMATS.items():
+        builder.row(InlineKeyboardButton(
+            text=title,
+            callback_data=MaterialFormatCallback(format=format_type).pack()
+        ))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="materials"))
     
     return builder.as_markup()
 
 
-def get_core_lab_menu() -> InlineKeyboardMarkup:
-    """Меню Core Lab"""
+@cached_keyboard()
+def get_themes_menu() -> InlineKeyboardMarkup:
+    """Темы материалов"""
     builder = InlineKeyboardBuilder()
     
-    builder.row(InlineKeyboardButton(text="🦒 Шея и голова", callback_data="core_neck"))
-    builder.row(InlineKeyboardButton(text="🫀 Грудной отдел", callback_data="core_thoracic"))
-    builder.row(InlineKeyboardButton(text="🌀 Поясница", callback_data="core_lumbar"))
-    builder.row(InlineKeyboardButton(text="⚓ Центр и опора", callback_data="core_center"))
-    builder.row(InlineKeyboardButton(text="🦴 Суставы", callback_data="core_joints"))
-    builder.row(InlineKeyboardButton(text="🌟 Целостность тела", callback_data="core_integrity"))
-    builder.row(InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu"))
+    for theme, title in MATERIAL_THEMES.items():
+        builder.row(InlineKeyboardButton(
+            text=title,
+            callback_data=MaterialThemeCallback(theme=theme).pack()
+        ))
+    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="materials"))
     
     return builder.as_markup()
 
 
-def get_mind_lab_menu() -> InlineKeyboardMarkup:
-    """Меню Mind Lab"""
+def get_materials_list(
+    materials: list,
+    back_callback: str,
+    back_text: str = "🔙 Назад",
+    prev_data: Optional[str] = None,
+    next_data: Optional[str] = None
+) -> InlineKeyboardMarkup:
+    """Страница материалов с кнопками получения и переключения страниц"""
     builder = InlineKeyboardBuilder()
     
-    builder.row(InlineKeyboardButton(text="🌙 Расслабление", callback_data="mind_relaxation"))
-    builder.row(InlineKeyboardButton(text="🧘‍♀️ Медитации", callback_data="mind_meditation"))
-    builder.row(InlineKeyboardButton(text="🌈 Работа с состоянием", callback_data="mind_state"))
-    builder.row(InlineKeyboardButton(text="🎯 Возвращение внимания", callback_data="mind_attention"))
-    builder.row(InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu"))
+    for material in materials:
+        builder.row(InlineKeyboardButton(
+            text=f"📥 {material.title}",
+            callback_data=MaterialCallback(id=material.id).pack()
+        ))
+    
+    navigation = navigation_row(prev_data, next_data)
+    if navigation:
+        builder.row(*navigation)
+    
+    builder.row(InlineKeyboardButton(text=back_text, callback_data=back_callback))
     
     return builder.as_markup()
 
 
+@cached_keyboard()
 def get_info_menu() -> InlineKeyboardMarkup:
     """Меню Информация"""
     builder = InlineKeyboardBuilder()
@@ -115,21 +130,7 @@ def get_info_menu() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_practices_list(practices: list, back_callback: str) -> InlineKeyboardMarkup:
-    """Список практик с кнопками"""
-    builder = InlineKeyboardBuilder()
-    
-    for practice in practices:
-        builder.row(InlineKeyboardButton(
-            text=f"▶️ {practice['title']}",
-            callback_data=f"practice_{practice['id']}"
-        ))
-    
-    builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback))
-    
-    return builder.as_markup()
-
-
+@cached_keyboard(maxsize=16)
 def get_subscription_keyboard(price: int) -> InlineKeyboardMarkup:
     """Клавиатура для оформления подписки"""
     builder = InlineKeyboardBuilder()
@@ -140,6 +141,7 @@ def get_subscription_keyboard(price: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@cached_keyboard()
 def get_payment_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для оплаты"""
     builder = InlineKeyboardBuilder()
@@ -150,11 +152,52 @@ def get_payment_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@cached_keyboard()
 def get_admin_keyboard() -> InlineKeyboardMarkup:
     """Админская клавиатура"""
     builder = InlineKeyboardBuilder()
     
     builder.row(InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats"))
     builder.row(InlineKeyboardButton(text="👥 Пользователи", callback_data="admin_users"))
+    builder.row(InlineKeyboardButton(text="📤 Рассылка", callback_data="admin_broadcast"))
+    builder.row(InlineKeyboardButton(text="🔄 Синхронизировать таблицу", callback_data="admin_reindex"))
+    
+    return builder.as_markup()
+
+
+@cached_keyboard()
+def get_broadcast_segments_keyboard() -> InlineKeyboardMarkup:
+    """Выбор получателей рассылки"""
+    builder = InlineKeyboardBuilder()
+    
+    for segment, title in BROADCAST_SEGMENTS.items():
+        builder.row(InlineKeyboardButton(
+            text=title,
+            callback_data=BroadcastSegmentCallback(segment=segment).pack()
+        ))
+    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="broadcast_cancel"))
+    
+    return builder.as_markup()
+
+
+@cached_keyboard()
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Подтверждение рассылки"""
+    builder = InlineKeyboardBuilder()
+    
+    builder.row(
+        InlineKeyboardButton(text="✅ Отправить", callback_data="broadcast_confirm"),
+        InlineKeyboardButton(text="❌ Отмена", callback_data="broadcast_cancel")
+    )
     
     return builder.as_markup()
+
+
+def get_broadcast_progress_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    """Кнопка остановки идущей рассылки"""
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(
+        text="⏹ Остановить",
+        callback_data=BroadcastStopCallback(id=broadcast_id).pack()
+    ))
+    return builder.as_markup()
@@ -0,0 +1,69 @@
+"""Неизменяемые клавиатуры с заранее сериализованным JSON
+
+aiogram на каждый запрос превращает reply_markup в dict (model_dump), а
+его - в JSON. Для клавиатур, которые строятся один раз, это одна и та же
+работа: prebuilt() регистрирует клавиатуру, PrebuiltKeyboardSession при
+первой отправке запоминает ее JSON и дальше подставляет готовую строку.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import InlineKeyboardMarkup
+from aiohttp import FormData
+
+# Сколько клавиатур держать (каталог Labs перестраивает свои при перезагрузке)
+MAX_PREBUILT = 512
+
+# id клавиатуры -> (клавиатура, JSON или None до первой отправки).
+# Ссылка на клавиатуру не дает id перейти к другому объекту.
+_prebuilt: 'OrderedDict[int, Tuple[InlineKeyboardMarkup, Optional[str]]]' = OrderedDict()
+
+
+def prebuilt(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    """Отметить клавиатуру как неизменяемую (ее JSON будет закеширован)"""
+    if id(markup) not in _prebuilt:
+        _prebuilt[id(markup)] = (markup, None)
+        if len(_prebuilt) > MAX_PREBUILT:
+            _prebuilt.popitem(last=False)
+    return markup
+
+
+def cached_keyboard(maxsize: Optional[int] = None) -> Callable:
+    """lru_cache для функций-клавиатур + prebuilt для результата"""
+    def decorator(build: Callable[..., InlineKeyboardMarkup]) -> Callable[..., InlineKeyboardMarkup]:
+        @lru_cache(maxsize=maxsize)
+        @wraps(build)
+        def cached(*args: Any, **kwargs: Any) -> InlineKeyboardMarkup:
+            return prebuilt(build(*args, **kwargs))
+        return cached
+    return decorator
+
+
+class PrebuiltKeyboardSession(AiohttpSession):
+    """AiohttpSession, которая не сериализует prebuilt-клавиатуры повторно"""
+    
+    def prebuilt_payload(self, markup: Any, bot: Bot) -> Optional[str]:
+        """JSON prebuilt-клавиатуры или None для обычных"""
+        entry = _prebuilt.get(id(markup)) if markup is not None else None
+        if entry is None or entry[0] is not markup:
+            return None
+        
+        if entry[1] is None:
+            entry = (markup, self.prepare_value(markup, bot=bot, files={}))
+            _prebuilt[id(markup)] = entry
+        return entry[1]
+    
+    def build_form_data(self, bot: Bot, method: TelegramMethod) -> FormData:
+        payload = self.prebuilt_payload(getattr(method, 'reply_markup', None), bot)
+        if payload is None:
+            return super().build_form_data(bot, method)
+        
+        # Остальные поля aiogram собирает как обычно, клавиатура - готовая
+        form = super().build_form_data(bot, method.model_copy(update={'reply_markup': None}))
+        form.add_field('reply_markup', payload)
+        return form
@@ -1,14 +1,31 @@
 import asyncio
 import logging
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
-from bot.handlers import start, menu, labs, payment, info, admin
+from bot.handlers import start, menu, labs, materials, payment, info, admin
 from bot.middlewares.subscription import SubscriptionMiddleware
 from bot.middlewares.logging import LoggingMiddleware
 from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.keyboards.prebuilt import PrebuiltKeyboardSession
+from bot.utils.callback_index import IndexedDispatcher
+from bot.database.sheets import sheets_manager
+from bot.database.redis_client import get_redis, close_redis, cache_bus
+from bot.database.repository import user_repository
+from bot.database.sync import sheets_sync
+from bot.database.write_behind import write_behind
+from bot.services.broadcast import broadcaster
+from bot.services.catalog import labs_catalog
+from bot.services.jobs import job_scheduler
+from bot.services.notifications import admin_notifier
+from bot.services.popularity import popularity
+from bot.services.stats import stats
+from bot.services.subscriptions import subscription_scheduler
 from config.config import Config
 
 # Настройка логирования
@@ -24,45 +41,179 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Главная функция запуска бота"""
+# Фоновые задачи, запущенные в on_startup
+background_tasks: list = []
+
+
+async def on_startup(bot: Bot, dispatcher: Dispatcher):
+    """Инициализация хранилищ и фоновых задач"""
     
-    # Загрузка конфигурации
     config = Config()
     
-    # Инициализация бота
-    bot = Bot(
-        token=config.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
+    # Локальная база и незаписанные события с прошлого запуска
+    await user_repository.init()
+    write_behind.replay()
+    popularity.load()
+    
+    background_tasks.extend([
+        asyncio.create_task(sheets_manager.reindex_periodically()),
+        asyncio.create_task(write_behind.run()),
+        asyncio.create_task(sheets_sync.run()),
+        asyncio.create_task(cache_bus.listen(user_repository.cache)),
+        asyncio.create_task(labs_catalog.watch()),
+        asyncio.create_task(popularity.run()),
+        asyncio.create_task(stats.run()),
+        asyncio.create_task(subscription_scheduler.run(bot)),
+        asyncio.create_task(job_scheduler.run(bot)),
+        asyncio.create_task(admin_notifier.run(bot)),
+    ])
+    
+    # Рассылки, прерванные перезапуском
+    await broadcaster.resume(bot)
+    
+    if config.USE_WEBHOOK:
+        await bot.set_webhook(
+            url=config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=dispatcher.resolve_used_update_types()
+        )
+        logger.info(f"Webhook set to {config.WEBHOOK_URL}{config.WEBHOOK_PATH}")
+    
+    logger.info("Bot started successfully")
+
+
+async def on_shutdown(bot: Bot):
+    """Остановка фоновых задач и сброс накопленных изменений"""
+    
+    config = Config()
+    
+    if config.USE_WEBHOOK and config.WEBHOOK_DELETE_ON_SHUTDOWN:
+        await bot.delete_webhook()
+        logger.info("Webhook deleted")
+    
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await broadcaster.shutdown()
+    await admin_notifier.flush(bot)
     
-    # Storage для FSM (используем Memory storage для бесплатного плана)
-    storage = MemoryStorage()
-    logger.info("Using Memory storage (Redis disabled)")
+    await write_behind.flush()
+    popularity.save()
+    await sheets_sync.sync()
+    await user_repository.close()
+    await close_redis()
+    sheets_manager.close()
+
+
+def create_dispatcher() -> Dispatcher:
+    """Создать диспетчер с middlewares и handlers"""
+    
+    # Storage для FSM: Redis переживает рестарт и общий для всех реплик,
+    # Memory storage - для бесплатного плана с одним процессом
+    redis = get_redis()
+    if redis is not None:
+        storage = RedisStorage(redis=redis)
+        logger.info("Using Redis storage")
+    else:
+        storage = MemoryStorage()
+        logger.info("Using Memory storage (Redis disabled)")
+    
+    # Callback handlers ищутся по индексу callback_data, а не перебором routers
+    dp = IndexedDispatcher(storage=storage)
     
-    dp = Dispatcher(storage=storage)
+    # Регистрация middlewares (один лимит на сообщения и callback)
+    throttling = ThrottlingMiddleware()
     
-    # Регистрация middlewares
     dp.message.middleware(LoggingMiddleware())
-    dp.message.middleware(ThrottlingMiddleware())
+    dp.message.middleware(throttling)
     dp.message.middleware(SubscriptionMiddleware())
     
     dp.callback_query.middleware(LoggingMiddleware())
+    dp.callback_query.middleware(throttling)
     dp.callback_query.middleware(SubscriptionMiddleware())
     
-    # Регистрация handlers
+    # Регистрация handlers.
+    # problems, booking, reviews и contacts - разделы прежнего меню: их
+    # клавиатур и текстов нет (модули не импортируются), и ни одна кнопка
+    # на них не ведет, поэтому они не подключены.
     dp.include_router(start.router)
     dp.include_router(menu.router)
     dp.include_router(labs.router)
+    dp.include_router(materials.router)
     dp.include_router(payment.router)
     dp.include_router(info.router)
     dp.include_router(admin.router)
     
-    logger.info("Bot started successfully")
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    
+    return dp
+
+
+async def health(request: web.Request) -> web.Response:
+    """Проверка живости для балансировщика"""
+    return web.Response(text='ok')
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher, config: Config) -> web.Application:
+    """aiohttp-приложение, принимающее обновления от Telegram"""
+    
+    # Без секрета любой, кто знает адрес, может слать боту поддельные обновления
+    if not config.WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET is required when USE_WEBHOOK=True")
+    
+    app = web.Application()
+    app.router.add_get('/health', health)
+    
+    # Telegram передает секрет в заголовке X-Telegram-Bot-Api-Secret-Token
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.WEBHOOK_SECRET
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, config: Config):
+    """Запуск aiohttp-сервера, принимающего обновления от Telegram"""
+    
+    app = create_webhook_app(bot, dp, config)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBAPP_HOST, port=config.WEBAPP_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {config.WEBAPP_HOST}:{config.WEBAPP_PORT}")
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    """Главная функция запуска бота"""
+    
+    # Загрузка конфигурации
+    config = Config()
+    
+    # Инициализация бота
+    bot = Bot(
+        token=config.BOT_TOKEN,
+        session=PrebuiltKeyboardSession(),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    
+    dp = create_dispatcher()
     
-    # Запуск polling
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if config.USE_WEBHOOK:
+            await run_webhook(bot, dp, config)
+        else:
+            # Запуск polling
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
 
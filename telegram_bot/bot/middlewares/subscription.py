@@ -5,19 +5,19 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
-from bot.database.sheets import sheets_manager
+from bot.database.repository import user_repository
+from bot.utils.access import access_policy
 
 logger = logging.getLogger(__name__)
 
 
 class SubscriptionMiddleware(BaseMiddleware):
-    """Middleware для проверки активной подписки"""
+    """Middleware для проверки активной подписки
     
-    # Действия, которые не требуют подписки
-    FREE_ACTIONS = [
-        'menu', 'start', 'help', 'problems', 'contacts', 'booking',
-        'reviews', 'subscribe', 'subscribe_info', 'pay', 'payment_confirm'
-    ]
+    Платные действия handlers регистрируют в access_policy.
+    Для платных действий кладет в data handler'а subscription (Subscription)
+    и requires_subscription, чтобы handlers не запрашивали статус повторно.
+    """
     
     async def __call__(
         self,
@@ -30,45 +30,23 @@ class SubscriptionMiddleware(BaseMiddleware):
         # Определяем user_id
         user_id = event.from_user.id
         
+        data['requires_subscription'] = False
+        data['subscription'] = None
+        
         # Для callback query проверяем action
         if isinstance(event, CallbackQuery):
-            callback_data = event.data
-            
             # Проверяем, требует ли действие подписку
-            requires_subscription = self._requires_subscription(callback_data)
-            
-            if requires_subscription:
-                # Проверяем статус подписки в Google Sheets
-                has_access = sheets_manager.check_payment_status(user_id)
+            if access_policy.requires_subscription(event.data):
+                # Статус подписки получаем один раз и передаем в handler
+                subscription = await user_repository.get_subscription(user_id)
+                data['subscription'] = subscription
                 
-                if not has_access:
+                if not subscription.active:
                     logger.info(f"User {user_id} tried to access paid content without subscription")
                     # Сохраняем информацию о том, что нужна подписка
                     data['requires_subscription'] = True
                 else:
-                    data['requires_subscription'] = False
                     logger.info(f"User {user_id} has active subscription")
-            else:
-                data['requires_subscription'] = False
-        else:
-            data['requires_subscription'] = False
         
         # Продолжаем выполнение handler
         return await handler(event, data)
-    
-    def _requires_subscription(self, callback_data: str) -> bool:
-        """Проверяет, требует ли callback подписку"""
-        
-        # Проверяем, начинается ли callback с бесплатных действий
-        for free_action in self.FREE_ACTIONS:
-            if callback_data.startswith(free_action):
-                return False
-        
-        # Если это доступ к материалам, требуется подписка
-        if any(keyword in callback_data for keyword in [
-            'material', 'format_', 'materials_theme', 'materials_popular',
-            'get_material'
-        ]):
-            return True
-        
-        return False
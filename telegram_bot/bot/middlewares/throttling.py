@@ -1,22 +1,130 @@
 """Middleware для защиты от спама (rate limiting)"""
 
 import logging
-from typing import Callable, Dict, Any, Awaitable
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, Awaitable, Deque
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 
+from bot.database.redis_client import get_redis
 from config.config import Config
 
 logger = logging.getLogger(__name__)
 
 
+def check_limits(limit: int, period: float):
+    """Проверить RATE_LIMIT_REQUESTS и RATE_LIMIT_PERIOD"""
+    if limit < 1 or period <= 0:
+        raise ValueError(
+            f"RATE_LIMIT_REQUESTS must be >= 1 and RATE_LIMIT_PERIOD > 0, got {limit} and {period}"
+        )
+
+
+class SlidingWindowLimiter:
+    """Скользящее окно в памяти: не больше limit запросов за period секунд
+    
+    Для каждого пользователя хранится не больше limit отметок времени.
+    Пользователи лежат в OrderedDict в порядке последнего запроса, поэтому
+    неактивные удаляются с начала словаря - амортизированно O(1) на запрос.
+    """
+    
+    def __init__(self, limit: int, period: float):
+        check_limits(limit, period)
+        self.limit = limit
+        self.period = period
+        self._windows: OrderedDict[int, Deque[float]] = OrderedDict()
+    
+    async def hit(self, user_id: int) -> bool:
+        """Отметить запрос, возвращает False, если лимит превышен"""
+        now = time.monotonic()
+        cutoff = now - self.period
+        
+        # Удаляем пользователей, у которых все запросы вышли из окна
+        while self._windows:
+            oldest_user, oldest_window = next(iter(self._windows.items()))
+            if oldest_window and oldest_window[-1] > cutoff:
+                break
+            del self._windows[oldest_user]
+        
+        # Окно создается только вместе с первой отметкой, пустых окон нет
+        window = self._windows.get(user_id)
+        if window is not None:
+            while window and window[0] <= cutoff:
+                window.popleft()
+            
+            if len(window) >= self.limit:
+                return False
+        else:
+            window = self._windows[user_id] = deque(maxlen=self.limit)
+        
+        window.append(now)
+        self._windows.move_to_end(user_id)
+        return True
+
+
+class RedisSlidingWindowLimiter:
+    """Скользящее окно в Redis (sorted set), общее для всех реплик"""
+    
+    # Атомарно: чистим окно, считаем запросы, добавляем текущий
+    SCRIPT = """
+    local key = KEYS[1]
+    local now = tonumber(ARGV[1])
+    local period = tonumber(ARGV[2])
+    local limit = tonumber(ARGV[3])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - period)
+    if redis.call('ZCARD', key) >= limit then
+        return 0
+    end
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, math.ceil(period))
+    return 1
+    """
+    
+    def __init__(self, redis, limit: int, period: float):
+        check_limits(limit, period)
+        self.limit = limit
+        self.period = period
+        self._script = redis.register_script(self.SCRIPT)
+        self._counter = 0
+    
+    async def hit(self, user_id: int) -> bool:
+        """Отметить запрос, возвращает False, если лимит превышен"""
+        now_ms = time.time() * 1000
+        self._counter += 1
+        
+        try:
+            allowed = await self._script(
+                keys=[f"throttle:{user_id}"],
+                args=[now_ms, self.period * 1000, self.limit, f"{now_ms}:{self._counter}"]
+            )
+            return bool(allowed)
+        except Exception as e:
+            logger.error(f"Redis throttling failed: {e}")
+            return True
+
+
 class ThrottlingMiddleware(BaseMiddleware):
-    """Middleware для ограничения частоты запросов"""
+    """Middleware для ограничения частоты запросов
+    
+    Лимит - RATE_LIMIT_REQUESTS запросов за RATE_LIMIT_PERIOD секунд на
+    пользователя, общий для сообщений и callback. С Redis (USE_REDIS=True)
+    лимит общий для всех реплик бота. Сообщения об оплате (successful_payment)
+    не ограничиваются, а pre_checkout_query middleware не проходит вовсе.
+    """
     
     def __init__(self):
         self.config = Config()
-        self.user_timestamps: Dict[int, datetime] = {}
+        
+        redis = get_redis()
+        if redis is not None:
+            self.limiter = RedisSlidingWindowLimiter(
+                redis, self.config.RATE_LIMIT_REQUESTS, self.config.RATE_LIMIT_PERIOD
+            )
+        else:
+            self.limiter = SlidingWindowLimiter(
+                self.config.RATE_LIMIT_REQUESTS, self.config.RATE_LIMIT_PERIOD
+            )
     
     async def __call__(
         self,
@@ -26,34 +134,21 @@ class ThrottlingMiddleware(BaseMiddleware):
     ) -> Any:
         """Проверка rate limit"""
         
+        # Сообщение об успешной оплате не теряем: деньги уже списаны
+        if isinstance(event, Message) and event.successful_payment is not None:
+            return await handler(event, data)
+        
         user_id = event.from_user.id
-        now = datetime.now()
         
-        # Проверяем последний запрос пользователя
-        if user_id in self.user_timestamps:
-            last_request = self.user_timestamps[user_id]
-            time_passed = (now - last_request).total_seconds()
+        if not await self.limiter.hit(user_id):
+            logger.warning(f"Rate limit exceeded for user {user_id}")
             
-            # Если прошло меньше 0.5 секунд с последнего запроса
-            if time_passed < 0.5:
-                logger.warning(f"Rate limit exceeded for user {user_id}")
-                
-                # Для callback query отвечаем alert
-                if isinstance(event, CallbackQuery):
-                    await event.answer(
-                        "⏱ Подождите немного перед следующим действием",
-                        show_alert=True
-                    )
-                return
-        
-        # Обновляем timestamp
-        self.user_timestamps[user_id] = now
-        
-        # Очищаем старые timestamps (старше 1 минуты)
-        cutoff_time = now - timedelta(minutes=1)
-        self.user_timestamps = {
-            uid: ts for uid, ts in self.user_timestamps.items()
-            if ts > cutoff_time
-        }
+            # Для callback query отвечаем alert
+            if isinstance(event, CallbackQuery):
+                await event.answer(
+                    "⏱ Подождите немного перед следующим действием",
+                    show_alert=True
+                )
+            return
         
         return await handler(event, data)
@@ -0,0 +1,215 @@
+"""Рассылка сообщений админа по сегментам пользователей"""
+
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Dict, Optional
+
+from aiogram import Bot, html
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+
+from bot.database.broadcasts import broadcast_repository
+from bot.database.models import Broadcast
+from bot.database.redis_client import acquire_lock
+from bot.database.repository import user_repository
+from bot.keyboards.inline import get_back_button, get_broadcast_progress_keyboard
+from bot.utils.rate_limit import outgoing_messages
+from bot.utils.texts import BROADCAST_PROGRESS, BROADCAST_SEGMENTS, BROADCAST_STATUSES
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Попыток отправки одному получателю (после RetryAfter)
+MAX_ATTEMPTS = 3
+
+# Лок рассылки при нескольких репликах, в секундах (продлевается каждую пачку)
+LOCK_TTL = 300
+
+
+def segment_title(segment: str, value: str = '') -> str:
+    """Название сегмента для админа"""
+    title = BROADCAST_SEGMENTS.get(segment, segment)
+    return f"{title}: {html.quote(value)}" if value else title
+
+
+def format_progress(broadcast: Broadcast) -> str:
+    """Текст прогресса рассылки"""
+    return BROADCAST_PROGRESS.format(
+        id=broadcast.id,
+        status=BROADCAST_STATUSES.get(broadcast.status, broadcast.status),
+        segment=segment_title(broadcast.segment, broadcast.segment_value),
+        processed=broadcast.sent + broadcast.blocked + broadcast.failed,
+        total=broadcast.total,
+        sent=broadcast.sent,
+        blocked=broadcast.blocked,
+        failed=broadcast.failed
+    )
+
+
+class Broadcaster:
+    """Фоновая отправка рассылок
+    
+    Каждая рассылка - отдельная задача, но все они (и уведомления о
+    подписке) берут токены из одного TokenBucket outgoing_messages на
+    BROADCAST_RATE сообщений в секунду, поэтому общий лимит
+    Telegram (~30 сообщений в секунду) не превышается. Каждый получатель
+    получает одно сообщение, так что лимит на чат (1 в секунду) соблюдается
+    сам собой. На RetryAfter bucket ставится на паузу: до конца flood wait
+    ждут все, кто отправляет через него.
+    
+    Получатели выбираются пачками по BROADCAST_BATCH по возрастанию
+    user_id, после каждой пачки курсор и счетчики сохраняются в базе.
+    Незавершенные рассылки продолжаются с курсора после перезапуска.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.bucket = outgoing_messages
+        self._tasks: Dict[int, asyncio.Task] = {}
+    
+    def start(self, bot: Bot, broadcast: Broadcast):
+        """Запустить отправку рассылки в фоне"""
+        if broadcast.id in self._tasks:
+            return
+        
+        task = asyncio.create_task(self._run(bot, broadcast))
+        self._tasks[broadcast.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast.id, None))
+    
+    async def resume(self, bot: Bot):
+        """Продолжить рассылки, прерванные перезапуском"""
+        for broadcast in await broadcast_repository.get_running():
+            logger.info(f"Resuming broadcast {broadcast.id} after user {broadcast.cursor}")
+            self.start(bot, broadcast)
+    
+    async def stop(self, broadcast_id: int) -> Optional[Broadcast]:
+        """Остановить рассылку, возвращает ее итоговое состояние"""
+        task = self._tasks.get(broadcast_id)
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        
+        await broadcast_repository.set_status(broadcast_id, 'cancelled')
+        return await broadcast_repository.get(broadcast_id)
+    
+    async def shutdown(self):
+        """Прервать отправку при остановке бота (продолжится после старта)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _run(self, bot: Bot, broadcast: Broadcast):
+        """Отправить рассылку всем оставшимся получателям"""
+        last_report = time.monotonic()
+        
+        try:
+            while True:
+                # При нескольких репликах рассылку ведет одна
+                if not await acquire_lock(f"broadcast:{broadcast.id}", LOCK_TTL):
+                    logger.info(f"Broadcast {broadcast.id} is handled by another instance")
+                    return
+                
+                # Рассылку могли остановить с другой реплики
+                current = await broadcast_repository.get(broadcast.id)
+                if current is None or current.status != 'running':
+                    return
+                
+                user_ids = await user_repository.get_segment_ids(
+                    broadcast.segment, broadcast.segment_value,
+                    after=broadcast.cursor, limit=self.config.BROADCAST_BATCH
+                )
+                if not user_ids:
+                    break
+                
+                for user_id in user_ids:
+                    result = await self._send(bot, broadcast, user_id)
+                    setattr(broadcast, result, getattr(broadcast, result) + 1)
+                    broadcast.cursor = user_id
+                
+                await broadcast_repository.save_progress(broadcast)
+                
+                if time.monotonic() - last_report >= self.config.BROADCAST_PROGRESS_INTERVAL:
+                    await self._report(bot, broadcast)
+                    last_report = time.monotonic()
+        
+        except asyncio.CancelledError:
+            await broadcast_repository.save_progress(broadcast)
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast.id} failed: {e}")
+            await self._fail(bot, broadcast)
+            return
+        
+        if not await broadcast_repository.set_status(broadcast.id, 'done'):
+            return
+        broadcast.status = 'done'
+        await self._report(bot, broadcast)
+        logger.info(
+            f"Broadcast {broadcast.id} done: sent {broadcast.sent}, "
+            f"blocked {broadcast.blocked}, failed {broadcast.failed}"
+        )
+    
+    async def _fail(self, bot: Bot, broadcast: Broadcast):
+        """Завершить рассылку статусом failed, чтобы она не висела как идущая"""
+        try:
+            await broadcast_repository.save_progress(broadcast)
+            if not await broadcast_repository.set_status(broadcast.id, 'failed'):
+                return
+        except Exception as e:
+            # База недоступна - рассылка останется running и продолжится после перезапуска
+            logger.error(f"Failed to mark broadcast {broadcast.id} as failed: {e}")
+            return
+        
+        broadcast.status = 'failed'
+        await self._report(bot, broadcast)
+    
+    async def _send(self, bot: Bot, broadcast: Broadcast, user_id: int) -> str:
+        """Скопировать сообщение получателю: sent, blocked или failed"""
+        for _ in range(MAX_ATTEMPTS):
+            await self.bucket.acquire()
+            
+            try:
+                await bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=broadcast.from_chat_id,
+                    message_id=broadcast.message_id
+                )
+                return 'sent'
+            except TelegramRetryAfter as e:
+                logger.warning(f"Broadcast {broadcast.id}: flood control, retry after {e.retry_after}s")
+                # Следующий acquire дождется конца паузы, как и все остальные
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return 'blocked'
+            except TelegramAPIError as e:
+                logger.error(f"Broadcast {broadcast.id}: failed to send to {user_id}: {e}")
+                return 'failed'
+        
+        return 'failed'
+    
+    async def _report(self, bot: Bot, broadcast: Broadcast):
+        """Обновить сообщение с прогрессом у админа"""
+        if broadcast.progress_message_id is None:
+            return
+        
+        if broadcast.status == 'running':
+            keyboard = get_broadcast_progress_keyboard(broadcast.id)
+        else:
+            keyboard = get_back_button("menu", "🏠 Главное меню")
+        
+        try:
+            await bot.edit_message_text(
+                text=format_progress(broadcast),
+                chat_id=broadcast.admin_id,
+                message_id=broadcast.progress_message_id,
+                reply_markup=keyboard
+            )
+        except TelegramAPIError as e:
+            logger.error(f"Failed to update broadcast {broadcast.id} progress: {e}")
+
+
+# Singleton instance
+broadcaster = Broadcaster()
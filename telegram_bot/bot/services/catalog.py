@@ -0,0 +1,229 @@
+"""Каталог Labs: разделы, категории и практики"""
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Any
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from bot.database.materials import materials_repository
+from bot.keyboards.callbacks import LabCallback, LabCategoryCallback, PracticeCallback
+from bot.keyboards.prebuilt import prebuilt
+from bot.utils.pagination import page_callbacks, navigation_row
+from bot.utils.texts import LABS_STRUCTURE, LAB_CATEGORY_TEXT, PRACTICES_COMING_SOON
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Практик на одной странице категории
+PRACTICES_PAGE_SIZE = 8
+
+
+@dataclass
+class Category:
+    """Категория Lab (для Recovery Reset - день) с готовым текстом
+
+    keyboard - заранее построенная первая страница практик.
+    """
+    key: str
+    lab: str
+    title: str
+    text: str
+    back_text: str
+    keyboard: Optional[InlineKeyboardMarkup] = None
+
+
+@dataclass
+class Lab:
+    """Раздел Labs с готовым текстом и клавиатурой"""
+    key: str
+    title: str
+    text: str
+    keyboard: InlineKeyboardMarkup
+    categories: Dict[str, Category] = field(default_factory=dict)
+
+
+class LabsCatalog:
+    """Дерево Labs -> категории -> практики
+    
+    Загружается один раз из LABS_CATALOG_FILE (JSON той же структуры,
+    что LABS_STRUCTURE) или из LABS_STRUCTURE, если файла нет. Практики
+    категорий - материалы с lab/lab_category из materials_repository.
+    Тексты и клавиатуры (prebuilt) строятся при загрузке, handlers только
+    ищут их в словарях. Каталог и материалы перечитываются фоновой задачей
+    при изменении файлов (по mtime), без перезапуска бота.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.path = self.config.LABS_CATALOG_FILE
+        self.labs: Dict[str, Lab] = {}
+        self.main_menu: Optional[InlineKeyboardMarkup] = None
+        self._mtime: Optional[float] = None
+        self._materials_version = None
+        self.load()
+    
+    def load(self) -> bool:
+        """Загрузить каталог (при ошибке остается предыдущий)"""
+        mtime = self._get_mtime()
+        
+        try:
+            if mtime is not None:
+                with open(self.path, encoding='utf-8') as catalog_file:
+                    structure = json.load(catalog_file)
+            else:
+                structure = LABS_STRUCTURE
+            
+            materials_version = materials_repository.version
+            labs = self._build(structure)
+        except Exception as e:
+            logger.error(f"Failed to load labs catalog: {e}")
+            # Не перечитываем сломанный файл, пока его не исправят
+            self._mtime = mtime
+            return False
+        
+        # Подменяем целиком, чтобы handlers не видели частично загруженный каталог
+        self.labs = labs
+        self.main_menu = self._build_main_menu(labs)
+        self._mtime = mtime
+        self._materials_version = materials_version
+        
+        logger.info(f"Labs catalog loaded: {len(labs)} labs")
+        return True
+    
+    def reload_if_changed(self) -> bool:
+        """Перечитать каталог, если изменился его файл или материалы"""
+        materials_repository.reload_if_changed()
+        
+        if (self._get_mtime() == self._mtime
+                and materials_repository.version == self._materials_version):
+            return False
+        return self.load()
+    
+    def _get_mtime(self) -> Optional[float]:
+        """Время изменения файла каталога или None, если файла нет"""
+        if self.path and os.path.exists(self.path):
+            return os.path.getmtime(self.path)
+        return None
+    
+    async def watch(self):
+        """Фоновая задача: следить за изменениями каталога и материалов"""
+        interval = self.config.LABS_CATALOG_RELOAD_INTERVAL
+        if interval <= 0:
+            return
+        
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+    
+    def get_lab(self, lab: str) -> Optional[Lab]:
+        """Раздел по ключу"""
+        return self.labs.get(lab)
+    
+    def get_category(self, lab: str, category: str) -> Optional[Category]:
+        """Категория раздела по ключам"""
+        lab_entry = self.labs.get(lab)
+        if lab_entry is None:
+            return None
+        return lab_entry.categories.get(category)
+    
+    def get_practices_keyboard(self, category: Category, cursor: int = 0) -> InlineKeyboardMarkup:
+        """Страница практик категории (первая - из кеша)"""
+        if cursor == 0 and category.keyboard is not None:
+            return category.keyboard
+        return self._build_practices_keyboard(category, cursor)
+    
+    @staticmethod
+    def _build_practices_keyboard(category: Category, cursor: int) -> InlineKeyboardMarkup:
+        """Построить страницу практик категории"""
+        page = materials_repository.by_lab(category.lab, category.key, cursor, PRACTICES_PAGE_SIZE)
+        builder = InlineKeyboardBuilder()
+        
+        for practice in page.items:
+            builder.row(InlineKeyboardButton(
+                text=f"▶️ {practice.title}",
+                callback_data=PracticeCallback(id=practice.id).pack()
+            ))
+        
+        navigation = navigation_row(*page_callbacks(
+            page,
+            lambda page_cursor: LabCategoryCallback(
+                lab=category.lab, category=category.key, cursor=page_cursor
+            ).pack()
+        ))
+        if navigation:
+            builder.row(*navigation)
+        
+        builder.row(InlineKeyboardButton(
+            text=category.back_text,
+            callback_data=LabCallback(lab=category.lab).pack()
+        ))
+        
+        return builder.as_markup()
+    
+    def _build(self, structure: Dict[str, Any]):
+        """Построить разделы, индексы и клавиатуры"""
+        labs = {}
+        
+        for lab_key, lab_data in structure.items():
+            categories = {}
+            # Тексты, не заданные в файле, берем из LABS_STRUCTURE
+            lab_data = {**LABS_STRUCTURE.get(lab_key, {}), **lab_data}
+            category_text = lab_data.get('category_text', LAB_CATEGORY_TEXT)
+            
+            for category_key, category_data in lab_data.get('categories', {}).items():
+                text = category_text.format(
+                    title=category_data['title'],
+                    description=category_data.get('description', '')
+                )
+                if not materials_repository.by_lab(lab_key, category_key, limit=1).total:
+                    text += PRACTICES_COMING_SOON
+                
+                category = Category(
+                    key=category_key,
+                    lab=lab_key,
+                    title=category_data['title'],
+                    text=text,
+                    back_text=lab_data.get('back_text', '🔙 Назад')
+                )
+                category.keyboard = prebuilt(self._build_practices_keyboard(category, 0))
+                categories[category_key] = category
+            
+            builder = InlineKeyboardBuilder()
+            for category in categories.values():
+                builder.row(InlineKeyboardButton(
+                    text=category.title,
+                    callback_data=LabCategoryCallback(lab=lab_key, category=category.key).pack()
+                ))
+            builder.row(InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu"))
+            
+            labs[lab_key] = Lab(
+                key=lab_key,
+                title=lab_data['title'],
+                text=lab_data.get('text', f"<b>{lab_data['title']}</b>"),
+                keyboard=prebuilt(builder.as_markup()),
+                categories=categories
+            )
+        
+        return labs
+    
+    @staticmethod
+    def _build_main_menu(labs: Dict[str, Lab]) -> InlineKeyboardMarkup:
+        """Главное меню - Labs, Материалы и Информация"""
+        builder = InlineKeyboardBuilder()
+        
+        for lab in labs.values():
+            builder.row(InlineKeyboardButton(text=lab.title, callback_data=LabCallback(lab=lab.key).pack()))
+        builder.row(InlineKeyboardButton(text="📚 Материалы", callback_data="materials"))
+        builder.row(InlineKeyboardButton(text="ℹ️ Информация", callback_data="info"))
+        builder.row(InlineKeyboardButton(text="💰 Оформить подписку", callback_data="subscribe"))
+        
+        return prebuilt(builder.as_markup())
+
+
+# Singleton instance
+labs_catalog = LabsCatalog()
@@ -0,0 +1,122 @@
+"""Выгрузка пользователей в CSV для админа"""
+
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from bot.database.models import User
+from bot.database.repository import user_repository
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Формат дат в аргументах /export
+DATE_ARG_FORMAT = '%d.%m.%Y'
+
+PAID_VALUES = {'yes': True, 'да': True, 'no': False, 'нет': False}
+
+# Начало ячейки, которое Excel/Sheets считают формулой
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_formulas(record: dict) -> dict:
+    """Экранировать значения-формулы апострофом (CSV injection)
+    
+    Имена, заметки и проблемы вводят пользователи и админ, а "=HYPERLINK(...)"
+    в ячейке табличный редактор выполнит при открытии файла.
+    """
+    return {
+        name: f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for name, value in record.items()
+    }
+
+
+@dataclass
+class ExportFilter:
+    """Фильтры выгрузки"""
+    status: str = ''
+    paid: Optional[bool] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    compress: bool = False
+    
+    @classmethod
+    def parse(cls, args: Optional[str]) -> 'ExportFilter':
+        """Разобрать аргументы /export, ValueError при ошибке"""
+        filters = cls()
+        
+        for arg in (args or '').split():
+            name, _, value = arg.partition('=')
+            name = name.lower()
+            
+            if name == 'gzip' and not value:
+                filters.compress = True
+            elif name == 'status' and value:
+                # Пробелы в статусе передаются через _
+                filters.status = value.replace('_', ' ')
+            elif name == 'paid' and value.lower() in PAID_VALUES:
+                filters.paid = PAID_VALUES[value.lower()]
+            elif name == 'from':
+                filters.date_from = datetime.strptime(value, DATE_ARG_FORMAT)
+            elif name == 'to':
+                # Включительно: до начала следующего дня
+                filters.date_to = datetime.strptime(value, DATE_ARG_FORMAT) + timedelta(days=1)
+            else:
+                raise ValueError(f"Unknown export argument: {arg}")
+        
+        return filters
+    
+    def conditions(self) -> list:
+        """Условия выборки пользователей"""
+        conditions = []
+        if self.status:
+            conditions.append(User.status == self.status)
+        if self.paid is not None:
+            conditions.append(User.payment_status.is_(self.paid))
+        if self.date_from is not None:
+            conditions.append(User.date_registered >= self.date_from)
+        if self.date_to is not None:
+            conditions.append(User.date_registered < self.date_to)
+        return conditions
+
+
+async def export_users(filters: ExportFilter) -> Tuple[str, int]:
+    """Записать пользователей во временный файл, возвращает (путь, число строк)
+    
+    Пользователи читаются пачками по EXPORT_CHUNK и сразу дописываются в
+    файл, поэтому память не растет с числом пользователей. Запись (и
+    сжатие) идет в потоке, чтобы не блокировать event loop. Файл удаляет
+    вызывающий.
+    """
+    config = Config()
+    suffix = '.csv.gz' if filters.compress else '.csv'
+    fd, path = tempfile.mkstemp(prefix='users_', suffix=suffix)
+    os.close(fd)
+    
+    # BOM - чтобы Excel открыл кириллицу без настройки кодировки
+    if filters.compress:
+        file = gzip.open(path, 'wt', encoding='utf-8-sig', newline='')
+    else:
+        file = open(path, 'w', encoding='utf-8-sig', newline='')
+    
+    rows = 0
+    try:
+        with file:
+            writer = csv.DictWriter(file, fieldnames=User.FIELDS)
+            writer.writeheader()
+            
+            async for chunk in user_repository.iter_users(filters.conditions(), config.EXPORT_CHUNK):
+                await asyncio.to_thread(writer.writerows, map(escape_formulas, chunk))
+                rows += len(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    
+    logger.info(f"Exported {rows} users to {path}")
+    return path, rows
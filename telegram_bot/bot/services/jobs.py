@@ -0,0 +1,235 @@
+"""Отложенные задачи с хранением в базе"""
+
+import asyncio
+import heapq
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from sqlalchemy import delete, select
+
+from bot.database.models import Job
+from bot.database.repository import user_repository
+from bot.utils.rate_limit import outgoing_messages
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Bot, Dict[str, Any]], Awaitable[None]]
+
+# Попыток выполнения задачи (после RetryAfter)
+MAX_ATTEMPTS = 2
+
+
+class JobScheduler:
+    """Очередь отложенных задач: таблица jobs + min-heap в памяти
+    
+    Задача записывается в базу и кладется в кучу (run_at, id) - O(log n)
+    на добавление, без отдельной asyncio-задачи на каждую. Одна фоновая
+    задача спит до вершины кучи и выполняет наступившие задачи пачками
+    по JOBS_BATCH, каждое выполнение берет токен outgoing_messages.
+    
+    Перед выполнением пачка удаляется из базы (DELETE ... RETURNING):
+    задачу выполняет только тот, кто ее удалил, поэтому при нескольких
+    репликах она не выполнится дважды. После перезапуска задачи
+    загружаются из базы, отмененные в памяти удаляются из базы пачкой.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.session_factory = user_repository.session_factory
+        self._handlers: Dict[str, JobHandler] = {}
+        self._heap: List[Tuple[datetime, int]] = []
+        self._jobs: Dict[int, Job] = {}
+        self._by_key: Dict[str, int] = {}
+        self._cancelled: Set[str] = set()
+        self._wakeup = asyncio.Event()
+    
+    def register(self, kind: str, handler: JobHandler):
+        """Зарегистрировать обработчик задач вида kind: handler(bot, payload)"""
+        self._handlers[kind] = handler
+    
+    async def schedule(self, kind: str, key: str, delay: timedelta, payload: Dict[str, Any]):
+        """Запланировать задачу через delay (задача с тем же key заменяется)"""
+        job = Job(
+            kind=kind,
+            key=key,
+            run_at=datetime.now() + delay,
+            payload=json.dumps(payload, ensure_ascii=False)
+        )
+        
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(delete(Job).where(Job.key == key))
+                session.add(job)
+        
+        self._forget(key)
+        self._cancelled.discard(key)
+        self._add(job)
+        
+        if self._heap[0][1] == job.id:
+            self._wakeup.set()
+    
+    def cancel(self, key: str):
+        """Отменить задачу (из базы удаляется в фоне, пачкой)"""
+        self._forget(key)
+        self._cancelled.add(key)
+    
+    def _add(self, job: Job):
+        """Добавить задачу в память"""
+        self._jobs[job.id] = job
+        self._by_key[job.key] = job.id
+        heapq.heappush(self._heap, (job.run_at, job.id))
+    
+    def _forget(self, key: str):
+        """Убрать задачу из памяти (запись в куче пропускается при извлечении)"""
+        job_id = self._by_key.pop(key, None)
+        if job_id is not None:
+            self._jobs.pop(job_id, None)
+    
+    async def load(self):
+        """Перечитать задачи из базы"""
+        await self._flush_cancelled()
+        
+        known = set(self._jobs)
+        loaded = await self._read_jobs()
+        
+        # Пока шел запрос, handlers могли запланировать или отменить задачи:
+        # запланированные заменяют прочитанные с тем же key, отмененные не
+        # возвращаются в память
+        jobs = {job.key: job for job in loaded if job.key not in self._cancelled}
+        for job_id, job in self._jobs.items():
+            if job_id not in known:
+                jobs[job.key] = job
+        
+        self._jobs = {job.id: job for job in jobs.values()}
+        self._by_key = {key: job.id for key, job in jobs.items()}
+        self._heap = [(job.run_at, job.id) for job in jobs.values()]
+        heapq.heapify(self._heap)
+        logger.info(f"Jobs loaded: {len(jobs)}")
+    
+    async def _read_jobs(self) -> List[Job]:
+        """Все задачи из базы"""
+        async with self.session_factory() as session:
+            result = await session.scalars(select(Job))
+            return list(result)
+    
+    async def _flush_cancelled(self):
+        """Удалить отмененные задачи из базы"""
+        if not self._cancelled:
+            return
+        
+        keys = list(self._cancelled)
+        self._cancelled.clear()
+        
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(delete(Job).where(Job.key.in_(keys)))
+    
+    def _pop_due(self, now: datetime) -> List[Job]:
+        """Извлечь до JOBS_BATCH наступивших задач"""
+        due = []
+        
+        while self._heap and self._heap[0][0] <= now and len(due) < self.config.JOBS_BATCH:
+            _, job_id = heapq.heappop(self._heap)
+            
+            # Задачу отменили или заменили
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                continue
+            
+            self._by_key.pop(job.key, None)
+            due.append(job)
+        
+        return due
+    
+    async def _claim(self, jobs: List[Job]) -> Set[int]:
+        """Удалить задачи из базы, возвращает id удаленных именно нами"""
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.execute(
+                    delete(Job).where(Job.id.in_([job.id for job in jobs])).returning(Job.id)
+                )
+                return set(result.scalars())
+    
+    async def process(self, bot: Bot) -> int:
+        """Выполнить пачку наступивших задач, возвращает их число"""
+        await self._flush_cancelled()
+        
+        due = self._pop_due(datetime.now())
+        if not due:
+            return 0
+        
+        claimed = await self._claim(due)
+        
+        for job in due:
+            if job.id in claimed:
+                await self._execute(bot, job)
+        
+        return len(due)
+    
+    async def _execute(self, bot: Bot, job: Job):
+        """Выполнить задачу с учетом лимита сообщений"""
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            logger.error(f"No handler for job {job.kind} ({job.key})")
+            return
+        
+        retry_after = 0
+        for _ in range(MAX_ATTEMPTS):
+            await outgoing_messages.acquire()
+            
+            try:
+                await handler(bot, json.loads(job.payload))
+                return
+            except TelegramRetryAfter as e:
+                retry_after = e.retry_after
+                outgoing_messages.pause(retry_after)
+            except Exception as e:
+                logger.error(f"Job {job.kind} ({job.key}) failed: {e}")
+                return
+        
+        # Задача уже удалена из базы в _claim - без этого она бы потерялась.
+        # Если за это время задачу отменили или запланировали новую с тем же
+        # key, повторять старую не нужно.
+        if job.key in self._by_key or job.key in self._cancelled:
+            return
+        logger.warning(f"Job {job.kind} ({job.key}) flood-limited, rescheduled in {retry_after}s")
+        await self.schedule(job.kind, job.key, timedelta(seconds=retry_after), json.loads(job.payload))
+    
+    def _seconds_to_next(self) -> float:
+        """Сколько ждать до ближайшей задачи"""
+        timeout = float(self.config.JOBS_RELOAD_INTERVAL)
+        if self._heap:
+            timeout = min(timeout, (self._heap[0][0] - datetime.now()).total_seconds())
+        return max(timeout, 0.0)
+    
+    async def run(self, bot: Bot):
+        """Фоновая задача: спать до ближайшей задачи и выполнять наступившие"""
+        last_load = None
+        
+        while True:
+            try:
+                if last_load is None or time.monotonic() - last_load >= self.config.JOBS_RELOAD_INTERVAL:
+                    await self.load()
+                    last_load = time.monotonic()
+                
+                # Пачки подряд, пока есть наступившие задачи
+                while await self.process(bot):
+                    pass
+            except Exception as e:
+                logger.error(f"Job scheduler failed: {e}")
+            
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._seconds_to_next())
+            except asyncio.TimeoutError:
+                pass
+
+
+# Singleton instance
+job_scheduler = JobScheduler()
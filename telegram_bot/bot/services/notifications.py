@@ -0,0 +1,149 @@
+"""Уведомления админу через фоновую очередь"""
+
+import asyncio
+import html as std_html
+import logging
+import re
+from typing import Any, List, Optional
+
+from aiogram import Bot, html
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+from aiogram.types import User
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Лимит длины сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# Попыток отправки при сетевых ошибках, пауза растет вдвое от 1 секунды
+MAX_ATTEMPTS = 5
+
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+def user_label(user: User) -> str:
+    """Имя и username пользователя для уведомления (HTML экранирован)"""
+    name = f"{user.first_name} {user.last_name or ''}".strip()
+    return f"{html.quote(name)} (@{html.quote(user.username or 'нет username')})"
+
+
+def plain_text(text: str) -> str:
+    """Текст уведомления без HTML-разметки"""
+    return std_html.unescape(re.sub(r'<[^>]+>', '', text))
+
+
+class AdminNotifier:
+    """Очередь уведомлений админу
+    
+    Handlers вызывают publish и не ждут отправки. Фоновая задача берет
+    первое событие, ждет еще ADMIN_DIGEST_WINDOW секунд и отправляет все
+    накопившееся одной сводкой (несколькими сообщениями, если не влезает
+    в лимит Telegram; делится только между событиями). Если Telegram не
+    принял разметку, события сводки уходят по одному обычным текстом.
+    На RetryAfter ждет указанное время, на сетевые ошибки повторяет с
+    нарастающей паузой.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Собираемая сводка (не теряется, если задачу остановят в окне)
+        self._batch: List[str] = []
+    
+    def publish(self, text: str):
+        """Поставить уведомление в очередь"""
+        self._queue.put_nowait(text.strip())
+    
+    async def run(self, bot: Bot):
+        """Фоновая задача: собирать события в сводки и отправлять"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            self._batch.append(await self._queue.get())
+            
+            deadline = loop.time() + self.config.ADMIN_DIGEST_WINDOW
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            batch, self._batch = self._batch, []
+            await self._send_batch(bot, batch)
+    
+    async def flush(self, bot: Bot):
+        """Отправить все, что осталось в очереди (при остановке бота)"""
+        batch, self._batch = self._batch, []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        
+        if batch:
+            await self._send_batch(bot, batch)
+    
+    async def _send_batch(self, bot: Bot, batch: List[str]):
+        """Отправить события одним или несколькими сообщениями"""
+        header = f"📬 <b>Сводка: {len(batch)} событий</b>" if len(batch) > 1 else None
+        
+        for events in self._split(batch, header):
+            text = DIGEST_SEPARATOR.join([header, *events] if header else events)
+            header = None
+            
+            try:
+                await self._send(bot, text)
+            except TelegramBadRequest as e:
+                # Разметка не разобралась или событие длиннее лимита -
+                # каждое событие отдельно, обычным текстом
+                logger.warning(f"Admin digest rejected, sending events as plain text: {e}")
+                for event in events:
+                    await self._send(bot, plain_text(event)[:MAX_MESSAGE_LENGTH], parse_mode=None)
+    
+    @staticmethod
+    def _split(batch: List[str], header: Optional[str]) -> List[List[str]]:
+        """Разбить события на сообщения по лимиту длины, только между событиями
+        
+        Событие не режется: слишком длинное уходит отдельным сообщением.
+        """
+        messages = []
+        current: List[str] = []
+        length = len(header) if header else 0
+        
+        for text in batch:
+            added = len(text) + (len(DIGEST_SEPARATOR) if length else 0)
+            if current and length + added > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current, length, added = [], 0, len(text)
+            current.append(text)
+            length += added
+        
+        messages.append(current)
+        return messages
+    
+    async def _send(self, bot: Bot, text: str, **kwargs: Any):
+        """Отправить сообщение админу с повторами (TelegramBadRequest - наружу)"""
+        delay = 1
+        
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                await bot.send_message(self.config.ADMIN_ID, text, **kwargs)
+                return
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Failed to notify admin, retry in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+            except TelegramBadRequest:
+                raise
+            except TelegramAPIError as e:
+                logger.error(f"Failed to notify admin: {e}")
+                return
+        
+        logger.error("Failed to notify admin: attempts exhausted")
+
+
+# Singleton instance
+admin_notifier = AdminNotifier()
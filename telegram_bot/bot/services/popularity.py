@@ -0,0 +1,122 @@
+"""Популярность материалов по просмотрам"""
+
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Пересчитываем веса, когда экспонента становится слишком большой
+MAX_EXPONENT = 50
+
+
+class PopularityTracker:
+    """Счетчики просмотров с экспоненциальным затуханием
+    
+    Используется forward decay: просмотр в момент t добавляет к весу
+    материала exp(rate * (t - landmark)). Старые веса не пересчитываются
+    при каждом просмотре, а порядок материалов тот же, что у честно
+    затухающих счетчиков с полураспадом POPULARITY_HALF_LIFE_HOURS.
+    Материалы лежат в отсортированном списке, поэтому топ-K - срез O(K).
+    Состояние периодически сохраняется в POPULARITY_FILE.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.path = self.config.POPULARITY_FILE
+        self.rate = math.log(2) / (self.config.POPULARITY_HALF_LIFE_HOURS * 3600)
+        self.landmark = time.time()
+        self._scores: Dict[int, float] = {}
+        self._views: Dict[int, int] = {}
+        # (-вес, material_id) по возрастанию - самые популярные в начале
+        self._ranking: List[Tuple[float, int]] = []
+        self._dirty = False
+    
+    def record(self, material_id: int, now: Optional[float] = None):
+        """Учесть просмотр материала"""
+        now = time.time() if now is None else now
+        
+        exponent = self.rate * (now - self.landmark)
+        if exponent > MAX_EXPONENT:
+            self._rescale(now)
+            exponent = 0.0
+        
+        old_score = self._scores.get(material_id)
+        if old_score is not None:
+            index = bisect.bisect_left(self._ranking, (-old_score, material_id))
+            del self._ranking[index]
+        
+        score = (old_score or 0.0) + math.exp(exponent)
+        self._scores[material_id] = score
+        self._views[material_id] = self._views.get(material_id, 0) + 1
+        bisect.insort(self._ranking, (-score, material_id))
+        self._dirty = True
+    
+    def top(self, limit: int) -> List[Tuple[int, int]]:
+        """Самые популярные материалы: [(material_id, всего просмотров)]"""
+        return [
+            (material_id, self._views.get(material_id, 0))
+            for _, material_id in self._ranking[:limit]
+        ]
+    
+    def _rescale(self, now: float):
+        """Перенести точку отсчета на now, чтобы веса не переполнялись"""
+        factor = math.exp(-self.rate * (now - self.landmark))
+        self._scores = {material_id: score * factor for material_id, score in self._scores.items()}
+        self._ranking = sorted((-score, material_id) for material_id, score in self._scores.items())
+        self.landmark = now
+    
+    def load(self):
+        """Загрузить сохраненное состояние (вызывается при старте)"""
+        if not os.path.exists(self.path):
+            return
+        
+        try:
+            with open(self.path, encoding='utf-8') as checkpoint:
+                state = json.load(checkpoint)
+            
+            self.landmark = state['landmark']
+            self._scores = {int(key): value for key, value in state['scores'].items()}
+            self._views = {int(key): value for key, value in state['views'].items()}
+            self._ranking = sorted((-score, material_id) for material_id, score in self._scores.items())
+            logger.info(f"Popularity loaded: {len(self._scores)} materials")
+        except Exception as e:
+            logger.error(f"Failed to load popularity checkpoint: {e}")
+    
+    def save(self):
+        """Сохранить состояние, если были просмотры"""
+        if not self._dirty:
+            return
+        
+        state = {
+            'landmark': self.landmark,
+            'scores': self._scores,
+            'views': self._views
+        }
+        
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as checkpoint:
+                json.dump(state, checkpoint)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.error(f"Failed to save popularity checkpoint: {e}")
+    
+    async def run(self):
+        """Фоновая задача: периодически сохранять состояние"""
+        while True:
+            await asyncio.sleep(self.config.POPULARITY_CHECKPOINT_INTERVAL)
+            self.save()
+
+
+# Singleton instance
+popularity = PopularityTracker()
@@ -0,0 +1,158 @@
+"""Полнотекстовый поиск по материалам"""
+
+import logging
+import re
+from collections import defaultdict, OrderedDict
+from typing import Dict, List, Set
+
+from bot.database.materials import materials_repository, Material
+from bot.utils.texts import MATERIAL_FORMATS, MATERIAL_THEMES
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'[a-zа-я0-9]+')
+
+# Окончания для упрощенного стемминга, длинные проверяются первыми
+ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ов', 'ев',
+    'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'ию', 'ия', 'ью',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й'
+], key=len, reverse=True)
+
+MIN_STEM = 3
+
+# Сколько последних запросов держать в кеше (для переключения страниц)
+QUERY_CACHE_SIZE = 256
+
+# Вес совпадения по полю материала
+FIELD_WEIGHTS = {'title': 3, 'category': 2, 'description': 1}
+
+
+def normalize(text: str) -> List[str]:
+    """Разбить текст на основы слов: нижний регистр, ё -> е, стемминг"""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [stem(word) for word in words]
+
+
+def stem(word: str) -> str:
+    """Отрезать окончание, оставляя основу не короче MIN_STEM"""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+class SearchIndex:
+    """Инвертированный индекс: основа слова -> {material_id: вес}
+    
+    Строится из materials_repository и обновляется инкрементально: при
+    перезагрузке материалов переиндексируются только добавленные,
+    измененные и удаленные материалы. Запрос - пересечение словарей
+    по словам запроса, без перебора всех материалов. Результаты
+    последних запросов кешируются до следующего изменения индекса.
+    """
+    
+    def __init__(self):
+        self._index: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._terms: Dict[int, Set[str]] = {}
+        self._materials: Dict[int, Material] = {}
+        self._version = None
+        self._query_cache: OrderedDict[str, List[Material]] = OrderedDict()
+    
+    def add(self, material: Material):
+        """Добавить (или переиндексировать) материал"""
+        if material.id in self._materials:
+            self.remove(material.id)
+        
+        weights: Dict[str, int] = {}
+        fields = {
+            'title': material.title,
+            'category': ' '.join([
+                MATERIAL_THEMES.get(material.category, material.category),
+                MATERIAL_FORMATS.get(material.format, material.format)
+            ]),
+            'description': material.description
+        }
+        
+        for field_name, text in fields.items():
+            for term in normalize(text):
+                weights[term] = weights.get(term, 0) + FIELD_WEIGHTS[field_name]
+        
+        for term, weight in weights.items():
+            self._index[term][material.id] = weight
+        
+        self._terms[material.id] = set(weights)
+        self._materials[material.id] = material
+        self._query_cache.clear()
+    
+    def remove(self, material_id: int):
+        """Убрать материал из индекса"""
+        for term in self._terms.pop(material_id, ()):
+            postings = self._index.get(term)
+            if postings is None:
+                continue
+            postings.pop(material_id, None)
+            if not postings:
+                del self._index[term]
+        
+        self._materials.pop(material_id, None)
+        self._query_cache.clear()
+    
+    def sync(self):
+        """Применить изменения материалов с прошлой синхронизации"""
+        if self._version == materials_repository.version:
+            return
+        
+        current = {material.id: material for material in materials_repository.all()}
+        
+        for material_id in set(self._materials) - set(current):
+            self.remove(material_id)
+        
+        for material_id, material in current.items():
+            if self._materials.get(material_id) != material:
+                self.add(material)
+        
+        self._version = materials_repository.version
+        logger.info(f"Search index synced: {len(self._materials)} materials, {len(self._index)} terms")
+    
+    def search(self, query: str) -> List[Material]:
+        """Материалы, содержащие все слова запроса, по убыванию релевантности"""
+        self.sync()
+        
+        terms = frozenset(normalize(query))
+        if not terms:
+            return []
+        
+        cache_key = ' '.join(sorted(terms))
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            self._query_cache.move_to_end(cache_key)
+            return cached
+        
+        postings = [self._index.get(term) for term in terms]
+        if not all(postings):
+            return []
+        
+        # Пересекаем, начиная с самого короткого списка
+        postings.sort(key=len)
+        scores = dict(postings[0])
+        for other in postings[1:]:
+            scores = {
+                material_id: score + other[material_id]
+                for material_id, score in scores.items()
+                if material_id in other
+            }
+        
+        ranked = sorted(scores, key=lambda material_id: (-scores[material_id], material_id))
+        results = [self._materials[material_id] for material_id in ranked]
+        
+        self._query_cache[cache_key] = results
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        
+        return results
+
+
+# Singleton instance
+search_index = SearchIndex()
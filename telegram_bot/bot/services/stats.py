@@ -0,0 +1,123 @@
+"""Статистика пользователей для админ-панели"""
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bot.database.repository import user_repository, UserSnapshot
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class StatsAggregator:
+    """Счетчики пользователей, обновляемые по событиям репозитория
+    
+    Всего, с оплатой, по статусам и регистрации по дням хранятся в
+    памяти. user_repository.on_user_change присылает снимки до и после
+    изменения: снимок "до" вычитается, "после" добавляется, поэтому
+    каждое событие - O(1), а панель админа не читает базу.
+    
+    Полный пересчет - один GROUP BY в базе при старте и раз в
+    STATS_RECOMPUTE_INTERVAL секунд (исправляет расхождения, например
+    от изменений, сделанных другими репликами).
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self.total = 0
+        self.paid = 0
+        self.statuses: Counter = Counter()
+        self.signups: Counter = Counter()
+        self.ready = False
+        # События, пришедшие во время пересчета (None - пересчета нет)
+        self._pending: Optional[List[Tuple[Optional[UserSnapshot], UserSnapshot]]] = None
+        user_repository.on_user_change(self.apply)
+    
+    def apply(self, before: Optional[UserSnapshot], after: UserSnapshot):
+        """Учесть изменение пользователя"""
+        if self._pending is not None:
+            self._pending.append((before, after))
+        self._apply(before, after)
+    
+    def _apply(self, before: Optional[UserSnapshot], after: UserSnapshot):
+        """Вычесть снимок до и добавить снимок после"""
+        if before is not None:
+            self._add(before, -1)
+        self._add(after, 1)
+    
+    def _add(self, snapshot: UserSnapshot, sign: int):
+        """Добавить (sign=1) или вычесть (sign=-1) пользователя"""
+        self.total += sign
+        self.paid += sign if snapshot.paid else 0
+        self.statuses[snapshot.status or 'неизвестен'] += sign
+        if snapshot.registered is not None:
+            self.signups[snapshot.registered] += sign
+    
+    async def recompute(self):
+        """Пересчитать счетчики по базе
+        
+        Изменения, пришедшие пока идет запрос, копятся и применяются
+        поверх результата, иначе они затерлись бы им.
+        """
+        self._pending = []
+        try:
+            rows = await user_repository.get_user_aggregates()
+        finally:
+            pending, self._pending = self._pending, None
+        
+        total = 0
+        paid = 0
+        statuses: Counter = Counter()
+        signups: Counter = Counter()
+        
+        for status, payment_status, day, count in rows:
+            total += count
+            paid += count if payment_status else 0
+            statuses[status or 'неизвестен'] += count
+            if day is not None:
+                # SQLite возвращает дату строкой
+                signups[date.fromisoformat(str(day)[:10])] += count
+        
+        self.total, self.paid, self.statuses, self.signups = total, paid, statuses, signups
+        for before, after in pending:
+            self._apply(before, after)
+        self.ready = True
+        logger.info(f"Stats recomputed: {total} users")
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения для админ-панели"""
+        today = date.today()
+        days: List[Tuple[date, int]] = [
+            (day, self.signups.get(day, 0))
+            for day in (today - timedelta(days=offset) for offset in range(self.config.STATS_SIGNUP_DAYS))
+        ]
+        
+        return {
+            'total': self.total,
+            'paid': self.paid,
+            'conversion': self.paid / self.total * 100 if self.total > 0 else 0.0,
+            'statuses': sorted(
+                ((status, count) for status, count in self.statuses.items() if count > 0),
+                key=lambda item: -item[1]
+            ),
+            'signups': days
+        }
+    
+    async def run(self):
+        """Фоновая задача: пересчет при старте и по расписанию"""
+        while True:
+            try:
+                await self.recompute()
+            except Exception as e:
+                logger.error(f"Failed to recompute stats: {e}")
+            
+            if self.config.STATS_RECOMPUTE_INTERVAL <= 0 and self.ready:
+                return
+            await asyncio.sleep(self.config.STATS_RECOMPUTE_INTERVAL or 60)
+
+
+# Singleton instance
+stats = StatsAggregator()
@@ -0,0 +1,193 @@
+"""Снятие истекших подписок и напоминания о продлении"""
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from bot.database.redis_client import acquire_lock
+from bot.database.repository import user_repository
+from bot.keyboards.inline import get_subscription_keyboard
+from bot.utils.rate_limit import outgoing_messages
+from bot.utils.texts import SUBSCRIPTION_EXPIRING, SUBSCRIPTION_EXPIRED
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+EXPIRE = 'expire'
+REMIND = 'remind'
+
+
+class SubscriptionScheduler:
+    """Фоновый планировщик окончания подписок
+    
+    Сроки активных подписок лежат в min-heap (время, user_id, событие,
+    дата окончания), поэтому ближайшее событие - вершина кучи, а задача
+    спит ровно до него. Продление или отмена подписки приходят из
+    user_repository.on_subscription_change: новая дата просто добавляется
+    в кучу, а устаревшие записи пропускаются при извлечении.
+    
+    Все наступившие окончания снимаются одним expire_subscriptions (в
+    Google Sheets изменения уходят обычной синхронизацией), затем
+    пользователям отправляются уведомления. Напоминание приходит за
+    SUBSCRIPTION_REMINDER_DAYS дней до окончания, если срок в базе все
+    еще тот же. Раз в
+    SUBSCRIPTION_RELOAD_INTERVAL секунд сроки перечитываются из базы.
+    """
+    
+    def __init__(self):
+        self.config = Config()
+        self._heap: List[Tuple[datetime, int, str, datetime]] = []
+        self._ends: Dict[int, datetime] = {}
+        self._wakeup = asyncio.Event()
+        # Лок у другой реплики - наступившие события ждут в куче
+        self._standby = False
+        user_repository.on_subscription_change(self.track)
+    
+    def track(self, user_id: int, end_date: Optional[datetime]):
+        """Запланировать окончание подписки (None - подписка не активна)"""
+        if end_date is None:
+            self._ends.pop(user_id, None)
+            return
+        
+        if self._ends.get(user_id) == end_date:
+            return
+        
+        self._ends[user_id] = end_date
+        for entry in self._entries(user_id, end_date, datetime.now()):
+            heapq.heappush(self._heap, entry)
+        self._wakeup.set()
+    
+    def _entries(self, user_id: int, end_date: datetime, now: datetime) -> List[Tuple[datetime, int, str, datetime]]:
+        """События кучи для подписки: окончание и, если еще не поздно, напоминание"""
+        entries = [(end_date, user_id, EXPIRE, end_date)]
+        
+        if self.config.SUBSCRIPTION_REMINDER_DAYS > 0:
+            remind_at = end_date - timedelta(days=self.config.SUBSCRIPTION_REMINDER_DAYS)
+            if remind_at > now:
+                entries.append((remind_at, user_id, REMIND, end_date))
+        
+        return entries
+    
+    async def load(self):
+        """Перечитать сроки активных подписок из базы"""
+        now = datetime.now()
+        subscriptions = await user_repository.get_active_subscriptions()
+        
+        heap = []
+        for user_id, end_date in subscriptions:
+            heap.extend(self._entries(user_id, end_date, now))
+        heapq.heapify(heap)
+        
+        self._heap = heap
+        self._ends = dict(subscriptions)
+        logger.info(f"Subscription scheduler loaded: {len(subscriptions)} active subscriptions")
+    
+    def _pop_due(self, now: datetime) -> Tuple[List[int], List[Tuple[int, datetime]]]:
+        """Извлечь наступившие события: (к снятию, к напоминанию)"""
+        expire = []
+        remind = []
+        
+        while self._heap and self._heap[0][0] <= now:
+            _, user_id, kind, end_date = heapq.heappop(self._heap)
+            
+            # Подписку продлили или отменили после постановки в кучу
+            if self._ends.get(user_id) != end_date:
+                continue
+            
+            if kind == EXPIRE:
+                del self._ends[user_id]
+                expire.append(user_id)
+            else:
+                remind.append((user_id, end_date))
+        
+        return expire, remind
+    
+    async def process(self, bot: Bot):
+        """Снять истекшие подписки и разослать уведомления"""
+        now = datetime.now()
+        if not self._heap or self._heap[0][0] > now:
+            return
+        
+        # При нескольких репликах уведомляет одна (сроки загружены у всех).
+        # Лок берется до извлечения событий: остальные реплики их не
+        # выбрасывают и обработают, если владелец лока пропадет.
+        self._standby = not await acquire_lock('subscription_scheduler', self.config.SUBSCRIPTION_RELOAD_INTERVAL)
+        if self._standby:
+            return
+        
+        expire, remind = self._pop_due(now)
+        
+        expired = await user_repository.expire_subscriptions(expire)
+        if expired:
+            logger.info(f"Subscriptions expired: {len(expired)}")
+        
+        for user_id in expired:
+            await self._notify(bot, user_id, SUBSCRIPTION_EXPIRED)
+        
+        # Подписку могли продлить или снять на другой реплике - сверяемся с базой
+        ends = await user_repository.get_subscription_ends([user_id for user_id, _ in remind])
+        
+        for user_id, end_date in remind:
+            if ends.get(user_id) != end_date:
+                self.track(user_id, ends.get(user_id))
+                continue
+            
+            await self._notify(bot, user_id, SUBSCRIPTION_EXPIRING.format(
+                end_date=end_date.strftime('%d.%m.%Y')
+            ))
+    
+    async def _notify(self, bot: Bot, user_id: int, text: str):
+        """Отправить уведомление с кнопкой продления"""
+        for _ in range(2):
+            await outgoing_messages.acquire()
+            
+            try:
+                await bot.send_message(
+                    user_id,
+                    text,
+                    reply_markup=get_subscription_keyboard(self.config.SUBSCRIPTION_PRICE)
+                )
+                return
+            except TelegramRetryAfter as e:
+                outgoing_messages.pause(e.retry_after)
+            except TelegramAPIError as e:
+                logger.warning(f"Failed to notify user {user_id} about subscription: {e}")
+                return
+    
+    def _seconds_to_next(self) -> float:
+        """Сколько ждать до ближайшего события"""
+        timeout = float(self.config.SUBSCRIPTION_RELOAD_INTERVAL)
+        if self._heap and not self._standby:
+            timeout = min(timeout, (self._heap[0][0] - datetime.now()).total_seconds())
+        return max(timeout, 0.0)
+    
+    async def run(self, bot: Bot):
+        """Фоновая задача: спать до ближайшего события и обрабатывать его"""
+        last_load = None
+        
+        while True:
+            try:
+                if last_load is None or time.monotonic() - last_load >= self.config.SUBSCRIPTION_RELOAD_INTERVAL:
+                    await self.load()
+                    last_load = time.monotonic()
+                
+                await self.process(bot)
+            except Exception as e:
+                logger.error(f"Subscription scheduler failed: {e}")
+            
+            # track() будит задачу, если новое событие раньше текущего
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._seconds_to_next())
+            except asyncio.TimeoutError:
+                pass
+
+
+# Singleton instance
+subscription_scheduler = SubscriptionScheduler()
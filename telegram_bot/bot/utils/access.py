@@ -0,0 +1,84 @@
+"""Реестр доступа к callback: какие действия требуют подписки"""
+
+from typing import Dict, Optional, Type, Union
+
+from aiogram.filters.callback_data import CallbackData
+
+
+class _TrieNode:
+    """Узел префиксного дерева"""
+    
+    __slots__ = ('children', 'paid')
+    
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.paid: Optional[bool] = None
+
+
+class AccessPolicy:
+    """Единый список платных и бесплатных callback
+    
+    Handlers регистрируют свои callback рядом с объявлением (точное
+    значение, префикс или класс CallbackData). Проверка - поиск в словаре точных значений,
+    затем проход по префиксному дереву, O(длина callback_data).
+    Побеждает самое длинное совпадение; незарегистрированные действия
+    бесплатны.
+    """
+    
+    def __init__(self):
+        self._exact: Dict[str, bool] = {}
+        self._root = _TrieNode()
+    
+    def register(
+        self,
+        callback_data: Union[str, Type[CallbackData]],
+        paid: bool,
+        prefix: bool = False
+    ):
+        """Зарегистрировать callback (или префикс callback)"""
+        if isinstance(callback_data, type) and issubclass(callback_data, CallbackData):
+            # Все значения класса: "<prefix>:..."
+            callback_data = callback_data.__prefix__ + callback_data.__separator__
+            prefix = True
+        
+        if not prefix:
+            self._exact[callback_data] = paid
+            return
+        
+        node = self._root
+        for char in callback_data:
+            node = node.children.setdefault(char, _TrieNode())
+        node.paid = paid
+    
+    def paid(self, callback_data: Union[str, Type[CallbackData]], prefix: bool = False):
+        """Действие требует подписки"""
+        self.register(callback_data, True, prefix)
+    
+    def free(self, callback_data: Union[str, Type[CallbackData]], prefix: bool = False):
+        """Действие доступно без подписки"""
+        self.register(callback_data, False, prefix)
+    
+    def requires_subscription(self, callback_data: Optional[str]) -> bool:
+        """Проверить, требует ли callback подписку"""
+        if not callback_data:
+            return False
+        
+        paid = self._exact.get(callback_data)
+        if paid is not None:
+            return paid
+        
+        # Самый длинный зарегистрированный префикс
+        paid = False
+        node = self._root
+        for char in callback_data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.paid is not None:
+                paid = node.paid
+        
+        return paid
+
+
+# Singleton instance
+access_policy = AccessPolicy()
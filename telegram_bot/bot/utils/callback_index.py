@@ -0,0 +1,227 @@
+"""Поиск callback handler по индексу вместо перебора всех routers"""
+
+import logging
+import operator
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Dispatcher, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.filters.callback_data import CallbackQueryFilter
+from aiogram.types import CallbackQuery, TelegramObject
+from magic_filter.operations import CallOperation, ComparatorOperation, GetAttributeOperation
+
+logger = logging.getLogger(__name__)
+
+# Ключ handler: ('exact', значение) или ('prefix', префикс)
+Key = Tuple[str, str]
+
+
+class _TrieNode:
+    """Узел префиксного дерева"""
+    
+    __slots__ = ('children', 'handlers')
+    
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.handlers: List[int] = []
+
+
+def handler_key(handler: HandlerObject) -> Optional[Key]:
+    """Условие на callback_data, без которого handler точно не сработает
+    
+    Понимает CallbackData.filter(), F.data == "..." и
+    F.data.startswith("..."). Для остальных фильтров - None.
+    """
+    for filter_object in handler.filters or []:
+        key = _filter_key(filter_object)
+        if key is not None:
+            return key
+    return None
+
+
+def _filter_key(filter_object: FilterObject) -> Optional[Key]:
+    """Ключ одного фильтра"""
+    if isinstance(filter_object.callback, CallbackQueryFilter):
+        callback_data = filter_object.callback.callback_data
+        # Без полей значение упаковывается в один префикс
+        if callback_data.model_fields:
+            return 'prefix', callback_data.__prefix__ + callback_data.__separator__
+        return 'exact', callback_data.__prefix__
+    
+    if filter_object.magic is None:
+        return None
+    
+    operations = filter_object.magic._operations
+    if not operations or not isinstance(operations[0], GetAttributeOperation) or operations[0].name != 'data':
+        return None
+    
+    if (
+        len(operations) == 2
+        and isinstance(operations[1], ComparatorOperation)
+        and operations[1].comparator is operator.eq
+        and isinstance(operations[1].right, str)
+    ):
+        return 'exact', operations[1].right
+    
+    if (
+        len(operations) == 3
+        and isinstance(operations[1], GetAttributeOperation)
+        and operations[1].name == 'startswith'
+        and isinstance(operations[2], CallOperation)
+        and len(operations[2].args) == 1
+        and isinstance(operations[2].args[0], str)
+        and not operations[2].kwargs
+    ):
+        return 'prefix', operations[2].args[0]
+    
+    return None
+
+
+class CallbackIndex:
+    """Индекс callback handlers всех routers диспетчера
+    
+    Handlers нумеруются в порядке, в котором их перебирает aiogram (router,
+    затем его sub_routers). По callback_data берутся кандидаты: точные
+    значения из словаря, префиксы - проходом по дереву, O(длина данных),
+    плюс handlers без понятного ключа. Фильтры проверяются только у
+    кандидатов и в исходном порядке, поэтому выбирается тот же handler,
+    что и при полном переборе. Синхронные фильтры (F.data ...) aiogram
+    выполняет в пуле потоков, так что каждый лишний проверенный handler
+    стоит десятки микросекунд.
+    """
+    
+    def __init__(self, dispatcher: Router):
+        self._handlers: List[Tuple[Router, HandlerObject]] = []
+        self._exact: Dict[str, List[int]] = {}
+        self._root = _TrieNode()
+        self._unindexed: List[int] = []
+        
+        for router in dispatcher.chain_tail:
+            for handler in router.callback_query.handlers:
+                self._add(router, handler)
+    
+    @staticmethod
+    def supports(dispatcher: Router) -> bool:
+        """Индекс повторяет перебор aiogram, если у вложенных routers нет
+        своих root-фильтров и outer middleware на callback_query"""
+        for router in dispatcher.chain_tail:
+            if router is dispatcher:
+                continue
+            observer = router.callback_query
+            if observer._handler.filters or observer.outer_middleware:
+                return False
+        return True
+    
+    def _add(self, router: Router, handler: HandlerObject):
+        """Добавить handler в индекс"""
+        number = len(self._handlers)
+        self._handlers.append((router, handler))
+        
+        key = handler_key(handler)
+        if key is None:
+            self._unindexed.append(number)
+        elif key[0] == 'exact':
+            self._exact.setdefault(key[1], []).append(number)
+        else:
+            node = self._root
+            for char in key[1]:
+                node = node.children.setdefault(char, _TrieNode())
+            node.handlers.append(number)
+    
+    def __len__(self) -> int:
+        return len(self._handlers)
+    
+    def candidates(self, data: Optional[str]) -> List[Tuple[Router, HandlerObject]]:
+        """Handlers, которые могут подойти к callback_data, в порядке регистрации"""
+        numbers = list(self._unindexed)
+        
+        if data:
+            numbers.extend(self._exact.get(data, ()))
+            
+            node = self._root
+            numbers.extend(node.handlers)
+            for char in data:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                numbers.extend(node.handlers)
+        
+        numbers.sort()
+        return [self._handlers[number] for number in numbers]
+    
+    async def find(
+        self, event: CallbackQuery, kwargs: Dict[str, Any]
+    ) -> Optional[Tuple[Router, HandlerObject, Dict[str, Any]]]:
+        """Первый кандидат, чьи фильтры прошли: (router, handler, данные фильтров)"""
+        for router, handler in self.candidates(event.data):
+            result, data = await handler.check(event, **{**kwargs, 'event_router': router, 'handler': handler})
+            if result:
+                return router, handler, data
+        return None
+    
+    async def trigger(self, event: CallbackQuery, kwargs: Dict[str, Any]) -> Any:
+        """Вызвать handler так же, как TelegramEventObserver.trigger"""
+        for router, handler in self.candidates(event.data):
+            kwargs.update(event_router=router, handler=handler)
+            result, data = await handler.check(event, **kwargs)
+            if not result:
+                continue
+            
+            kwargs.update(data)
+            observer = router.callback_query
+            try:
+                wrapped = observer.outer_middleware.wrap_middlewares(
+                    observer._resolve_middlewares(), handler.call
+                )
+                return await wrapped(event, kwargs)
+            except SkipHandler:
+                continue
+        
+        return UNHANDLED
+
+
+class IndexedDispatcher(Dispatcher):
+    """Dispatcher, который ищет callback handler по CallbackIndex
+    
+    Индекс строится при первом callback после подключения routers. Если
+    routers устроены так, что индекс не может повторить перебор aiogram,
+    callback обрабатываются обычным перебором.
+    """
+    
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.use_callback_index = True
+        self._callback_index: Optional[CallbackIndex] = None
+        self._index_checked = False
+    
+    def include_router(self, router: Router) -> Router:
+        """Подключить router (индекс перестроится)"""
+        self._callback_index = None
+        self._index_checked = False
+        return super().include_router(router)
+    
+    @property
+    def callback_index(self) -> Optional[CallbackIndex]:
+        """Индекс callback handlers или None, если он неприменим"""
+        if not self._index_checked:
+            self._index_checked = True
+            if CallbackIndex.supports(self):
+                self._callback_index = CallbackIndex(self)
+                logger.info(f"Callback index built: {len(self._callback_index)} handlers")
+            else:
+                logger.warning("Callback index disabled: routers have their own callback filters or middlewares")
+        return self._callback_index
+    
+    async def _propagate_event(self, observer, update_type: str, event: TelegramObject, **kwargs: Any) -> Any:
+        index = self.callback_index if update_type == 'callback_query' and self.use_callback_index else None
+        if index is None:
+            return await super()._propagate_event(observer, update_type, event, **kwargs)
+        
+        # Root-фильтры самого диспетчера, как в Router._propagate_event
+        result, data = await observer.check_root_filters(event, **kwargs)
+        if not result:
+            return UNHANDLED
+        kwargs.update(data)
+        
+        return await index.trigger(event, kwargs)
@@ -0,0 +1,65 @@
+"""Постраничный вывод отсортированных списков по курсору"""
+
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+
+from aiogram.types import InlineKeyboardButton
+
+
+@dataclass
+class Page:
+    """Страница списка
+    
+    Курсор - id последнего элемента предыдущей страницы (0 - первая
+    страница). prev_cursor/next_cursor равны None, если страницы нет.
+    """
+    items: List[Any] = field(default_factory=list)
+    cursor: int = 0
+    prev_cursor: Optional[int] = None
+    next_cursor: Optional[int] = None
+    total: int = 0
+
+
+def paginate(
+    items: Sequence[Any],
+    cursor: int = 0,
+    limit: Optional[int] = None,
+    key: Callable[[Any], int] = lambda item: item.id
+) -> Page:
+    """Страница элементов с id больше cursor (items отсортированы по id)
+    
+    Позиция находится бинарным поиском, копируется только сама страница.
+    """
+    start = bisect.bisect_right(items, cursor, key=key) if cursor else 0
+    end = len(items) if limit is None else min(start + limit, len(items))
+    
+    page = Page(items=list(items[start:end]), cursor=cursor, total=len(items))
+    
+    if end < len(items):
+        page.next_cursor = key(items[end - 1])
+    
+    if start > 0 and limit is not None:
+        prev_start = max(0, start - limit)
+        page.prev_cursor = key(items[prev_start - 1]) if prev_start > 0 else 0
+    
+    return page
+
+
+def page_callbacks(page: Page, pack: Callable[[int], str]):
+    """callback_data кнопок ⬅️/➡️ для страницы: pack(cursor) -> str"""
+    prev_data = pack(page.prev_cursor) if page.prev_cursor is not None else None
+    next_data = pack(page.next_cursor) if page.next_cursor is not None else None
+    return prev_data, next_data
+
+
+def navigation_row(
+    prev_data: Optional[str], next_data: Optional[str]
+) -> List[InlineKeyboardButton]:
+    """Кнопки ⬅️/➡️ (без кнопки, если страницы нет)"""
+    row = []
+    if prev_data is not None:
+        row.append(InlineKeyboardButton(text="⬅️", callback_data=prev_data))
+    if next_data is not None:
+        row.append(InlineKeyboardButton(text="➡️", callback_data=next_data))
+    return row
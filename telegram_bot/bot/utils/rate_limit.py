@@ -0,0 +1,66 @@
+"""Ограничение частоты исходящих запросов к Telegram"""
+
+import asyncio
+import time
+from typing import Optional
+
+from config.config import Config
+
+
+class TokenBucket:
+    """Token bucket: в среднем rate операций в секунду, всплеск до capacity
+    
+    Токены восстанавливаются непрерывно, acquire ждет ровно столько,
+    сколько нужно до появления токена. Ожидающие обслуживаются по очереди,
+    поэтому один bucket можно делить между несколькими задачами.
+    
+    После RetryAfter от Telegram pause() останавливает всех, кто берет
+    токены из bucket, до конца flood wait, а не только получившую его задачу.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        """Начислить токены за прошедшее время"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, tokens: float = 1):
+        """Дождаться и забрать tokens токенов"""
+        async with self._lock:
+            while True:
+                # Пауза могла начаться, пока ждали токен
+                delay = self._resume_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                
+                self._refill()
+                if self._tokens >= tokens:
+                    break
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+            
+            self._tokens -= tokens
+    
+    def pause(self, seconds: float):
+        """Не выдавать токены seconds секунд (RetryAfter от Telegram)
+        
+        Во время паузы токены не копятся: после нее отправка начинается
+        с пустого bucket, без всплеска.
+        """
+        resume_at = time.monotonic() + seconds
+        if resume_at > self._resume_at:
+            self._resume_at = resume_at
+            self._updated = resume_at
+        self._tokens = 0
+
+
+# Singleton instance: общий лимит массовых сообщений (рассылки, уведомления)
+outgoing_messages = TokenBucket(Config().BROADCAST_RATE)
@@ -30,7 +30,7 @@ RECOVERY_RESET_TEXT = """
 """
 
 RECOVERY_DAY_TEXT = """
-📅 <b>День {day}</b>
+<b>{title}</b>
 
 {description}
 
@@ -179,6 +179,21 @@ SUBSCRIPTION_SUCCESS = """
 Приятной практики! ✨
 """
 
+SUBSCRIPTION_EXPIRING = """
+⏳ <b>Подписка скоро закончится</b>
+
+Доступ к практикам Recovery Lab открыт до <b>{end_date}</b>.
+
+Продлите подписку, чтобы не прерывать практику 👇
+"""
+
+SUBSCRIPTION_EXPIRED = """
+⌛ <b>Подписка закончилась</b>
+
+Спасибо, что практикуете с Recovery Lab!
+Продлите подписку, чтобы вернуть доступ ко всем практикам 👇
+"""
+
 PAYMENT_REMINDER = """
 {first_name}, вы не завершили оформление подписки 🙁
 
@@ -204,6 +219,29 @@ PRACTICE_SENT = """
 Приятной практики! 🙏
 """
 
+# Материалы
+MATERIALS_INTRO = """
+📚 <b>Материалы</b>
+
+Видео, статьи и аудио из закрытого канала Recovery Lab
+
+Выберите, как искать материалы:
+"""
+
+MATERIAL_FORMATS = {
+    'video': '🎥 Видео',
+    'article': '📄 Статьи',
+    'audio': '🎧 Аудио'
+}
+
+MATERIAL_THEMES = {
+    'back': '🧘 Позвоночник и осанка',
+    'breathing': '🌬 Дыхательные практики',
+    'energy': '⚡ Работа с энергией',
+    'relaxation': '😌 Снятие напряжения',
+    'strength': '💪 Укрепление тела'
+}
+
 # Админ
 ADMIN_NEW_PAYMENT = """
 💰 <b>Новая оплата</b>
@@ -217,71 +255,185 @@ ADMIN_NEW_PAYMENT = """
 <i>Ожидает активации подписки</i>
 """
 
+ADMIN_PAYMENT_ACTIVATED = """
+💰 <b>Новая оплата</b>
+
+<b>От:</b> {sender}
+<b>ID:</b> <code>{user_id}</code>
+
+<b>Сумма:</b> {amount}₽
+<b>Платеж:</b> <code>{charge_id}</code>
+
+✅ Подписка активирована до {end_date}
+"""
+
+# Telegram Payments
+INVOICE_TITLE = "Подписка Recovery Lab"
+INVOICE_DESCRIPTION = "Доступ ко всем практикам и материалам Recovery Lab на {days} дней"
+INVOICE_TEST_NOTE = " (тестовый платеж)"
+PAYMENT_CHECK_FAILED = "Счет устарел. Откройте оплату в боте заново."
+PAYMENT_ACTIVATION_FAILED = """
+⚠️ <b>Оплата получена, но подписку не удалось активировать</b>
+
+Мы уже получили уведомление и активируем доступ вручную.
+"""
+
+# Как оплатить: счетом Telegram Payments (PAYMENT_PROVIDER_TOKEN) или вручную
+HOW_TO_PAY_INVOICE = """<b>Как оплатить:</b>
+1. Нажмите "Оплатить"
+2. Оплатите счет картой прямо в Telegram
+3. Доступ откроется автоматически сразу после оплаты"""
+HOW_TO_PAY_MANUAL = """<b>Как оплатить:</b>
+1. Нажмите "Оплатить"
+2. Переведите {price}₽ любым удобным способом
+3. Нажмите "Я оплатил"
+4. Доступ откроется автоматически после проверки
+
+<i>💡 Сейчас идет тестовый период, поэтому оплата происходит вручную.
+Скоро добавим автоматическую оплату!</i>"""
+
+# Рассылка
+BROADCAST_SEGMENTS = {
+    'all': '👥 Все пользователи',
+    'paid': '💳 С активной подпиской',
+    'expired': '⌛ Подписка истекла',
+    'problem': '🆘 По проблеме'
+}
+
+BROADCAST_INTRO = """
+📤 <b>Рассылка сообщений</b>
+
+Кому отправить сообщение?
+"""
+
+BROADCAST_ASK_PROBLEM = """
+🆘 <b>Рассылка по проблеме</b>
+
+Напишите название проблемы (или его часть), как в колонке problems_selected.
+"""
+
+BROADCAST_ASK_MESSAGE = """
+✏️ <b>Сегмент:</b> {segment}
+<b>Получателей:</b> {total}
+
+Отправьте сообщение для рассылки или перешлите пост из канала.
+Бот скопирует его каждому получателю.
+"""
+
+BROADCAST_CONFIRM = """
+☝️ Так сообщение увидят пользователи.
+
+<b>Сегмент:</b> {segment}
+<b>Получателей:</b> {total}
+
+Начать рассылку?
+"""
+
+BROADCAST_PROGRESS = """
+📤 <b>Рассылка #{id}</b> - {status}
+
+<b>Сегмент:</b> {segment}
+<b>Обработано:</b> {processed} из {total}
+✅ Доставлено: {sent}
+🚫 Заблокировали бота: {blocked}
+❌ Ошибки: {failed}
+"""
+
+BROADCAST_STATUSES = {
+    'running': 'идет',
+    'done': 'завершена',
+    'cancelled': 'остановлена',
+    'failed': 'прервана из-за ошибки'
+}
+
+EXPORT_USAGE = """
+📁 <b>Выгрузка пользователей в CSV</b>
+
+<code>/export [status=...] [paid=yes|no] [from=ДД.ММ.ГГГГ] [to=ДД.ММ.ГГГГ] [gzip]</code>
+
+Например: <code>/export paid=yes from=01.09.2026 gzip</code>
+"""
+
+EXPORT_STARTED = "⏳ Готовлю выгрузку..."
+EXPORT_EMPTY = "📁 Под фильтр не попал ни один пользователь."
+EXPORT_TOO_LARGE = "❌ Файл {size} МБ больше лимита Telegram ({limit} МБ). Добавьте gzip или сузьте фильтр."
+EXPORT_FAILED = "❌ Не удалось выгрузить пользователей. Подробности в логах."
+EXPORT_DONE = "📁 Пользователей: {rows}"
+
 # Ошибки
 ERROR_GENERIC = "Произошла ошибка. Попробуйте позже."
 ERROR_NO_ACCESS = "🔒 Для доступа к практикам нужна подписка"
 ERROR_RATE_LIMIT = "Слишком много запросов. Подождите немного."
 
-# Структура Labs
+# Категория Lab без практик
+LAB_CATEGORY_TEXT = "<b>{title}</b>\n"
+PRACTICES_COMING_SOON = "\n<i>Практики добавляются...</i>"
+
+# Структура Labs (каталог по умолчанию, если нет LABS_CATALOG_FILE)
+# Практики категорий - материалы с полями lab и lab_category
 LABS_STRUCTURE = {
-    'recovery_reset': {
+    'recovery': {
         'title': '🔄 Recovery Reset',
-        'days': {
+        'text': RECOVERY_RESET_TEXT,
+        'category_text': RECOVERY_DAY_TEXT,
+        'back_text': '🔙 К списку дней',
+        'categories': {
             'day1': {
-                'title': 'День 1',
-                'description': 'Знакомство с телом и дыханием',
-                'practices': []  # Заполняется позже
+                'title': '📅 День 1',
+                'description': 'Знакомство с телом и дыханием'
             },
             'day2': {
-                'title': 'День 2', 
-                'description': 'Углубление практики',
-                'practices': []
+                'title': '📅 День 2',
+                'description': 'Углубление практики'
             },
             'day3': {
-                'title': 'День 3',
-                'description': 'Интеграция и закрепление',
-                'practices': []
+                'title': '📅 День 3',
+                'description': 'Интеграция и закрепление'
             }
         }
     },
-    'breath_lab': {
+    'breath': {
         'title': '🌬 Breath Lab',
+        'text': BREATH_LAB_TEXT,
         'categories': {
-            'recovery': 'Восстановительное дыхание',
-            'balance': 'Балансирующее дыхание',
-            'activating': 'Активирующее дыхание',
-            'body': 'Дыхание с телом'
+            'recovery': {'title': '🌊 Восстановительное дыхание'},
+            'balance': {'title': '⚖️ Балансирующее дыхание'},
+            'activating': {'title': '⚡ Активирующее дыхание'},
+            'body': {'title': '💫 Дыхание с телом'}
         }
     },
-    'body_lab': {
+    'body': {
         'title': '💆 Body Lab',
+        'text': BODY_LAB_TEXT,
         'categories': {
-            'diaphragm': 'Диафрагма и рёбра',
-            'belly': 'Живот',
-            'pelvic': 'Тазовое дно',
-            'mobility': 'Мягкая мобилизация',
-            'joints': 'Суставная подвижность',
-            'whole': 'Всё тело'
+            'diaphragm': {'title': '🫁 Диафрагма и рёбра'},
+            'belly': {'title': '🤰 Живот'},
+            'pelvic': {'title': '🌸 Тазовое дно'},
+            'mobility': {'title': '🌊 Мягкая мобилизация'},
+            'joints': {'title': '🦴 Суставная подвижность'},
+            'whole': {'title': '✨ Всё тело'}
         }
     },
-    'core_lab': {
+    'core': {
         'title': '🧘 Core Lab',
+        'text': CORE_LAB_TEXT,
         'categories': {
-            'neck': 'Шея и голова',
-            'thoracic': 'Грудной отдел',
-            'lumbar': 'Поясница',
-            'center': 'Центр и опора',
-            'joints': 'Суставы',
-            'integrity': 'Целостность тела'
+            'neck': {'title': '🦒 Шея и голова'},
+            'thoracic': {'title': '🫀 Грудной отдел'},
+            'lumbar': {'title': '🌀 Поясница'},
+            'center': {'title': '⚓ Центр и опора'},
+            'joints': {'title': '🦴 Суставы'},
+            'integrity': {'title': '🌟 Целостность тела'}
         }
     },
-    'mind_lab': {
+    'mind': {
         'title': '🧠 Mind Lab',
+        'text': MIND_LAB_TEXT,
         'categories': {
-            'relaxation': 'Расслабление',
-            'meditation': 'Медитации',
-            'state': 'Работа с состоянием',
-            'attention': 'Возвращение внимания'
+            'relaxation': {'title': '🌙 Расслабление'},
+            'meditation': {'title': '🧘‍♀️ Медитации'},
+            'state': {'title': '🌈 Работа с состоянием'},
+            'attention': {'title': '🎯 Возвращение внимания'}
         }
     }
 }
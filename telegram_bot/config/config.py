@@ -13,17 +13,55 @@ class Config:
     BOT_TOKEN: str = os.getenv('BOT_TOKEN', '')
     ADMIN_ID: int = int(os.getenv('ADMIN_ID', '0'))
     
+    # Webhook (вместо long polling)
+    USE_WEBHOOK: bool = os.getenv('USE_WEBHOOK', 'False').lower() == 'true'
+    WEBHOOK_URL: str = os.getenv('WEBHOOK_URL', '')  # https://bot.example.com
+    WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET: str = os.getenv('WEBHOOK_SECRET', '')  # Обязателен в режиме webhook: A-Z, a-z, 0-9, _ и -
+    WEBHOOK_DELETE_ON_SHUTDOWN: bool = os.getenv('WEBHOOK_DELETE_ON_SHUTDOWN', 'True').lower() == 'true'
+    WEBAPP_HOST: str = os.getenv('WEBAPP_HOST', '0.0.0.0')
+    WEBAPP_PORT: int = int(os.getenv('WEBAPP_PORT', os.getenv('PORT', '8080')))
+    
     # Database
     DATABASE_URL: str = os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///bot.db')
     
-    # Redis
+    # Redis (FSM, rate limit и инвалидация кеша для нескольких реплик)
+    USE_REDIS: bool = os.getenv('USE_REDIS', 'False').lower() == 'true'
     REDIS_HOST: str = os.getenv('REDIS_HOST', 'localhost')
     REDIS_PORT: int = int(os.getenv('REDIS_PORT', '6379'))
     REDIS_DB: int = int(os.getenv('REDIS_DB', '0'))
+    REDIS_PASSWORD: str = os.getenv('REDIS_PASSWORD', '')
     
     # Google Sheets
     GOOGLE_SHEETS_CREDENTIALS: str = os.getenv('GOOGLE_SHEETS_CREDENTIALS', '')
     GOOGLE_SHEET_ID: str = os.getenv('GOOGLE_SHEET_ID', '')
+    SHEETS_MAX_CONCURRENCY: int = int(os.getenv('SHEETS_MAX_CONCURRENCY', '4'))  # Одновременных запросов к Google
+    SHEETS_SYNC_INTERVAL: int = int(os.getenv('SHEETS_SYNC_INTERVAL', '30'))  # Выгрузка изменений, в секундах
+    SHEETS_PULL_INTERVAL: int = int(os.getenv('SHEETS_PULL_INTERVAL', '120'))  # Загрузка правок админа, в секундах
+    SHEETS_SYNC_BATCH: int = int(os.getenv('SHEETS_SYNC_BATCH', '500'))
+    SHEETS_REINDEX_INTERVAL: int = int(os.getenv('SHEETS_REINDEX_INTERVAL', '600'))  # В секундах, 0 - выключено
+    USER_CACHE_SIZE: int = int(os.getenv('USER_CACHE_SIZE', '10000'))
+    USER_CACHE_TTL: int = int(os.getenv('USER_CACHE_TTL', '60'))  # В секундах
+    WRITE_BEHIND_INTERVAL: int = int(os.getenv('WRITE_BEHIND_INTERVAL', '5'))  # В секундах
+    WRITE_BEHIND_JOURNAL: str = os.getenv('WRITE_BEHIND_JOURNAL', 'data/write_behind.journal')
+    LABS_CATALOG_FILE: str = os.getenv('LABS_CATALOG_FILE', 'data/labs.json')  # Без файла - LABS_STRUCTURE
+    MATERIALS_FILE: str = os.getenv('MATERIALS_FILE', 'data/materials.json')  # Без файла - примеры материалов
+    LABS_CATALOG_RELOAD_INTERVAL: int = int(os.getenv('LABS_CATALOG_RELOAD_INTERVAL', '30'))  # Каталог и материалы, в секундах, 0 - выключено
+    POPULARITY_FILE: str = os.getenv('POPULARITY_FILE', 'data/popularity.json')
+    POPULARITY_HALF_LIFE_HOURS: float = float(os.getenv('POPULARITY_HALF_LIFE_HOURS', '72'))
+    POPULARITY_CHECKPOINT_INTERVAL: int = int(os.getenv('POPULARITY_CHECKPOINT_INTERVAL', '300'))  # В секундах
+    BROADCAST_RATE: float = float(os.getenv('BROADCAST_RATE', '25'))  # Рассылки и уведомления, сообщений в секунду (лимит Telegram ~30)
+    BROADCAST_BATCH: int = int(os.getenv('BROADCAST_BATCH', '100'))  # Получателей на одно сохранение курсора
+    BROADCAST_PROGRESS_INTERVAL: int = int(os.getenv('BROADCAST_PROGRESS_INTERVAL', '10'))  # Обновление прогресса, в секундах
+    SUBSCRIPTION_REMINDER_DAYS: int = int(os.getenv('SUBSCRIPTION_REMINDER_DAYS', '3'))  # Напоминание до окончания подписки, 0 - выключено
+    PAYMENT_REMINDER_DELAY: int = int(os.getenv('PAYMENT_REMINDER_DELAY', '600'))  # Напоминание после "Оплатить", в секундах, 0 - выключено
+    ADMIN_DIGEST_WINDOW: float = float(os.getenv('ADMIN_DIGEST_WINDOW', '5'))  # Уведомления админу за это время - одной сводкой, в секундах
+    JOBS_BATCH: int = int(os.getenv('JOBS_BATCH', '100'))  # Отложенных задач за один проход
+    JOBS_RELOAD_INTERVAL: int = int(os.getenv('JOBS_RELOAD_INTERVAL', '600'))  # Перечитать задачи из базы, в секундах
+    SUBSCRIPTION_RELOAD_INTERVAL: int = int(os.getenv('SUBSCRIPTION_RELOAD_INTERVAL', '3600'))  # Перечитать сроки из базы, в секундах
+    STATS_RECOMPUTE_INTERVAL: int = int(os.getenv('STATS_RECOMPUTE_INTERVAL', '3600'))  # Полный пересчет статистики, в секундах, 0 - только при старте
+    STATS_SIGNUP_DAYS: int = int(os.getenv('STATS_SIGNUP_DAYS', '7'))  # Регистрации по дням в статистике
+    EXPORT_CHUNK: int = int(os.getenv('EXPORT_CHUNK', '1000'))  # Пользователей на один запрос при выгрузке /export
     
     # Payment
     PAYMENT_PROVIDER_TOKEN: str = os.getenv('PAYMENT_PROVIDER_TOKEN', '')
@@ -38,8 +76,8 @@ class Config:
     SUBSCRIPTION_DURATION_DAYS: int = int(os.getenv('SUBSCRIPTION_DURATION_DAYS', '30'))
     
     # Limits
-    RATE_LIMIT_REQUESTS: int = int(os.getenv('RATE_LIMIT_REQUESTS', '5'))
-    RATE_LIMIT_PERIOD: int = int(os.getenv('RATE_LIMIT_PERIOD', '60'))
+    RATE_LIMIT_REQUESTS: int = int(os.getenv('RATE_LIMIT_REQUESTS', '20'))  # Запросов на пользователя
+    RATE_LIMIT_PERIOD: int = int(os.getenv('RATE_LIMIT_PERIOD', '10'))  # За столько секунд
     
     # Welcome video file_id (оставляем пустым, заполнишь потом)
     WELCOME_VIDEO_FILE_ID: str = os.getenv('WELCOME_VIDEO_FILE_ID', '')
@@ -0,0 +1,83 @@
+"""Общие настройки тестов
+
+Config читает переменные окружения при импорте, поэтому окружение
+задается здесь, до импорта модулей бота. Запуск: python -m pytest
+из каталога telegram_bot.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix='bot_tests_')
+
+os.environ.update({
+    'BOT_TOKEN': '42:TEST',
+    'ADMIN_ID': '1',
+    'DATABASE_URL': f"sqlite+aiosqlite:///{os.path.join(TMP_DIR, 'bot.db')}",
+    'USE_REDIS': 'False',
+    'USE_WEBHOOK': 'False',
+    'GOOGLE_SHEETS_CREDENTIALS': '',
+    'PAYMENT_PROVIDER_TOKEN': '',
+    'WRITE_BEHIND_JOURNAL': os.path.join(TMP_DIR, 'write_behind.journal'),
+    'POPULARITY_FILE': os.path.join(TMP_DIR, 'popularity.json'),
+})
+
+# bot.main пишет лог в logs/bot.log
+os.makedirs('logs', exist_ok=True)
+
+
+@pytest.fixture(scope='session')
+def loop():
+    """Один event loop на все тесты (движок базы привязан к loop)"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def db(loop):
+    """Пустая локальная база"""
+    from bot.database.models import Base
+    from bot.database.repository import user_repository
+    
+    async def reset():
+        async with user_repository.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        user_repository.cache.clear()
+    
+    loop.run_until_complete(reset())
+    yield user_repository
+
+
+@pytest.fixture(scope='session')
+def dispatcher():
+    """Диспетчер бота (routers подключаются к диспетчеру один раз)"""
+    from bot.main import create_dispatcher
+    
+    return create_dispatcher()
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    """write(data, name) -> путь: JSON во временном файле, каждая запись сдвигает mtime"""
+    versions = itertools.count(1)
+    
+    def write(data, name: str = 'data.json') -> str:
+        path = tmp_path / name
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        # Правки в ту же секунду тоже должны быть видны по mtime
+        mtime = 1_000_000 + next(versions)
+        os.utime(path, (mtime, mtime))
+        return str(path)
+    
+    return write
@@ -0,0 +1,153 @@
+"""Поддельный Telegram Bot API для тестов"""
+
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+from bot.keyboards.prebuilt import PrebuiltKeyboardSession
+
+# Методы, которые возвращают отправленное сообщение
+MESSAGE_METHODS = {'sendMessage', 'sendDocument', 'sendInvoice', 'sendVideoNote', 'editMessageText'}
+
+
+class FakeTelegram:
+    """HTTP-сервер вместо api.telegram.org
+    
+    Бот из bot() ходит сюда, каждый вызов запоминается в calls как
+    (метод, параметры), reject позволяет ответить ошибкой.
+    Используется как async context manager.
+    """
+    
+    def __init__(self):
+        self.calls: List[tuple] = []
+        # reject(method, params) -> описание ошибки 400, ответ-ошибка
+        # целиком ({'error_code': 403, 'description': ...}) или None
+        self.reject: Optional[Callable[[str, Dict[str, Any]], Optional[str]]] = None
+        self._message_ids = itertools.count(1000)
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self.server = TestServer(app)
+        self._bots: List[Bot] = []
+    
+    async def __aenter__(self) -> 'FakeTelegram':
+        await self.server.start_server()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        for bot in self._bots:
+            await bot.session.close()
+        await self.server.close()
+    
+    def bot(self) -> Bot:
+        """Бот, который ходит в этот сервер"""
+        api = TelegramAPIServer.from_base(str(self.server.make_url('')).rstrip('/'))
+        bot = Bot(
+            token='42:TEST',
+            session=PrebuiltKeyboardSession(api=api),
+            default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+        )
+        self._bots.append(bot)
+        return bot
+    
+    def called(self, method: str) -> List[Dict[str, Any]]:
+        """Параметры всех вызовов метода"""
+        return [params for name, params in self.calls if name == method]
+    
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Ответить как Bot API"""
+        method = request.match_info['method']
+        params = dict(await request.post())
+        self.calls.append((method, params))
+        
+        error = self.reject(method, params) if self.reject else None
+        if isinstance(error, str):
+            error = {'error_code': 400, 'description': error}
+        if error:
+            return web.json_response({'ok': False, **error}, status=error['error_code'])
+        
+        result: Any = True
+        if method in MESSAGE_METHODS:
+            result = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        elif method == 'copyMessage':
+            result = {'message_id': next(self._message_ids)}
+        
+        return web.json_response({'ok': True, 'result': result})
+
+
+def user(user_id: int = 100, first_name: str = 'Тест') -> Dict[str, Any]:
+    """Отправитель обновления"""
+    return {'id': user_id, 'is_bot': False, 'first_name': first_name, 'username': f"user{user_id}"}
+
+
+def message_update(update_id: int, text: str, user_id: int = 100) -> Dict[str, Any]:
+    """Обновление с текстовым сообщением"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user(user_id),
+            'text': text
+        }
+    }
+
+
+def callback_update(update_id: int, data: str, user_id: int = 100) -> Dict[str, Any]:
+    """Обновление с нажатием inline-кнопки"""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': user(user_id),
+                'text': 'Меню'
+            }
+        }
+    }
+
+
+def pre_checkout_update(update_id: int, payload: str, amount: int, user_id: int = 100) -> Dict[str, Any]:
+    """Проверка счета перед списанием"""
+    return {
+        'update_id': update_id,
+        'pre_checkout_query': {
+            'id': str(update_id),
+            'from': user(user_id),
+            'currency': 'RUB',
+            'total_amount': amount,
+            'invoice_payload': payload
+        }
+    }
+
+
+def payment_update(update_id: int, charge_id: str, payload: str, amount: int, user_id: int = 100) -> Dict[str, Any]:
+    """Сообщение об успешной оплате"""
+    update = message_update(update_id, '', user_id)
+    del update['message']['text']
+    update['message']['successful_payment'] = {
+        'currency': 'RUB',
+        'total_amount': amount,
+        'invoice_payload': payload,
+        'telegram_payment_charge_id': charge_id,
+        'provider_payment_charge_id': f"provider_{charge_id}"
+    }
+    return update
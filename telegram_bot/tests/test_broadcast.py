@@ -0,0 +1,188 @@
+"""Рассылки: сегменты, продолжение с курсора, счетчики и остановка"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from bot.database.broadcasts import broadcast_repository
+from bot.database.repository import user_repository
+from bot.services.broadcast import broadcaster
+from bot.utils.rate_limit import TokenBucket
+from tests.fake_telegram import FakeTelegram
+
+ADMIN_ID = 1
+
+# user_id -> поля пользователя
+USERS = {
+    301: {'payment_status': True, 'subscription_end': datetime.now() + timedelta(days=10), 'problems_selected': 'Шея'},
+    302: {'payment_status': True, 'subscription_end': datetime.now() - timedelta(days=1), 'status': 'истек'},
+    303: {'status': 'истек', 'problems_selected': 'Шея, Спина'},
+    304: {},
+    305: {'payment_status': True},
+}
+
+
+@pytest.fixture
+def users(loop, db, monkeypatch):
+    """Пользователи USERS и свой bucket без ограничения скорости"""
+    async def create():
+        for user_id, fields in USERS.items():
+            await db.add_user({'user_id': user_id, 'username': '', 'first_name': 'Тест', 'last_name': ''})
+            if fields:
+                await db.update_user(user_id, fields)
+    
+    loop.run_until_complete(create())
+    monkeypatch.setattr(broadcaster, 'bucket', TokenBucket(1000))
+    return USERS
+
+
+def create_broadcast(segment: str = 'all', value: str = '', **fields):
+    return broadcast_repository.create(
+        admin_id=ADMIN_ID, from_chat_id=ADMIN_ID, message_id=7,
+        segment=segment, segment_value=value, progress_message_id=50, **fields
+    )
+
+
+def copied_to(telegram: FakeTelegram) -> list:
+    return [int(params['chat_id']) for params in telegram.called('copyMessage')]
+
+
+@pytest.mark.parametrize('segment, value, expected', [
+    ('all', '', [301, 302, 303, 304, 305]),
+    ('paid', '', [301, 305]),
+    ('expired', '', [302, 303]),
+    ('problem', 'Шея', [301, 303]),
+])
+def test_segments(loop, users, segment, value, expected):
+    async def scenario():
+        assert await user_repository.count_segment(segment, value) == len(expected)
+        
+        # Пачками по 1 - тот же порядок и без повторов
+        ids, after = [], 0
+        while batch := await user_repository.get_segment_ids(segment, value, after=after, limit=1):
+            ids.extend(batch)
+            after = batch[-1]
+        assert ids == expected
+    
+    loop.run_until_complete(scenario())
+
+
+def test_resume_from_cursor_and_counters(loop, users):
+    errors = {
+        303: {'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'},
+        304: {'error_code': 400, 'description': 'Bad Request: chat not found'},
+    }
+    
+    async def scenario():
+        # Рассылку прервал перезапуск после 302
+        broadcast = await create_broadcast(cursor=302, sent=2, total=5)
+        
+        async with FakeTelegram() as telegram:
+            telegram.reject = lambda method, params: errors.get(int(params.get('chat_id', 0)))
+            await broadcaster.resume(telegram.bot())
+            await asyncio.gather(*broadcaster._tasks.values())
+            
+            assert copied_to(telegram) == [303, 304, 305]
+            
+            result = await broadcast_repository.get(broadcast.id)
+            assert (result.status, result.cursor) == ('done', 305)
+            assert (result.sent, result.blocked, result.failed) == (3, 1, 1)
+            
+            # Итог показан админу
+            [report] = telegram.called('editMessageText')
+            assert report['message_id'] == '50'
+            assert 'завершена' in report['text']
+    
+    loop.run_until_complete(scenario())
+
+
+def test_flood_pauses_bucket_and_retries(loop, users):
+    flooded = []
+    
+    def reject(method, params):
+        if method == 'copyMessage' and not flooded:
+            flooded.append(params['chat_id'])
+            return {'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': 1}}
+        return None
+    
+    async def scenario():
+        broadcast = await create_broadcast('paid')
+        
+        async with FakeTelegram() as telegram:
+            telegram.reject = reject
+            started = time.monotonic()
+            broadcaster.start(telegram.bot(), broadcast)
+            await asyncio.gather(*broadcaster._tasks.values())
+            
+            assert time.monotonic() - started >= 1
+            assert copied_to(telegram) == [301, 301, 305]
+            
+            result = await broadcast_repository.get(broadcast.id)
+            assert (result.sent, result.blocked, result.failed) == (2, 0, 0)
+    
+    loop.run_until_complete(scenario())
+
+
+def test_pause_holds_every_acquire(loop):
+    bucket = TokenBucket(1000)
+    
+    async def scenario():
+        bucket.pause(0.2)
+        started = time.monotonic()
+        await asyncio.gather(bucket.acquire(), bucket.acquire())
+        return time.monotonic() - started
+    
+    assert loop.run_until_complete(scenario()) >= 0.2
+
+
+def test_stop(loop, users):
+    async def scenario():
+        broadcast = await create_broadcast()
+        
+        async with FakeTelegram() as telegram:
+            # Задача ждет конца flood wait и в этот момент ее останавливают
+            broadcaster.bucket.pause(60)
+            broadcaster.start(telegram.bot(), broadcast)
+            await asyncio.sleep(0.1)
+            
+            stopped = await broadcaster.stop(broadcast.id)
+            assert stopped.status == 'cancelled'
+            assert not broadcaster._tasks
+            assert copied_to(telegram) == []
+    
+    loop.run_until_complete(scenario())
+
+
+def test_cancelled_on_another_instance(loop, users):
+    async def scenario():
+        broadcast = await create_broadcast(status='cancelled')
+        
+        async with FakeTelegram() as telegram:
+            broadcaster.start(telegram.bot(), broadcast)
+            await asyncio.gather(*broadcaster._tasks.values())
+            
+            assert copied_to(telegram) == []
+            assert (await broadcast_repository.get(broadcast.id)).status == 'cancelled'
+    
+    loop.run_until_complete(scenario())
+
+
+def test_error_marks_broadcast_failed(loop, users, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError('database is locked')
+    
+    async def scenario():
+        broadcast = await create_broadcast()
+        monkeypatch.setattr(user_repository, 'get_segment_ids', broken)
+        
+        async with FakeTelegram() as telegram:
+            broadcaster.start(telegram.bot(), broadcast)
+            await asyncio.gather(*broadcaster._tasks.values())
+            
+            assert (await broadcast_repository.get(broadcast.id)).status == 'failed'
+            assert await broadcast_repository.get_running() == []
+            assert 'прервана из-за ошибки' in telegram.called('editMessageText')[0]['text']
+    
+    loop.run_until_complete(scenario())
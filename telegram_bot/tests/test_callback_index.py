@@ -0,0 +1,70 @@
+"""CallbackIndex выбирает тот же handler, что и перебор aiogram"""
+
+from aiogram import F, Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+
+from benchmarks.dispatch import PACKED_CALLBACKS, callback, linear_find
+from bot.utils.callback_index import CallbackIndex, IndexedDispatcher
+
+KWARGS = {'bot': None, 'raw_state': None}
+
+
+def test_same_handler_as_linear_dispatch(loop, dispatcher):
+    index = dispatcher.callback_index
+    assert index is not None
+    
+    for data in list(index._exact) + PACKED_CALLBACKS:
+        event = callback(data)
+        expected = loop.run_until_complete(linear_find(dispatcher, event, KWARGS))
+        found = loop.run_until_complete(index.find(event, KWARGS))
+        assert (found and found[1]) is (expected and expected[1]), data
+
+
+def test_registration_order_and_fallback(loop):
+    calls = []
+    first, second = Router(), Router()
+    
+    async def any_data(callback_query):
+        calls.append('any')
+    
+    async def exact(callback_query):
+        calls.append('exact')
+    
+    async def prefix(callback_query):
+        calls.append('prefix')
+    
+    # Handler без ключа раньше остальных - должен сработать первым
+    first.callback_query.register(any_data, F.data.len() > 10)
+    second.callback_query.register(exact, F.data == 'menu')
+    second.callback_query.register(prefix, F.data.startswith('me'))
+    
+    dispatcher = IndexedDispatcher()
+    dispatcher.include_routers(first, second)
+    
+    for data in ('menu', 'menu_and_more', 'mex', 'other'):
+        loop.run_until_complete(dispatcher.propagate_event('callback_query', callback(data), **KWARGS))
+    assert calls == ['exact', 'any', 'prefix']
+    
+    # Router с root-фильтром - индекс не применяется
+    filtered = Router()
+    filtered.callback_query.filter(F.data == 'menu')
+    dispatcher.include_router(filtered)
+    assert dispatcher.callback_index is None
+    assert loop.run_until_complete(
+        dispatcher.propagate_event('callback_query', callback('other'), **KWARGS)
+    ) is UNHANDLED
+
+
+def test_handler_keys():
+    router = Router()
+    router.callback_query.register(lambda _: None, F.data == 'a')
+    router.callback_query.register(lambda _: None, F.data.startswith('b'))
+    router.callback_query.register(lambda _: None, F.data.in_({'c'}))
+    
+    dispatcher = IndexedDispatcher()
+    dispatcher.include_router(router)
+    index = CallbackIndex(dispatcher)
+    
+    assert list(index._exact) == ['a']
+    assert index._root.children['b'].handlers == [1]
+    assert index._unindexed == [2]
@@ -0,0 +1,120 @@
+"""Каталог Labs: загрузка из файла, LABS_STRUCTURE и перезагрузка по mtime"""
+
+import pytest
+
+from bot.database.materials import MaterialsRepository
+from bot.keyboards import prebuilt as prebuilt_module
+from bot.services import catalog
+from bot.services.catalog import LabsCatalog
+from bot.utils.texts import BREATH_LAB_TEXT, LABS_STRUCTURE, PRACTICES_COMING_SOON
+
+CATALOG = {
+    'breath': {
+        'title': 'Дыхание',
+        'category_text': '<b>{title}</b>\n{description}\n',
+        'categories': {'calm': {'title': 'Спокойствие', 'description': 'Медленный выдох'}}
+    }
+}
+
+PRACTICE = {'id': 10, 'title': 'Выдох на 6 счетов', 'format': 'audio', 'lab': 'breath', 'lab_category': 'calm'}
+
+
+@pytest.fixture
+def materials(json_file, monkeypatch):
+    """Пустой репозиторий материалов из временного файла"""
+    repository = MaterialsRepository()
+    repository.path = json_file([], 'materials.json')
+    repository.load()
+    monkeypatch.setattr(catalog, 'materials_repository', repository)
+    return repository
+
+
+def load_catalog(path: str) -> LabsCatalog:
+    labs = LabsCatalog()
+    labs.path = path
+    assert labs.load()
+    return labs
+
+
+def is_prebuilt(markup) -> bool:
+    entry = prebuilt_module._prebuilt.get(id(markup))
+    return entry is not None and entry[0] is markup
+
+
+def buttons(markup) -> list:
+    return [button.text for row in markup.inline_keyboard for button in row]
+
+
+def test_fallback_to_labs_structure(materials, tmp_path):
+    labs = load_catalog(str(tmp_path / 'missing.json'))
+    
+    assert list(labs.labs) == list(LABS_STRUCTURE)
+    recovery = labs.get_lab('recovery')
+    assert list(recovery.categories) == list(LABS_STRUCTURE['recovery']['categories'])
+    assert labs.get_category('recovery', 'day1').back_text == LABS_STRUCTURE['recovery']['back_text']
+    assert labs.get_category('recovery', 'missing') is None
+    assert buttons(labs.main_menu)[0] == LABS_STRUCTURE['recovery']['title']
+
+
+def test_load_from_file(materials, json_file):
+    labs = load_catalog(json_file(CATALOG))
+    
+    assert list(labs.labs) == ['breath']
+    lab = labs.get_lab('breath')
+    # Заголовок и текст категорий из файла, остальные тексты - из LABS_STRUCTURE
+    assert lab.title == 'Дыхание'
+    assert lab.text == BREATH_LAB_TEXT
+    assert buttons(lab.keyboard) == ['Спокойствие', '🏠 Главное меню']
+    
+    category = labs.get_category('breath', 'calm')
+    assert 'Медленный выдох' in category.text
+    assert category.text.endswith(PRACTICES_COMING_SOON)
+    
+    for markup in (labs.main_menu, lab.keyboard, category.keyboard):
+        assert is_prebuilt(markup)
+
+
+def test_reload_on_mtime_change(materials, json_file):
+    labs = load_catalog(json_file(CATALOG))
+    old_menu, old_keyboard = labs.main_menu, labs.get_lab('breath').keyboard
+    assert not labs.reload_if_changed()
+    
+    edited = {'breath': dict(CATALOG['breath'], title='Дыхание 2.0'), 'mind': {'title': 'Mind', 'categories': {}}}
+    json_file(edited)
+    assert labs.reload_if_changed()
+    
+    assert list(labs.labs) == ['breath', 'mind']
+    assert buttons(labs.main_menu)[:2] == ['Дыхание 2.0', 'Mind']
+    # Клавиатуры построены заново и зарегистрированы как prebuilt
+    assert labs.main_menu is not old_menu
+    assert labs.get_lab('breath').keyboard is not old_keyboard
+    for lab in labs.labs.values():
+        assert is_prebuilt(lab.keyboard)
+    assert is_prebuilt(labs.main_menu)
+
+
+def test_reload_on_materials_change(materials, json_file):
+    labs = load_catalog(json_file(CATALOG))
+    
+    json_file([PRACTICE], 'materials.json')
+    assert labs.reload_if_changed()
+    
+    category = labs.get_category('breath', 'calm')
+    assert not category.text.endswith(PRACTICES_COMING_SOON)
+    assert buttons(category.keyboard)[0] == '▶️ Выдох на 6 счетов'
+    assert is_prebuilt(category.keyboard)
+
+
+def test_broken_file_keeps_catalog(materials, json_file):
+    labs = load_catalog(json_file(CATALOG))
+    
+    # У категории нет title
+    path = json_file({'breath': {'categories': {'calm': {}}}})
+    assert not labs.reload_if_changed()
+    assert labs.get_lab('breath').title == 'Дыхание'
+    
+    # Сломанный файл не перечитывается, пока его не изменят
+    assert not labs.reload_if_changed()
+    json_file(CATALOG)
+    assert labs.path == path
+    assert labs.reload_if_changed()
@@ -0,0 +1,32 @@
+"""Выгрузка пользователей в CSV"""
+
+import csv
+import os
+
+from bot.services.export import ExportFilter, export_users
+
+
+def test_formulas_are_escaped(loop, db):
+    async def scenario():
+        await db.add_user({
+            'user_id': 700, 'username': 'user700', 'first_name': '=HYPERLINK("http://x")',
+            'last_name': '@SUM(A1)', 'phone': '+79991234567'
+        })
+        await db.update_user(700, {'notes': '-2+3'})
+        return await export_users(ExportFilter())
+    
+    path, rows = loop.run_until_complete(scenario())
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as file:
+            records = list(csv.DictReader(file))
+    finally:
+        os.remove(path)
+    
+    assert rows == 1
+    record = records[0]
+    assert record['first_name'] == '\'=HYPERLINK("http://x")'
+    assert record['last_name'] == "'@SUM(A1)"
+    assert record['phone'] == "'+79991234567"
+    assert record['notes'] == "'-2+3"
+    assert record['username'] == 'user700'
+    assert record['user_id'] == '700'
@@ -0,0 +1,95 @@
+"""JobScheduler: повтор после RetryAfter и перечитывание задач из базы"""
+
+import json
+from datetime import timedelta
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.database.models import Job
+from bot.handlers.payment import PAYMENT_REMINDER_JOB, payment_reminder_key
+from bot.services.jobs import MAX_ATTEMPTS, job_scheduler
+
+USER_ID = 500
+
+
+class FloodedBot:
+    """Бот, который первые floods раз отвечает RetryAfter"""
+    
+    def __init__(self, floods: int = 1):
+        self.floods = floods
+        self.sent = []
+    
+    async def send_message(self, chat_id, text, **kwargs):
+        if len(self.sent) < self.floods:
+            self.sent.append(None)
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), 'Flood control', retry_after=0)
+        self.sent.append(chat_id)
+
+
+def reminder_job() -> Job:
+    return Job(
+        kind=PAYMENT_REMINDER_JOB,
+        key=payment_reminder_key(USER_ID),
+        payload=json.dumps({'user_id': USER_ID, 'first_name': 'Тест'})
+    )
+
+
+def reset_scheduler():
+    job_scheduler._jobs.clear()
+    job_scheduler._by_key.clear()
+    job_scheduler._heap.clear()
+    job_scheduler._cancelled.clear()
+
+
+def test_payment_reminder_retried_after_flood(loop, db):
+    reset_scheduler()
+    bot = FloodedBot()
+    
+    loop.run_until_complete(db.add_user({'user_id': USER_ID, 'username': '', 'first_name': 'Тест', 'last_name': ''}))
+    loop.run_until_complete(job_scheduler._execute(bot, reminder_job()))
+    
+    assert bot.sent == [None, USER_ID]
+
+
+def test_flooded_job_rescheduled(loop, db):
+    reset_scheduler()
+    bot = FloodedBot(floods=MAX_ATTEMPTS)
+    
+    loop.run_until_complete(db.add_user({'user_id': USER_ID, 'username': '', 'first_name': 'Тест', 'last_name': ''}))
+    loop.run_until_complete(job_scheduler._execute(bot, reminder_job()))
+    
+    # Попытки кончились - задача снова в очереди и в базе
+    assert bot.sent == [None] * MAX_ATTEMPTS
+    assert payment_reminder_key(USER_ID) in job_scheduler._by_key
+    assert [job.key for job in loop.run_until_complete(job_scheduler._read_jobs())] == [payment_reminder_key(USER_ID)]
+
+
+def test_load_keeps_jobs_changed_during_read(loop, db, monkeypatch):
+    reset_scheduler()
+    read_jobs = job_scheduler._read_jobs
+    
+    async def schedule(key):
+        await job_scheduler.schedule(PAYMENT_REMINDER_JOB, key, timedelta(hours=1), {})
+    
+    async def concurrent_read():
+        jobs = await read_jobs()
+        # Handlers работают, пока load ждет базу
+        await schedule('added')
+        await schedule('replaced')
+        job_scheduler.cancel('cancelled')
+        return jobs
+    
+    async def scenario():
+        for key in ('kept', 'replaced', 'cancelled'):
+            await schedule(key)
+        replaced_before = job_scheduler._by_key['replaced']
+        
+        monkeypatch.setattr(job_scheduler, '_read_jobs', concurrent_read)
+        await job_scheduler.load()
+        
+        assert set(job_scheduler._by_key) == {'kept', 'added', 'replaced'}
+        assert job_scheduler._by_key['replaced'] != replaced_before
+        assert len(job_scheduler._heap) == 3
+    
+    loop.run_until_complete(scenario())
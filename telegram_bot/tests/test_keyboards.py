@@ -0,0 +1,40 @@
+"""Кеш клавиатур и готовый JSON в PrebuiltKeyboardSession"""
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage
+
+from bot.keyboards import prebuilt as prebuilt_module
+from bot.keyboards.inline import get_back_button, get_info_menu, get_materials_list
+from bot.keyboards.prebuilt import PrebuiltKeyboardSession
+
+
+def form_fields(session, bot, method) -> dict:
+    """Поля формы запроса как словарь"""
+    form = session.build_form_data(bot, method)
+    return {options['name']: value for options, _, value in form._fields}
+
+
+def test_cached_keyboard_is_shared():
+    assert get_info_menu() is get_info_menu()
+    assert get_back_button('materials') is get_back_button('materials')
+    assert get_back_button('materials') is not get_back_button('labs')
+
+
+def test_prebuilt_payload_matches_aiogram(loop):
+    bot = Bot(token='42:TEST')
+    plain, prebuilt = AiohttpSession(), PrebuiltKeyboardSession()
+    method = SendMessage(chat_id=100, text='Меню', reply_markup=get_info_menu())
+    
+    try:
+        assert form_fields(prebuilt, bot, method) == form_fields(plain, bot, method)
+        # JSON запомнен при первой отправке
+        assert prebuilt_module._prebuilt[id(get_info_menu())][1] is not None
+        
+        # Клавиатуры, построенные на лету, сериализуются как обычно
+        dynamic = SendMessage(chat_id=100, text='Список', reply_markup=get_materials_list([], 'materials'))
+        assert prebuilt.prebuilt_payload(dynamic.reply_markup, bot) is None
+        assert form_fields(prebuilt, bot, dynamic) == form_fields(plain, bot, dynamic)
+    finally:
+        for session in (plain, prebuilt, bot.session):
+            loop.run_until_complete(session.close())
@@ -0,0 +1,89 @@
+"""Репозиторий материалов: индексы, страницы и перезагрузка файла"""
+
+import pytest
+
+from bot.database.materials import SAMPLE_MATERIALS, Material, MaterialsRepository
+
+MATERIALS = [
+    {'id': 5, 'title': 'Осанка', 'format': 'video', 'category': 'back', 'message_id': '15'},
+    {'id': 1, 'title': 'Дыхание квадратом', 'format': 'audio', 'category': 'breathing'},
+    {'id': 3, 'title': 'Спина утром', 'category': 'back'},
+    {'id': 4, 'title': 'Выдох', 'format': 'audio', 'lab': 'breath', 'lab_category': 'calm'},
+]
+
+
+@pytest.fixture
+def repository(json_file):
+    """Репозиторий из MATERIALS во временном файле"""
+    repository = MaterialsRepository()
+    repository.path = json_file(MATERIALS)
+    assert repository.load()
+    return repository
+
+
+def ids(page) -> list:
+    return [material.id for material in page.items]
+
+
+def test_get_and_all(repository):
+    assert [material.id for material in repository.all()] == [1, 3, 4, 5]
+    assert repository.get(5) == Material(id=5, title='Осанка', format='video', message_id=15, category='back')
+    # Формат по умолчанию - видео
+    assert repository.get(3).format == 'video'
+    assert repository.get(2) is None
+
+
+def test_indexes(repository):
+    assert ids(repository.by_format('video')) == [3, 5]
+    assert ids(repository.by_format('audio')) == [1, 4]
+    assert ids(repository.by_category('back')) == [3, 5]
+    assert ids(repository.by_lab('breath', 'calm')) == [4]
+    # Материал без темы в тематические списки не попадает
+    assert repository.by_category('').total == 0
+    assert repository.by_format('article').items == []
+
+
+def test_pages_by_cursor(repository):
+    page = repository.by_format('video', limit=1)
+    assert (ids(page), page.next_cursor, page.total) == ([3], 3, 2)
+    
+    page = repository.by_format('video', cursor=page.next_cursor, limit=1)
+    assert (ids(page), page.prev_cursor, page.next_cursor) == ([5], 0, None)
+
+
+def test_reload_if_changed(repository, json_file):
+    version = repository.version
+    assert not repository.reload_if_changed()
+    
+    json_file(MATERIALS[:2] + [dict(MATERIALS[2], format='article')])
+    assert repository.reload_if_changed()
+    
+    assert repository.version == version + 1
+    assert repository.get(4) is None
+    assert ids(repository.by_format('video')) == [5]
+    assert ids(repository.by_format('article')) == [3]
+    assert repository.by_lab('breath', 'calm').total == 0
+
+
+@pytest.mark.parametrize('broken', [
+    MATERIALS + [{'id': 1, 'title': 'Повтор'}],
+    [{'title': 'Без id'}],
+])
+def test_broken_file_keeps_materials(repository, json_file, broken):
+    version = repository.version
+    
+    json_file(broken)
+    assert not repository.reload_if_changed()
+    assert repository.version == version
+    assert ids(repository.by_format('video')) == [3, 5]
+    
+    # Пока файл не исправят, он не перечитывается
+    assert not repository.reload_if_changed()
+
+
+def test_sample_materials_without_file(tmp_path):
+    repository = MaterialsRepository()
+    repository.path = str(tmp_path / 'missing.json')
+    assert repository.load()
+    
+    assert [material.id for material in repository.all()] == [record['id'] for record in SAMPLE_MATERIALS]
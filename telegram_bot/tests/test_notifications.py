@@ -0,0 +1,41 @@
+"""Сводки уведомлений админу: экранирование, деление и запасной вариант"""
+
+from aiogram.types import User
+
+from bot.services.notifications import DIGEST_SEPARATOR, MAX_MESSAGE_LENGTH, AdminNotifier, user_label
+from tests.fake_telegram import FakeTelegram
+
+
+def test_user_label_escapes_names():
+    user = User(id=1, is_bot=False, first_name='<b>Ann', last_name='& Co', username='ann_<3')
+    assert user_label(user) == '&lt;b&gt;Ann &amp; Co (@ann_&lt;3)'
+
+
+def test_split_only_between_events():
+    events = ['a' * 3000, 'b' * 3000, 'c' * 100, 'd' * 5000]
+    messages = AdminNotifier._split(events, 'header')
+    
+    assert messages == [['a' * 3000], ['b' * 3000, 'c' * 100], ['d' * 5000]]
+    for message in messages[:2]:
+        assert len(DIGEST_SEPARATOR.join(message)) <= MAX_MESSAGE_LENGTH
+
+
+def test_rejected_digest_sent_per_event_as_plain_text(loop):
+    notifier = AdminNotifier()
+    events = ['<b>Оплата</b> от Ann', '<b>Заявка</b> &lt;3 <i']
+    
+    async def scenario():
+        async with FakeTelegram() as telegram:
+            # Telegram не разбирает сводку со сломанным тегом
+            telegram.reject = lambda method, params: (
+                "Bad Request: can't parse entities" if params.get('parse_mode') == 'HTML' and '<i' in params['text']
+                else None
+            )
+            await notifier._send_batch(telegram.bot(), events)
+            return telegram.called('sendMessage')
+    
+    calls = loop.run_until_complete(scenario())
+    
+    assert len(calls) == 3
+    assert [call['text'] for call in calls[1:]] == ['Оплата от Ann', 'Заявка <3 <i']
+    assert all('parse_mode' not in call for call in calls[1:])
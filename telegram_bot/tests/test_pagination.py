@@ -0,0 +1,76 @@
+"""Постраничный вывод по курсору (id последнего элемента прошлой страницы)"""
+
+from dataclasses import dataclass
+
+import pytest
+
+from bot.utils.pagination import paginate, page_callbacks
+
+# id с пропусками, как у материалов после удалений
+IDS = [2, 4, 6, 8, 10, 12, 14]
+
+
+@dataclass
+class Item:
+    id: int
+
+
+ITEMS = [Item(item_id) for item_id in IDS]
+
+
+def page_ids(page) -> list:
+    return [item.id for item in page.items]
+
+
+@pytest.mark.parametrize('cursor, items, prev_cursor, next_cursor', [
+    # Первая страница
+    (0, [2, 4, 6], None, 6),
+    # Вторая: назад - на первую, то есть курсор 0
+    (6, [8, 10, 12], 0, 12),
+    # Страница не по границе первых: назад - на 3 элемента раньше
+    (8, [10, 12, 14], 2, None),
+    # Последняя
+    (12, [14], 6, None),
+    # Курсор на удаленном id - продолжаем со следующего
+    (7, [8, 10, 12], 0, 12),
+    (13, [14], 6, None),
+    # Курсор за последним элементом
+    (100, [], 8, None),
+])
+def test_paginate(cursor, items, prev_cursor, next_cursor):
+    page = paginate(ITEMS, cursor, limit=3)
+    
+    assert page_ids(page) == items
+    assert (page.prev_cursor, page.next_cursor) == (prev_cursor, next_cursor)
+    assert (page.cursor, page.total) == (cursor, len(IDS))
+
+
+def test_walk_forward_and_back():
+    pages, cursor = [], 0
+    while cursor is not None:
+        page = paginate(ITEMS, cursor, limit=3)
+        pages.append(page_ids(page))
+        cursor = page.next_cursor
+    assert pages == [[2, 4, 6], [8, 10, 12], [14]]
+    
+    # Кнопка назад с последней страницы ведет на ту же вторую и первую
+    back = paginate(ITEMS, paginate(ITEMS, 12, limit=3).prev_cursor, limit=3)
+    assert page_ids(back) == [8, 10, 12]
+    assert page_ids(paginate(ITEMS, back.prev_cursor, limit=3)) == [2, 4, 6]
+
+
+def test_without_limit_and_empty():
+    page = paginate(ITEMS)
+    assert page_ids(page) == IDS
+    assert (page.prev_cursor, page.next_cursor) == (None, None)
+    
+    page = paginate([], 0, limit=3)
+    assert (page.items, page.prev_cursor, page.next_cursor, page.total) == ([], None, None, 0)
+
+
+def test_page_callbacks():
+    pack = lambda cursor: f"mf:video:{cursor}"
+    
+    assert page_callbacks(paginate(ITEMS, 0, limit=3), pack) == (None, 'mf:video:6')
+    assert page_callbacks(paginate(ITEMS, 6, limit=3), pack) == ('mf:video:0', 'mf:video:12')
+    assert page_callbacks(paginate(ITEMS, 12, limit=3), pack) == ('mf:video:6', None)
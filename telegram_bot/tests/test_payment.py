@@ -0,0 +1,83 @@
+"""Оплата через Telegram Payments: проверка счета и активация подписки"""
+
+from datetime import datetime, timedelta
+
+from aiogram.types import Update
+
+from bot.handlers import payment
+from bot.handlers.payment import build_payload
+from bot.services.notifications import admin_notifier
+from config.config import Config
+from tests.fake_telegram import FakeTelegram, callback_update, payment_update, pre_checkout_update
+
+USER_ID = 400
+AMOUNT = Config().SUBSCRIPTION_PRICE * 100
+DAYS = Config().SUBSCRIPTION_DURATION_DAYS
+
+
+def test_pre_checkout(loop, dispatcher):
+    async def scenario():
+        async with FakeTelegram() as telegram:
+            bot = telegram.bot()
+            for update_id, payload, amount in (
+                (1, build_payload(USER_ID, DAYS), AMOUNT),
+                (2, build_payload(USER_ID + 1, DAYS), AMOUNT),  # счет другого пользователя
+                (3, 'bad payload', AMOUNT),
+                (4, build_payload(USER_ID, DAYS), AMOUNT + 100),  # старая цена
+            ):
+                update = pre_checkout_update(update_id, payload, amount, USER_ID)
+                await dispatcher.feed_update(bot, Update.model_validate(update, context={'bot': bot}))
+            return telegram.called('answerPreCheckoutQuery')
+    
+    answers = loop.run_until_complete(scenario())
+    assert [answer['ok'] for answer in answers] == ['true', 'false', 'false', 'false']
+    assert all(answer.get('error_message') for answer in answers[1:])
+
+
+def test_successful_payment(loop, db, dispatcher):
+    async def scenario():
+        await db.add_user({'user_id': USER_ID, 'username': '', 'first_name': 'Тест', 'last_name': ''})
+        
+        async with FakeTelegram() as telegram:
+            bot = telegram.bot()
+            
+            async def pay(update_id, charge_id):
+                update = payment_update(update_id, charge_id, build_payload(USER_ID, DAYS), AMOUNT, USER_ID)
+                await dispatcher.feed_update(bot, Update.model_validate(update, context={'bot': bot}))
+                return (await db.get_subscription_ends([USER_ID]))[USER_ID]
+            
+            started = datetime.now()
+            first_end = await pay(10, 'charge_1')
+            assert started + timedelta(days=DAYS) <= first_end <= datetime.now() + timedelta(days=DAYS)
+            assert len(telegram.called('sendMessage')) == 1
+            
+            # Повторная доставка того же платежа ничего не меняет
+            assert await pay(11, 'charge_1') == first_end
+            assert len(telegram.called('sendMessage')) == 1
+            
+            # Новая оплата при активной подписке продлевает от даты окончания
+            assert await pay(12, 'charge_2') == first_end + timedelta(days=DAYS)
+            assert len(telegram.called('sendMessage')) == 2
+    
+    loop.run_until_complete(scenario())
+    
+    # Админу - по уведомлению на каждую примененную оплату
+    notices = []
+    while not admin_notifier._queue.empty():
+        notices.append(admin_notifier._queue.get_nowait())
+    assert len(notices) == 2 and all('charge_' in notice for notice in notices)
+
+
+def test_subscription_info_mentions_manual_payment_only_without_provider(loop, db, dispatcher, monkeypatch):
+    async def info_text(update_id):
+        async with FakeTelegram() as telegram:
+            bot = telegram.bot()
+            update = callback_update(update_id, 'subscribe_info', USER_ID)
+            await dispatcher.feed_update(bot, Update.model_validate(update, context={'bot': bot}))
+            return telegram.called('editMessageText')[0]['text']
+    
+    assert 'вручную' in loop.run_until_complete(info_text(20))
+    
+    monkeypatch.setattr(payment.config, 'PAYMENT_PROVIDER_TOKEN', 'provider_token')
+    text = loop.run_until_complete(info_text(21))
+    assert 'вручную' not in text and 'Я оплатил' not in text
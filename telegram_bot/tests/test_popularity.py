@@ -0,0 +1,87 @@
+"""Популярность материалов: forward decay, топ-K и сохранение состояния"""
+
+import pytest
+
+from bot.services.popularity import MAX_EXPONENT, PopularityTracker
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    """Трекер с точкой отсчета 0 и своим файлом состояния"""
+    tracker = PopularityTracker()
+    tracker.landmark = 0.0
+    tracker.path = str(tmp_path / 'popularity.json')
+    return tracker
+
+
+def half_life(tracker: PopularityTracker) -> float:
+    return tracker.config.POPULARITY_HALF_LIFE_HOURS * 3600
+
+
+def test_forward_decay_weights(tracker):
+    half = half_life(tracker)
+    tracker.record(1, now=0)
+    tracker.record(2, now=half)
+    tracker.record(3, now=2 * half)
+    
+    # Просмотр на полураспад раньше весит вдвое меньше
+    assert tracker._scores[2] / tracker._scores[1] == pytest.approx(2)
+    assert tracker._scores[3] / tracker._scores[1] == pytest.approx(4)
+
+
+@pytest.mark.parametrize('later, expected', [
+    # 3 старых просмотра через полураспад весят 1.5 - больше одного нового
+    (1, [(1, 3), (2, 1)]),
+    # через два - 0.75, новый просмотр обгоняет
+    (2, [(2, 1), (1, 3)]),
+])
+def test_top_after_decay(tracker, later, expected):
+    for _ in range(3):
+        tracker.record(1, now=0)
+    tracker.record(2, now=later * half_life(tracker))
+    
+    assert tracker.top(10) == expected
+    assert tracker.top(1) == expected[:1]
+
+
+def test_rescale_keeps_order(tracker):
+    tracker.record(1, now=0)
+    tracker.record(1, now=0)
+    tracker.record(2, now=0)
+    
+    # Экспонента вышла бы за MAX_EXPONENT - точка отсчета переносится
+    now = (MAX_EXPONENT + 1) / tracker.rate
+    tracker.record(3, now=now)
+    
+    assert tracker.landmark == now
+    assert tracker._scores[3] == pytest.approx(1)
+    assert [material_id for material_id, _ in tracker.top(3)] == [3, 1, 2]
+
+
+def test_checkpoint_roundtrip(tracker):
+    half = half_life(tracker)
+    tracker.record(1, now=0)
+    tracker.record(2, now=half)
+    tracker.record(2, now=half)
+    tracker.save()
+    
+    restored = PopularityTracker()
+    restored.path = tracker.path
+    restored.load()
+    
+    assert restored.landmark == tracker.landmark
+    assert restored.top(10) == tracker.top(10) == [(2, 2), (1, 1)]
+    
+    # После загрузки просмотры продолжают считаться от той же точки отсчета
+    restored.record(1, now=2 * half)
+    restored.record(1, now=2 * half)
+    assert [material_id for material_id, _ in restored.top(2)] == [1, 2]
+
+
+def test_save_only_when_dirty_and_broken_checkpoint(tracker, tmp_path):
+    tracker.save()
+    assert not (tmp_path / 'popularity.json').exists()
+    
+    (tmp_path / 'popularity.json').write_text('{"landmark":', encoding='utf-8')
+    tracker.load()
+    assert tracker.top(10) == []
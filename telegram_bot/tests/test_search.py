@@ -0,0 +1,127 @@
+"""Поиск материалов: индекс, ранжирование и состояние поиска в диалоге"""
+
+import pytest
+from aiogram.types import Update
+
+from bot.database.materials import MaterialsRepository
+from bot.handlers.materials import SearchStates
+from bot.services import search
+from bot.services.search import SearchIndex, normalize, stem
+from tests.fake_telegram import FakeTelegram, callback_update, message_update
+
+
+def test_search_state_is_cleared(loop, db, dispatcher):
+    async def scenario():
+        async with FakeTelegram() as telegram:
+            bot = telegram.bot()
+            state = dispatcher.fsm.get_context(bot, chat_id=100, user_id=100)
+            
+            async def feed(update):
+                await dispatcher.feed_update(bot, Update.model_validate(update, context={'bot': bot}))
+            
+            await feed(message_update(1, '/start'))
+            
+            # Запрос -> результаты, следующее сообщение - уже не поиск
+            await feed(callback_update(2, 'materials_search'))
+            assert await state.get_state() == SearchStates.waiting_for_query.state
+            
+            sent = len(telegram.called('sendMessage'))
+            await feed(message_update(3, 'сон'))
+            assert len(telegram.called('sendMessage')) == sent + 1
+            assert await state.get_state() is None
+            assert (await state.get_data())['search_query'] == 'сон'
+            
+            await feed(message_update(4, 'просто сообщение'))
+            assert len(telegram.called('sendMessage')) == sent + 1
+            
+            # Назад и главное меню тоже выходят из поиска
+            for update_id, data in ((5, 'materials'), (6, 'menu')):
+                await feed(callback_update(update_id * 10, 'materials_search'))
+                assert await state.get_state() == SearchStates.waiting_for_query.state
+                await feed(callback_update(update_id * 10 + 1, data))
+                assert await state.get_state() is None
+            
+            # /start тоже
+            await feed(callback_update(70, 'materials_search'))
+            await feed(message_update(71, '/start'))
+            assert await state.get_state() is None
+    
+    loop.run_until_complete(scenario())
+
+
+MATERIALS = [
+    {'id': 1, 'title': 'Сон и отдых', 'format': 'audio', 'category': 'relaxation', 'description': 'Вечерняя практика'},
+    {'id': 2, 'title': 'Дыхание', 'format': 'video', 'category': 'breathing', 'description': 'Практика перед сном'},
+    {'id': 3, 'title': 'Спина без боли', 'format': 'video', 'category': 'back', 'description': 'Для спины и отдыха'},
+]
+
+
+@pytest.fixture
+def index(json_file, monkeypatch):
+    """SearchIndex над репозиторием из временного файла (json_file перезаписывает его)"""
+    repository = MaterialsRepository()
+    repository.path = json_file(MATERIALS)
+    repository.load()
+    monkeypatch.setattr(search, 'materials_repository', repository)
+    return SearchIndex()
+
+
+def ids(materials) -> list:
+    return [material.id for material in materials]
+
+
+def test_normalize():
+    assert normalize('Ёлки, ПРАКТИКИ для спины!') == ['елк', 'практик', 'для', 'спин']
+    assert normalize('...') == []
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('спиной', 'спин'),
+    ('спина', 'спин'),
+    ('практиками', 'практик'),
+    # Основа не короче MIN_STEM
+    ('сна', 'сна'),
+    ('для', 'для'),
+    ('сон', 'сон'),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+
+def test_ranking(index):
+    # Заголовок весит больше описания
+    assert ids(index.search('отдых')) == [1, 3]
+    # Тема (Дыхательные практики) + описание больше одного описания
+    assert ids(index.search('практика')) == [2, 1]
+    # При равном весе - по id
+    assert ids(index.search('видео')) == [2, 3]
+    # Все слова запроса должны встретиться
+    assert ids(index.search('вечерняя практика')) == [1]
+    assert index.search('вечерняя спина') == []
+    assert index.search('!!!') == []
+
+
+def test_sync_and_query_cache(index, json_file, monkeypatch):
+    results = index.search('практика')
+    assert index.search('Практики') is results
+    
+    # Версия не менялась - индекс не трогаем
+    added = []
+    add = index.add
+    monkeypatch.setattr(index, 'add', lambda material: (added.append(material.id), add(material)))
+    index.sync()
+    assert added == []
+    
+    edited = [dict(MATERIALS[0], description='Сон'), MATERIALS[2], {
+        'id': 4, 'title': 'Утренняя практика', 'format': 'video', 'category': 'energy'
+    }]
+    assert not search.materials_repository.reload_if_changed()
+    json_file(edited)
+    assert search.materials_repository.reload_if_changed()
+    
+    # Переиндексированы только измененный и новый, удаленный пропал,
+    # закешированный результат сброшен
+    assert ids(index.search('практика')) == [4]
+    assert sorted(added) == [1, 4]
+    assert index.search('дыхание') == []
+    assert 2 not in index._terms
@@ -0,0 +1,49 @@
+"""Счетчики статистики: события во время пересчета и панель до него"""
+
+from aiogram.types import Update
+
+from bot.database.repository import user_repository
+from bot.services.stats import stats
+from tests.fake_telegram import FakeTelegram, callback_update
+
+
+def new_user(user_id: int) -> dict:
+    return {'user_id': user_id, 'username': '', 'first_name': 'Тест', 'last_name': ''}
+
+
+def test_changes_during_recompute_are_kept(loop, db, monkeypatch):
+    aggregates = user_repository.get_user_aggregates
+    
+    async def slow_aggregates():
+        rows = await aggregates()
+        # Регистрация, пока пересчет ждет базу
+        await db.add_user(new_user(602))
+        return rows
+    
+    async def scenario():
+        await db.add_user(new_user(601))
+        
+        monkeypatch.setattr(user_repository, 'get_user_aggregates', slow_aggregates)
+        await stats.recompute()
+        assert stats.total == 2
+        
+        monkeypatch.undo()
+        await stats.recompute()
+        assert stats.total == 2
+    
+    loop.run_until_complete(scenario())
+
+
+def test_stats_panel_waits_for_first_recompute(loop, db, dispatcher, monkeypatch):
+    monkeypatch.setattr(stats, 'ready', False)
+    
+    async def scenario():
+        async with FakeTelegram() as telegram:
+            bot = telegram.bot()
+            update = callback_update(30, 'admin_stats', user_id=1)
+            await dispatcher.feed_update(bot, Update.model_validate(update, context={'bot': bot}))
+            return telegram
+    
+    telegram = loop.run_until_complete(scenario())
+    assert not telegram.called('editMessageText')
+    assert 'пересчитывается' in telegram.called('answerCallbackQuery')[0]['text']
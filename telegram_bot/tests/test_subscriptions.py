@@ -0,0 +1,50 @@
+"""Напоминания о продлении: сверка с базой и лок между репликами"""
+
+import heapq
+from datetime import datetime, timedelta
+
+from bot.services import subscriptions
+from bot.services.subscriptions import REMIND, subscription_scheduler
+from tests.fake_telegram import FakeTelegram
+
+
+def due_reminder(user_id: int, end_date: datetime):
+    """Напоминание, которое уже пора отправить"""
+    subscription_scheduler._ends[user_id] = end_date
+    heapq.heappush(subscription_scheduler._heap, (datetime.now() - timedelta(seconds=1), user_id, REMIND, end_date))
+
+
+def test_reminders(loop, db, monkeypatch):
+    now = datetime.now().replace(microsecond=0)
+    renewed_end, current_end = now + timedelta(days=30), now + timedelta(days=2)
+    
+    async def scenario():
+        for user_id, end_date in ((201, renewed_end), (202, current_end)):
+            await db.add_user({'user_id': user_id, 'username': '', 'first_name': 'Тест', 'last_name': ''})
+            await db.update_user(user_id, {'payment_status': True, 'subscription_end': end_date})
+        subscription_scheduler._heap.clear()
+        subscription_scheduler._ends.clear()
+        
+        async with FakeTelegram() as telegram:
+            bot = telegram.bot()
+            
+            # Лок у другой реплики - события остаются в куче
+            due_reminder(202, current_end)
+            monkeypatch.setattr(subscriptions, 'acquire_lock', lambda *args: _false())
+            await subscription_scheduler.process(bot)
+            assert len(subscription_scheduler._heap) == 1
+            assert subscription_scheduler._seconds_to_next() > 0
+            monkeypatch.undo()
+            
+            # 201 продлил подписку на другой реплике - напоминание по старому сроку не уходит
+            due_reminder(201, now + timedelta(days=2))
+            await subscription_scheduler.process(bot)
+            
+            assert [params['chat_id'] for params in telegram.called('sendMessage')] == ['202']
+            assert subscription_scheduler._ends[201] == renewed_end
+    
+    loop.run_until_complete(scenario())
+
+
+async def _false() -> bool:
+    return False
@@ -0,0 +1,56 @@
+"""Скользящее окно ThrottlingMiddleware"""
+
+from datetime import datetime
+
+import pytest
+from aiogram.types import Chat, Message, SuccessfulPayment, User
+
+from bot.middlewares import throttling
+from bot.middlewares.throttling import SlidingWindowLimiter, ThrottlingMiddleware
+
+
+def test_limit_per_window(loop, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(throttling.time, 'monotonic', lambda: now[0])
+    limiter = SlidingWindowLimiter(limit=2, period=10)
+    
+    hits = [loop.run_until_complete(limiter.hit(1)) for _ in range(3)]
+    assert hits == [True, True, False]
+    
+    # Окно сдвинулось - снова можно, неактивные пользователи удаляются
+    now[0] += 11
+    assert loop.run_until_complete(limiter.hit(2))
+    assert loop.run_until_complete(limiter.hit(1))
+    assert list(limiter._windows) == [2, 1]
+
+
+@pytest.mark.parametrize('limit, period', [(0, 10), (-1, 10), (5, 0)])
+def test_invalid_limits_rejected(limit, period):
+    with pytest.raises(ValueError):
+        SlidingWindowLimiter(limit, period)
+
+
+def test_successful_payment_not_throttled(loop):
+    middleware = ThrottlingMiddleware()
+    middleware.limiter = SlidingWindowLimiter(limit=1, period=60)
+    handled = []
+    
+    async def handler(event, data):
+        handled.append(event.message_id)
+    
+    user = User(id=300, is_bot=False, first_name='Тест')
+    chat = Chat(id=300, type='private')
+    payment = SuccessfulPayment(
+        currency='RUB', total_amount=2000, invoice_payload='sub:300:30',
+        telegram_payment_charge_id='charge', provider_payment_charge_id='provider'
+    )
+    
+    for message_id, successful_payment in ((1, None), (2, None), (3, payment)):
+        message = Message(
+            message_id=message_id, date=datetime.now(), chat=chat, from_user=user,
+            successful_payment=successful_payment
+        )
+        loop.run_until_complete(middleware(handler, message, {}))
+    
+    # Второе сообщение отброшено лимитом, оплата - нет
+    assert handled == [1, 3]
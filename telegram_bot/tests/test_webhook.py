@@ -0,0 +1,69 @@
+"""Режим webhook: aiohttp-приложение с поддельным Telegram"""
+
+import asyncio
+import json
+
+import pytest
+from aiogram import Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.keyboards.inline import get_main_menu
+from bot.main import create_webhook_app
+from config.config import Config
+from tests.fake_telegram import FakeTelegram, message_update
+
+SECRET = 'test_secret'
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+async def wait_for(predicate, timeout: float = 5.0):
+    """Дождаться фоновой обработки обновления"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Timed out waiting for the bot")
+        await asyncio.sleep(0.02)
+
+
+def test_webhook_requires_secret():
+    config = Config(WEBHOOK_SECRET='')
+    
+    with pytest.raises(RuntimeError):
+        create_webhook_app(None, Dispatcher(), config)
+
+
+def test_webhook_handles_start_and_checks_secret(loop, db, dispatcher):
+    config = Config(WEBHOOK_SECRET=SECRET, WEBHOOK_PATH='/webhook')
+    
+    async def scenario():
+        async with FakeTelegram() as telegram:
+            app = create_webhook_app(telegram.bot(), dispatcher, config)
+            
+            async with TestClient(TestServer(app)) as client:
+                response = await client.get('/health')
+                assert await response.text() == 'ok'
+                
+                # Без секрета и с чужим секретом обновление не обрабатывается
+                response = await client.post('/webhook', json=message_update(1, '/start'))
+                assert response.status == 401
+                response = await client.post(
+                    '/webhook', json=message_update(2, '/start'), headers={SECRET_HEADER: 'wrong'}
+                )
+                assert response.status == 401
+                
+                response = await client.post(
+                    '/webhook', json=message_update(3, '/start'), headers={SECRET_HEADER: SECRET}
+                )
+                assert response.status == 200
+                
+                # Приветствие и главное меню
+                await wait_for(lambda: len(telegram.called('sendMessage')) >= 2)
+        
+        return telegram
+    
+    telegram = loop.run_until_complete(scenario())
+    
+    assert [params['chat_id'] for params in telegram.called('sendMessage')] == ['100', '100']
+    # Главное меню уходит готовым JSON (prebuilt)
+    assert json.loads(telegram.called('sendMessage')[1]['reply_markup']) == get_main_menu().model_dump(exclude_none=True)
+    assert loop.run_until_complete(db.get_user(100)) is not None